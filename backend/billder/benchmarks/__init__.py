@@ -0,0 +1,48 @@
+"""
+Performance benchmarks.
+
+Run from the Django project directory, e.g.::
+
+    cd backend/billder
+    python -m benchmarks.db_writes
+
+Benchmarks never touch the development database: unless DATABASE_URL is
+given they migrate a throwaway SQLite file.
+"""
+import atexit
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django(database_url=None, migrate=True):
+    """Configure Django against a benchmark database and migrate it"""
+    if str(PROJECT_DIR) not in sys.path:
+        sys.path.insert(0, str(PROJECT_DIR))
+
+    if database_url is None:
+        handle, path = tempfile.mkstemp(prefix='billder-bench-', suffix='.sqlite3')
+        os.close(handle)
+        atexit.register(os.remove, path)
+        database_url = f'sqlite:///{path}'
+    os.environ['DATABASE_URL'] = database_url
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'billder.settings')
+
+    import django
+    django.setup()
+
+    if migrate:
+        from django.core.management import call_command
+        call_command('migrate', verbosity=0)
+    return database_url
+
+
+def print_table(rows, columns):
+    """Print result dicts as an aligned text table"""
+    widths = {c: max(len(c), *(len(str(r.get(c, ''))) for r in rows)) for c in columns}
+    print('  '.join(c.ljust(widths[c]) for c in columns))
+    for row in rows:
+        print('  '.join(str(row.get(c, '')).ljust(widths[c]) for c in columns))
@@ -0,0 +1,81 @@
+"""
+Customer autocomplete: index build time and lookup latency for one owner.
+
+    python -m benchmarks.autocomplete --customers 20000
+"""
+import argparse
+import json
+import random
+import statistics
+import string
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from . import print_table, setup_django
+
+
+def seed(customers):
+    from django.contrib.auth import get_user_model
+    from finance.models import Invoice
+
+    User = get_user_model()
+    rng = random.Random(42)
+    owner = User.objects.create_user(email='owner@example.com', password=None, first_name='Bench',
+                                     last_name='Owner', role='business_owner')
+    users = User.objects.bulk_create([
+        User(email=f'{"".join(rng.choices(string.ascii_lowercase, k=8))}{i}@example.com',
+             first_name=''.join(rng.choices(string.ascii_lowercase, k=6)).title(),
+             last_name=''.join(rng.choices(string.ascii_lowercase, k=8)).title(), role='customer')
+        for i in range(customers)
+    ])
+    Invoice.objects.bulk_create([
+        Invoice(reference=f'BENCH-{i}', public_slug=f'bench-{i}', owner=owner, customer=user,
+                total_amount=Decimal('100.00'), due_date=date.today() + timedelta(days=30))
+        for i, user in enumerate(users)
+    ])
+    return owner
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--customers', type=int, default=20000)
+    parser.add_argument('--lookups', type=int, default=10000)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    setup_django()
+    owner = seed(args.customers)
+
+    from finance import autocomplete
+
+    started = time.perf_counter()
+    index = autocomplete.get_index(owner.pk)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    rng = random.Random(7)
+    results = [{'case': 'build', 'keys': len(index.keys), 'p50_ms': round(build_ms, 3), 'p99_ms': None}]
+    for length in (1, 2, 4):
+        timings = []
+        for _ in range(args.lookups):
+            prefix = ''.join(rng.choices(string.ascii_lowercase, k=length))
+            started = time.perf_counter()
+            autocomplete.get_index(owner.pk).search(prefix, args.limit)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        results.append({
+            'case': f'lookup {length}-char prefix',
+            'keys': len(index.keys),
+            'p50_ms': round(statistics.median(timings) * 1000, 3),
+            'p99_ms': round(timings[int(len(timings) * 0.99)] * 1000, 3),
+        })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results, ['case', 'keys', 'p50_ms', 'p99_ms'])
+
+
+if __name__ == '__main__':
+    main()
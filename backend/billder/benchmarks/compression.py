@@ -0,0 +1,69 @@
+"""
+Size and CPU cost of each response coding for an invoice list payload, and
+of a precompressed cache hit.
+
+    python -m benchmarks.compression --rows 1000
+"""
+import argparse
+import json
+import time
+
+from . import print_table, setup_django
+from .serializers import seed
+
+
+def best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return result, min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    setup_django()
+    seed(args.rows)
+
+    from billder.compression import enabled_codecs, precompress
+    from billder.renderers import FastJSONRenderer
+    from finance.fast_serializers import FastInvoiceListSerializer
+    from finance.models import Invoice
+
+    content = FastJSONRenderer().render(FastInvoiceListSerializer(Invoice.objects.all()).data)
+    precompressed = precompress(content)
+
+    results = [{'encoding': 'identity', 'level': '-', 'bytes': len(content), 'ratio': 1.0, 'ms': 0.0}]
+    for codec in enabled_codecs():
+        for level in (codec.level, codec.cache_level):
+            compressed, seconds = best_of(args.repeat, lambda: codec.compress(content, level))
+            results.append({
+                'encoding': codec.name,
+                'level': level,
+                'bytes': len(compressed),
+                'ratio': round(len(content) / len(compressed), 1),
+                'ms': round(seconds * 1000, 2),
+            })
+        _, seconds = best_of(args.repeat, lambda: precompressed.get(codec.name))
+        results.append({
+            'encoding': f'{codec.name} (cached)',
+            'level': codec.cache_level,
+            'bytes': len(precompressed[codec.name]),
+            'ratio': round(len(content) / len(precompressed[codec.name]), 1),
+            'ms': round(seconds * 1000, 2),
+        })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results, ['encoding', 'level', 'bytes', 'ratio', 'ms'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Per-request cost of CsrfExemptMiddleware.process_view: the original
+per-request ``re.match`` loop vs the precompiled matcher.
+
+    python -m benchmarks.csrf_middleware --calls 200000
+"""
+import argparse
+import json
+import re
+import time
+
+from . import print_table, setup_django
+
+PATHS = ['/api/invoices/', '/api/public/invoice/invoice-1a2b3c4d/', '/admin/', '/health/']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=200000)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    setup_django(migrate=False)
+
+    from django.conf import settings
+    from django.http import HttpResponse
+    from django.middleware.csrf import CsrfViewMiddleware
+    from django.test import RequestFactory
+    from billder.csrf_middleware import CsrfExemptMiddleware
+
+    class OriginalCsrfExemptMiddleware(CsrfViewMiddleware):
+        """The middleware as it was: settings lookup and re.match per pattern"""
+
+        def process_view(self, request, callback, callback_args, callback_kwargs):
+            path = request.path_info
+            exempt_urls = getattr(settings, 'CSRF_EXEMPT_URLS', [])
+            for pattern in exempt_urls:
+                if re.match(pattern, path):
+                    return None
+            return super().process_view(request, callback, callback_args, callback_kwargs)
+
+    def view(request):
+        return HttpResponse()
+
+    factory = RequestFactory()
+    get_response = lambda request: HttpResponse()  # noqa: E731
+    variants = [
+        ('original', OriginalCsrfExemptMiddleware(get_response)),
+        ('precompiled', CsrfExemptMiddleware(get_response)),
+    ]
+
+    results = []
+    for path in PATHS:
+        request = factory.get(path)
+        for name, middleware in variants:
+            started = time.perf_counter()
+            for _ in range(args.calls):
+                middleware.process_view(request, view, (), {})
+            seconds = time.perf_counter() - started
+            results.append({
+                'path': path,
+                'middleware': name,
+                'ns_per_call': round(seconds / args.calls * 1e9),
+            })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results, ['path', 'middleware', 'ns_per_call'])
+
+
+if __name__ == '__main__':
+    main()
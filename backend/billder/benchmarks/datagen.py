@@ -0,0 +1,160 @@
+"""
+Deterministic seed data for load tests.
+
+``generate()`` creates owners, customers, invoices and payments in every
+status from a seeded RNG: the same arguments always produce the same ids,
+references, slugs and amounts, so runs against fresh databases are
+comparable. Rows are bulk inserted, then search documents are built.
+
+    python -m benchmarks.datagen --owners 5 --customers 200 --invoices 5000 \\
+        --database-url sqlite:////tmp/billder-load.sqlite3
+"""
+import argparse
+import json
+import random
+import uuid
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from . import setup_django
+
+PASSWORD = 'load-test-password'
+FIRST_NAMES = ['John', 'Jane', 'Ali', 'Maria', 'Wei', 'Fatima', 'Lucas', 'Aiko', 'Omar', 'Sofia']
+LAST_NAMES = ['Smith', 'Doe', 'Tremblay', 'Nguyen', 'Garcia', 'Khan', 'Rossi', 'Sato', 'Haddad', 'Roy']
+# Relative weights of seeded payment statuses
+PAYMENT_STATUSES = {
+    'succeeded': 50,
+    'pending': 15,
+    'processing': 5,
+    'failed': 10,
+    'canceled': 5,
+    'refunded': 15,
+}
+# Fixed clock so created/due dates don't depend on when the data was generated
+EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+@dataclass
+class Dataset:
+    """What the load scenarios need to know about the seeded rows"""
+    seed: int
+    owners: list = field(default_factory=list)        # user ids
+    customers: list = field(default_factory=list)     # user ids
+    invoices: list = field(default_factory=list)      # {id, owner, customer, slug, balance}
+    payments: dict = field(default_factory=dict)      # status -> [{id, owner, intent, charge, amount}]
+
+    def summary(self):
+        return {
+            'seed': self.seed,
+            'owners': len(self.owners),
+            'customers': len(self.customers),
+            'invoices': len(self.invoices),
+            'payments': {status: len(rows) for status, rows in self.payments.items()},
+        }
+
+
+def make_uuid(rng):
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+
+def generate(owners=5, customers=200, invoices=5000, max_payments=3, seed=0, batch_size=2000):
+    """Seed the database; returns a Dataset describing what was created"""
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import make_password
+    from finance.models import Invoice, Payment
+    from finance.public_links import make_public_slug
+    from finance.search import rebuild_documents
+
+    User = get_user_model()
+    rng = random.Random(seed)
+    dataset = Dataset(seed=seed, payments={status: [] for status in PAYMENT_STATUSES})
+    # One hash for every user: hashing is deliberately slow
+    password = make_password(PASSWORD, salt='billderloadtest')
+
+    users = [
+        User(email=f'owner{n}@load.test', password=password, first_name=rng.choice(FIRST_NAMES),
+             last_name=rng.choice(LAST_NAMES), role='business_owner', created_at=EPOCH)
+        for n in range(owners)
+    ] + [
+        User(email=f'customer{n}@load.test', password=password, first_name=rng.choice(FIRST_NAMES),
+             last_name=rng.choice(LAST_NAMES), role='customer', created_at=EPOCH)
+        for n in range(customers)
+    ]
+    User.objects.bulk_create(users, batch_size=batch_size)
+    ids = dict(User.objects.filter(email__endswith='@load.test').values_list('email', 'id'))
+    dataset.owners = [ids[f'owner{n}@load.test'] for n in range(owners)]
+    dataset.customers = [ids[f'customer{n}@load.test'] for n in range(customers)]
+
+    statuses, weights = list(PAYMENT_STATUSES), list(PAYMENT_STATUSES.values())
+    invoice_rows, payment_rows = [], []
+    for n in range(invoices):
+        owner = dataset.owners[n % owners]
+        customer = rng.choice(dataset.customers)
+        total = Decimal(rng.randrange(5000, 500000)) / 100
+        paid = Decimal('0.00')
+        invoice = Invoice(
+            id=make_uuid(rng), reference=f'LOAD-{n:07d}', public_slug=make_public_slug(f'{n:016x}'),
+            owner_id=owner, customer_id=customer, total_amount=total,
+            due_date=EPOCH.date() + timedelta(days=rng.randrange(-60, 90)),
+        )
+        for _ in range(rng.randrange(max_payments + 1)):
+            status = rng.choices(statuses, weights)[0]
+            amount = min(Decimal(rng.randrange(100, 50000)) / 100, total)
+            number = len(payment_rows)
+            payment = Payment(
+                id=make_uuid(rng), invoice=invoice, amount=amount, status=status,
+                external_payment_id=f'pi_load_{number:08d}', client_secret=f'pi_load_{number:08d}_secret',
+                description=f'Payment {number} for {invoice.reference}',
+            )
+            if status in ('succeeded', 'refunded'):
+                payment.external_charge_id = f'ch_load_{number:08d}'
+                payment.processed_at = EPOCH
+                paid += amount
+            if status == 'refunded':
+                payment.status = Payment.Status.SUCCEEDED
+                payment.refund_amount = amount
+                payment.refund_status = Payment.Status.SUCCEEDED
+                payment.external_refund_id = f're_load_{number:08d}'
+                payment.refunded_at = EPOCH
+                paid -= amount
+            payment_rows.append(payment)
+            dataset.payments[status].append({
+                'id': str(payment.id), 'owner': owner, 'intent': payment.external_payment_id,
+                'charge': payment.external_charge_id, 'amount': str(amount),
+            })
+        invoice.amount_paid = min(paid, total)
+        if invoice.amount_paid >= total:
+            invoice.status = Invoice.Status.PAID
+        elif invoice.amount_paid > 0:
+            invoice.status = Invoice.Status.PARTIALLY_PAID
+        invoice_rows.append(invoice)
+        dataset.invoices.append({
+            'id': str(invoice.id), 'owner': owner, 'customer': customer,
+            'slug': invoice.public_slug, 'balance': str(total - invoice.amount_paid),
+        })
+
+    Invoice.objects.bulk_create(invoice_rows, batch_size=batch_size)
+    Payment.objects.bulk_create(payment_rows, batch_size=batch_size)
+    # bulk_create skips the signals that index new rows
+    rebuild_documents(Invoice, Payment)
+    return dataset
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='defaults to a throwaway SQLite file')
+    parser.add_argument('--owners', type=int, default=5)
+    parser.add_argument('--customers', type=int, default=200)
+    parser.add_argument('--invoices', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help='print the full dataset as JSON')
+    args = parser.parse_args()
+
+    setup_django(args.database_url)
+    dataset = generate(args.owners, args.customers, args.invoices, seed=args.seed)
+    print(json.dumps(asdict(dataset) if args.json else dataset.summary(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
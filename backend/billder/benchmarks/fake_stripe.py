@@ -0,0 +1,489 @@
+"""
+Fake of the Stripe API endpoints ``StripePaymentService`` calls, for
+benchmarking checkout and webhook throughput offline.
+
+Point the service at it with ``STRIPE_API_BASE``. The ``stripe`` client
+sends its usual form-encoded requests, and any ``sk_`` key is accepted::
+
+    state, server = start(FakeStripe(latency_ms=80, error_rate=0.01))
+    os.environ['STRIPE_API_BASE'] = server.url
+
+or run it standalone next to ``manage.py runserver``::
+
+    python -m benchmarks.fake_stripe --port 12111 --latency-ms 80 --jitter-ms 40 \\
+        --error-rate 0.01 --webhook-url http://127.0.0.1:8000/api/finance/webhooks/stripe/ \\
+        --webhook-secret whsec_load --webhook-rate 50
+
+Supported calls: PaymentIntent create/retrieve/confirm/cancel, Charge list,
+Refund create and Event list. Confirming with ``pm_card_chargeDeclined`` fails with a
+card error, like Stripe's test card of the same name.
+
+Every call waits ``latency_ms`` plus up to ``jitter_ms``. A fraction
+``error_rate`` of calls fails with one of the ``errors`` kinds: ``api_error``
+is a 500, ``rate_limit`` a 429. Note that the ``stripe`` client retries the
+500s (``stripe.max_network_retries``) but not the 429s. Ids come from counters and faults from a
+seeded RNG, so a sequential run is reproducible.
+
+Confirmations, cancellations and refunds record ``payment_intent.*`` and
+``charge.refunded`` events. POSTs with an ``Idempotency-Key`` header are
+replayed from the first response with that key, as Stripe does; injected
+faults still apply to the replay. A ``WebhookEmitter`` posts them, signed the way
+``stripe.Webhook.construct_event`` verifies, to ``stripe_webhook`` at a
+configurable rate.
+"""
+import argparse
+import hashlib
+import hmac
+import http.client
+import itertools
+import json
+import queue
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+DECLINED_PAYMENT_METHOD = 'pm_card_chargeDeclined'
+API_VERSION = '2024-06-20'
+# Injectable failures: kind -> (HTTP status, error type, message, code)
+INJECTED_ERRORS = {
+    'api_error': (500, 'api_error', 'An unknown error occurred (injected by fake Stripe).', None),
+    'rate_limit': (429, 'invalid_request_error', 'Too many requests (injected by fake Stripe).', 'rate_limit'),
+}
+
+
+class StripeError(Exception):
+    def __init__(self, status, type, message, code=None):
+        super().__init__(message)
+        self.status = status
+        self.body = {'error': {'type': type, 'message': message, **({'code': code} if code else {})}}
+
+
+def not_found(kind, id):
+    return StripeError(404, 'invalid_request_error', f"No such {kind}: '{id}'", 'resource_missing')
+
+
+def parse_form(body):
+    """Decode Stripe's form encoding, e.g. ``metadata[invoice_id]=...``, into nested dicts"""
+    params = {}
+    for key, value in parse_qsl(body, keep_blank_values=True):
+        *path, name = re.findall(r'[^\[\]]+', key)
+        target = params
+        for part in path:
+            target = target.setdefault(part, {})
+        target[name] = value
+    return params
+
+
+def sign_payload(payload, secret, timestamp=None):
+    """A ``Stripe-Signature`` header for payload, as ``stripe.Webhook`` verifies it"""
+    timestamp = int(timestamp if timestamp is not None else time.time())
+    signature = hmac.new(secret.encode(), f'{timestamp}.'.encode() + payload, hashlib.sha256).hexdigest()
+    return f't={timestamp},v1={signature}'
+
+
+class FakeStripe:
+    """Payment intents, charges and refunds, kept in memory"""
+
+    def __init__(self, latency_ms=0, jitter_ms=0, error_rate=0.0, errors=tuple(INJECTED_ERRORS), seed=0):
+        unknown = set(errors) - set(INJECTED_ERRORS)
+        if unknown:
+            raise ValueError(f"Unknown error kinds {sorted(unknown)}. Valid options: {list(INJECTED_ERRORS)}")
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.errors = list(errors)
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.intents = {}
+        self.charges = {}
+        self.refunds = {}
+        self.events = []
+        self.idempotent = {}
+        self.listeners = []
+        self.counter = itertools.count(1)
+        self.requests = itertools.count(1)
+
+    def fault(self):
+        """The delay (seconds) and injected error, if any, for the next call"""
+        with self.lock:
+            delay = (self.latency_ms + self.rng.uniform(0, self.jitter_ms)) / 1000
+            if self.errors and self.rng.random() < self.error_rate:
+                return delay, StripeError(*INJECTED_ERRORS[self.rng.choice(self.errors)])
+        return delay, None
+
+    def subscribe(self, listener):
+        """Call listener(event) for every event recorded from now on"""
+        self.listeners.append(listener)
+
+    def emit(self, type, obj):
+        """Record an event with a snapshot of obj; callers hold the lock"""
+        event = {
+            'id': self.next_id('evt'), 'object': 'event', 'api_version': API_VERSION,
+            'created': int(time.time()), 'livemode': False, 'pending_webhooks': len(self.listeners),
+            'type': type, 'data': {'object': json.loads(json.dumps(obj))},
+        }
+        self.events.append(event)
+        for listener in self.listeners:
+            listener(event)
+        return event
+
+    def next_id(self, prefix):
+        return f'{prefix}_fake_{next(self.counter):010d}'
+
+    def add_intent(self, id, amount, status='requires_payment_method', charge=None, currency='cad'):
+        """Register an intent created outside the fake, e.g. by seeded payments"""
+        with self.lock:
+            intent = {
+                'id': id, 'object': 'payment_intent', 'amount': amount, 'currency': currency,
+                'status': status, 'client_secret': f'{id}_secret', 'metadata': {},
+                'payment_method_types': ['card'], 'latest_charge': charge,
+            }
+            self.intents[id] = intent
+            if charge:
+                self.charges[charge] = self.charge(charge, intent)
+            return intent
+
+    def charge(self, id, intent):
+        return {
+            'id': id, 'object': 'charge', 'amount': intent['amount'], 'amount_refunded': 0,
+            'currency': intent['currency'], 'payment_intent': intent['id'], 'status': 'succeeded',
+            'paid': True, 'refunded': False,
+        }
+
+    def get_intent(self, id):
+        try:
+            return self.intents[id]
+        except KeyError:
+            raise not_found('payment_intent', id)
+
+    def create_intent(self, params):
+        try:
+            amount = int(params['amount'])
+        except (KeyError, ValueError):
+            raise StripeError(400, 'invalid_request_error', 'Missing required param: amount.', 'parameter_missing')
+        with self.lock:
+            id = self.next_id('pi')
+            intent = {
+                'id': id, 'object': 'payment_intent', 'amount': amount,
+                'currency': params.get('currency', 'cad'), 'status': 'requires_payment_method',
+                'client_secret': f'{id}_secret', 'metadata': params.get('metadata', {}),
+                'payment_method_types': list(params.get('payment_method_types', {'0': 'card'}).values()),
+                'latest_charge': None, 'created': int(time.time()),
+            }
+            self.intents[id] = intent
+            return intent
+
+    def confirm_intent(self, id, params):
+        with self.lock:
+            intent = self.get_intent(id)
+            if intent['status'] not in ('requires_payment_method', 'requires_confirmation'):
+                raise StripeError(400, 'invalid_request_error',
+                                  f"This PaymentIntent's status is {intent['status']} and cannot be confirmed.",
+                                  'payment_intent_unexpected_state')
+            payment_method = params.get('payment_method')
+            if not payment_method:
+                raise StripeError(400, 'invalid_request_error',
+                                  'You cannot confirm this PaymentIntent because it\'s missing a payment method.',
+                                  'payment_intent_unexpected_state')
+            if payment_method == DECLINED_PAYMENT_METHOD:
+                intent['status'] = 'requires_payment_method'
+                intent['last_payment_error'] = {'type': 'card_error', 'code': 'card_declined',
+                                                'message': 'Your card was declined.'}
+                self.emit('payment_intent.payment_failed', intent)
+                raise StripeError(402, 'card_error', 'Your card was declined.', 'card_declined')
+            charge = self.charge(self.next_id('ch'), intent)
+            self.charges[charge['id']] = charge
+            intent.update(status='succeeded', latest_charge=charge['id'], payment_method=payment_method,
+                          last_payment_error=None)
+            self.emit('payment_intent.succeeded', intent)
+            return intent
+
+    def cancel_intent(self, id):
+        with self.lock:
+            intent = self.get_intent(id)
+            if intent['status'] in ('succeeded', 'canceled'):
+                raise StripeError(400, 'invalid_request_error',
+                                  f"You cannot cancel this PaymentIntent because it has a status of {intent['status']}.",
+                                  'payment_intent_unexpected_state')
+            intent['status'] = 'canceled'
+            self.emit('payment_intent.canceled', intent)
+            return intent
+
+    def list_charges(self, params):
+        with self.lock:
+            data = [charge for charge in self.charges.values()
+                    if charge['payment_intent'] == params.get('payment_intent', charge['payment_intent'])]
+        return {'object': 'list', 'data': data, 'has_more': False, 'url': '/v1/charges'}
+
+    def create_refund(self, params):
+        with self.lock:
+            charge_id = params.get('charge')
+            if charge_id not in self.charges:
+                raise not_found('charge', charge_id)
+            charge = self.charges[charge_id]
+            amount = int(params.get('amount', charge['amount'] - charge['amount_refunded']))
+            if amount > charge['amount'] - charge['amount_refunded']:
+                raise StripeError(400, 'invalid_request_error',
+                                  f'Refund amount ({amount}) is greater than unrefunded amount on charge.',
+                                  'amount_too_large')
+            charge['amount_refunded'] += amount
+            charge['refunded'] = charge['amount_refunded'] == charge['amount']
+            refund = {
+                'id': self.next_id('re'), 'object': 'refund', 'amount': amount, 'charge': charge_id,
+                'currency': charge['currency'], 'payment_intent': charge['payment_intent'], 'status': 'succeeded',
+            }
+            self.refunds[refund['id']] = refund
+            self.emit('charge.refunded', charge)
+            return refund
+
+    def list_events(self, params):
+        """Events newest first, filtered by created[gte/gt/lte/lt] and types, paged by starting_after"""
+        bounds = params.get('created', {})
+        types = set((params.get('types') or {}).values()) or ({params['type']} if 'type' in params else None)
+        checks = {'gte': int.__ge__, 'gt': int.__gt__, 'lte': int.__le__, 'lt': int.__lt__}
+        with self.lock:
+            events = [
+                event for event in reversed(self.events)
+                if (types is None or event['type'] in types)
+                and all(checks[op](event['created'], int(value)) for op, value in bounds.items() if op in checks)
+            ]
+        events.sort(key=lambda event: -event['created'])
+        if 'starting_after' in params:
+            ids = [event['id'] for event in events]
+            if params['starting_after'] not in ids:
+                raise not_found('event', params['starting_after'])
+            events = events[ids.index(params['starting_after']) + 1:]
+        limit = min(int(params.get('limit', 10)), 100)
+        return {'object': 'list', 'data': events[:limit], 'has_more': len(events) > limit, 'url': '/v1/events'}
+
+    def replay(self, key):
+        """The stored (status, body) of an earlier POST with this Idempotency-Key, if any"""
+        with self.lock:
+            return self.idempotent.get(key)
+
+    def remember(self, key, status, body):
+        """Store a POST's result; like Stripe, 500s are not stored so a retry runs again"""
+        if status < 500:
+            with self.lock:
+                self.idempotent.setdefault(key, (status, body))
+
+    def dispatch(self, method, path, params):
+        """Route one API call; returns the response object or raises StripeError"""
+        parts = path.strip('/').split('/')
+        if parts[:1] != ['v1']:
+            raise StripeError(404, 'invalid_request_error', f'Unrecognized request URL ({method}: {path}).')
+        parts = parts[1:]
+        if parts == ['payment_intents'] and method == 'POST':
+            return self.create_intent(params)
+        if len(parts) == 2 and parts[0] == 'payment_intents' and method == 'GET':
+            return self.get_intent(parts[1])
+        if len(parts) == 3 and parts[0] == 'payment_intents' and method == 'POST':
+            if parts[2] == 'confirm':
+                return self.confirm_intent(parts[1], params)
+            if parts[2] == 'cancel':
+                return self.cancel_intent(parts[1])
+        if parts == ['charges'] and method == 'GET':
+            return self.list_charges(params)
+        if parts == ['refunds'] and method == 'POST':
+            return self.create_refund(params)
+        if parts == ['events'] and method == 'GET':
+            return self.list_events(params)
+        raise StripeError(404, 'invalid_request_error', f'Unrecognized request URL ({method}: {path}).')
+
+
+class StripeRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        self.handle_api('GET', url.path, parse_form(url.query))
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0)).decode()
+        self.handle_api('POST', urlsplit(self.path).path, parse_form(body))
+
+    def handle_api(self, method, path, params):
+        state = self.server.state
+        stored = None
+        try:
+            if not (self.headers.get('Authorization') or '').startswith('Bearer sk_'):
+                raise StripeError(401, 'invalid_request_error', 'Invalid API Key provided.')
+            delay, error = state.fault()
+            if delay:
+                time.sleep(delay)
+            if error:
+                raise error
+            key = self.headers.get('Idempotency-Key') if method == 'POST' else None
+            stored = key and state.replay(key)
+            if stored:
+                status, body = stored
+            else:
+                try:
+                    status, body = 200, state.dispatch(method, path, params)
+                except StripeError as e:
+                    status, body = e.status, e.body
+                if key:
+                    state.remember(key, status, body)
+        except StripeError as e:
+            status, body = e.status, e.body
+        except Exception as e:
+            status, body = 500, {'error': {'type': 'api_error', 'message': f'Fake Stripe failed: {e}'}}
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        if stored:
+            self.send_header('Idempotent-Replayed', 'true')
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.send_header('Request-Id', f'req_fake_{next(state.requests)}')
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeStripeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, state):
+        super().__init__(address, StripeRequestHandler)
+        self.state = state
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+
+def start(state=None, host='127.0.0.1', port=0):
+    """Serve a FakeStripe from a background thread; returns (state, server)"""
+    state = state or FakeStripe()
+    server = FakeStripeServer((host, port), state)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return state, server
+
+
+class WebhookEmitter:
+    """
+    Posts events to a webhook endpoint, signed with secret.
+
+    Deliveries are paced to at most ``rate`` per second (unpaced when None).
+    Non-2xx responses and connection errors are retried ``retries`` times
+    with exponential backoff from ``backoff`` seconds, like Stripe's own
+    retries on a much shorter clock.
+    """
+
+    def __init__(self, url, secret, rate=None, retries=3, backoff=0.5, timeout=10):
+        self.url = urlsplit(url)
+        self.secret = secret
+        self.interval = 1 / rate if rate else 0
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.queue = queue.Queue()
+        self.delivered = 0
+        self.failed = 0
+        self.pending = 0
+        self.idle = threading.Condition()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def enqueue(self, event):
+        with self.idle:
+            self.pending += 1
+        self.queue.put((event, 0))
+
+    def run(self):
+        next_at = time.monotonic()
+        while True:
+            event, attempt = self.queue.get()
+            if event is None:
+                return
+            wait = next_at - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            next_at = max(next_at, time.monotonic()) + self.interval
+
+            if self.deliver(event):
+                self.settle(delivered=True)
+            elif attempt < self.retries:
+                retry = threading.Timer(self.backoff * 2 ** attempt, self.queue.put, [(event, attempt + 1)])
+                retry.daemon = True
+                retry.start()
+            else:
+                self.settle(delivered=False)
+
+    def settle(self, delivered):
+        with self.idle:
+            if delivered:
+                self.delivered += 1
+            else:
+                self.failed += 1
+            self.pending -= 1
+            self.idle.notify_all()
+
+    def deliver(self, event):
+        payload = json.dumps(event).encode()
+        connection = http.client.HTTPConnection(self.url.hostname, self.url.port or 80, timeout=self.timeout)
+        try:
+            connection.request('POST', self.url.path or '/', body=payload, headers={
+                'Content-Type': 'application/json',
+                'Stripe-Signature': sign_payload(payload, self.secret),
+            })
+            return 200 <= connection.getresponse().status < 300
+        except (OSError, http.client.HTTPException):
+            return False
+        finally:
+            connection.close()
+
+    def wait(self, timeout=None):
+        """Block until every enqueued event was delivered or gave up; returns False on timeout"""
+        with self.idle:
+            return self.idle.wait_for(lambda: self.pending == 0, timeout)
+
+    def stop(self):
+        self.queue.put((None, 0))
+        self.thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=12111)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0, help='fraction of calls that fail')
+    parser.add_argument('--errors', nargs='+', choices=list(INJECTED_ERRORS), default=list(INJECTED_ERRORS))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--webhook-url', help='post events here, e.g. the stripe_webhook URL')
+    parser.add_argument('--webhook-secret', default='whsec_load', help="the server's STRIPE_WEBHOOK_SECRET")
+    parser.add_argument('--webhook-rate', type=float, help='max deliveries per second')
+    args = parser.parse_args()
+
+    state = FakeStripe(args.latency_ms, args.jitter_ms, args.error_rate, args.errors, args.seed)
+    emitter = None
+    if args.webhook_url:
+        emitter = WebhookEmitter(args.webhook_url, args.webhook_secret, args.webhook_rate).start()
+        state.subscribe(emitter.enqueue)
+    server = FakeStripeServer((args.host, args.port), state)
+    print(f'Fake Stripe API on {server.url} (STRIPE_API_BASE={server.url})')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    print(f'{len(state.intents)} payment intents, {len(state.events)} events', end='')
+    if emitter:
+        print(f', {emitter.delivered} webhooks delivered, {emitter.failed} failed', end='')
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,338 @@
+"""
+End-to-end load test of the API: seeded data, a real application server,
+a fake Stripe and scripted scenarios, reported as req/s and p50/p95/p99
+latency per endpoint::
+
+    python -m benchmarks.load --seconds 20 --clients 8 --output load.json
+
+Scenarios (``--scenarios`` picks a subset; each runs for ``--seconds``):
+
+- ``dashboard``: an owner lists invoices (plain and searched), payments and refunds
+- ``checkout``: a customer creates a payment intent and confirms it
+- ``webhook_storm``: signed ``payment_intent.*`` events for pending payments
+- ``refund_burst``: owners refund slices of succeeded payments
+- ``public_invoice``: anonymous public invoice views across many slugs
+
+The server runs in a subprocess (``--server``, as in
+``benchmarks.server_throughput``) with ``benchmarks.settings``; the fake
+Stripe runs in this process and the server reaches it through
+``STRIPE_API_BASE``. ``--stripe-latency-ms``/``--stripe-error-rate`` slow
+it down or make it fail, and ``--webhooks`` has it post signed events for
+the payments it confirms back to the server, as Stripe would. Data comes from ``benchmarks.datagen`` with ``--seed``,
+and each client thread draws from its own seeded RNG, so runs with the
+same arguments issue the same request mix. The JSON report records the
+arguments next to the results for regression tracking.
+"""
+import argparse
+import http.client
+import itertools
+import json
+import os
+import platform
+import random
+import signal
+import subprocess
+import threading
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from . import PROJECT_DIR, print_table, setup_django
+from .datagen import generate
+from .fake_stripe import FakeStripe, WebhookEmitter, sign_payload, start
+from .server_throughput import CONFIGS, free_port, wait_until_up
+
+SEARCH_TERMS = ['load-00', 'smith', 'maria', 'tremblay', '@load.test', 'customer1']
+# payment_intent.* events sent by the webhook storm: (intent status, relative weight)
+WEBHOOK_EVENTS = {
+    'succeeded': ('succeeded', 8),
+    'payment_failed': ('requires_payment_method', 1),
+    'canceled': ('canceled', 1),
+}
+
+
+class LoadClient:
+    """One keep-alive connection to the server, recording every request by endpoint"""
+
+    def __init__(self, port, latencies, statuses):
+        self.port = port
+        self.latencies = latencies
+        self.statuses = statuses
+        self.connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+
+    def request(self, endpoint, method, path, body=None, token=None, headers=None):
+        """Send one request; returns (status, decoded JSON body or None)"""
+        headers = dict(headers or {})
+        if token:
+            headers['Authorization'] = f'Token {token}'
+        if isinstance(body, dict):
+            body = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        started = time.perf_counter()
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            content = response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+            self.statuses[endpoint]['connection_error'] += 1
+            return None, None
+        self.latencies[endpoint].append(time.perf_counter() - started)
+        self.statuses[endpoint][str(response.status)] += 1
+        if response.getheader('Content-Type', '').startswith('application/json') and \
+                not response.getheader('Content-Encoding'):
+            return response.status, json.loads(content)
+        return response.status, None
+
+    def close(self):
+        self.connection.close()
+
+
+@dataclass
+class Context:
+    """State shared by every client of a run"""
+    dataset: object
+    tokens: dict
+    webhook_secret: str
+    # Invoices with a balance left for checkouts
+    payable: list = field(default_factory=list)
+    # Shared cursors so concurrent clients work on different rows
+    cursors: dict = field(default_factory=lambda: defaultdict(itertools.count))
+
+    def next(self, name, rows):
+        return rows[next(self.cursors[name]) % len(rows)]
+
+
+def dashboard(ctx, client, rng):
+    token = ctx.tokens[rng.choice(ctx.dataset.owners)]
+    client.request('GET /api/invoices/', 'GET', '/api/invoices/', token=token)
+    client.request('GET /api/invoices/?search=', 'GET',
+                   f'/api/invoices/?search={rng.choice(SEARCH_TERMS)}', token=token)
+    client.request('GET /api/payments/', 'GET', '/api/payments/', token=token)
+    client.request('GET /api/payments/refunds/', 'GET', '/api/payments/refunds/', token=token)
+
+
+def checkout(ctx, client, rng):
+    invoice = ctx.next('checkout', ctx.payable)
+    token = ctx.tokens[invoice['customer']]
+    status, body = client.request('POST /api/payments/create_payment/', 'POST', '/api/payments/create_payment/', {
+        'invoice_id': invoice['id'], 'amount': '1.00', 'currency': 'CAD', 'payment_method': 'card',
+        'description': 'Load test checkout',
+    }, token=token)
+    if status != 201:
+        return
+    client.request('POST /api/payments/confirm_payment/', 'POST', '/api/payments/confirm_payment/', {
+        'payment_intent_id': body['payment']['external_payment_id'], 'payment_method_id': 'pm_card_visa',
+    }, token=token)
+
+
+def webhook_storm(ctx, client, rng):
+    payment = ctx.next('webhook_storm', ctx.dataset.payments['pending'])
+    kind = rng.choices(list(WEBHOOK_EVENTS), [weight for _, weight in WEBHOOK_EVENTS.values()])[0]
+    event = {
+        'id': f'evt_load_{rng.getrandbits(48):012x}', 'object': 'event', 'type': f'payment_intent.{kind}',
+        'created': int(time.time()), 'livemode': False,
+        'data': {'object': {
+            'id': payment['intent'], 'object': 'payment_intent', 'status': WEBHOOK_EVENTS[kind][0],
+            'latest_charge': f"ch_{payment['intent']}" if kind == 'succeeded' else None,
+        }},
+    }
+    payload = json.dumps(event).encode()
+    client.request('POST /api/finance/webhooks/stripe/', 'POST', '/api/finance/webhooks/stripe/', payload, headers={
+        'Content-Type': 'application/json', 'Stripe-Signature': sign_payload(payload, ctx.webhook_secret),
+    })
+
+
+def refund_burst(ctx, client, rng):
+    payment = ctx.next('refund_burst', ctx.dataset.payments['succeeded'])
+    client.request('POST /api/payments/create_refund/', 'POST', '/api/payments/create_refund/', {
+        'payment_id': payment['id'], 'amount': '0.01', 'reason': 'Load test refund',
+    }, token=ctx.tokens[payment['owner']])
+
+
+def public_invoice(ctx, client, rng):
+    invoice = rng.choice(ctx.dataset.invoices)
+    client.request('GET /api/public/invoice/<slug>/', 'GET', f"/api/public/invoice/{invoice['slug']}/",
+                   headers={'Accept-Encoding': 'br, gzip'})
+
+
+SCENARIOS = {
+    'dashboard': dashboard,
+    'checkout': checkout,
+    'webhook_storm': webhook_storm,
+    'refund_burst': refund_burst,
+    'public_invoice': public_invoice,
+}
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def run_scenario(scenario, ctx, port, clients, seconds, seed):
+    """Run scenario from concurrent clients; returns per-endpoint stats"""
+    results = []
+    deadline = time.monotonic() + seconds
+
+    def worker(index):
+        latencies, statuses = defaultdict(list), defaultdict(Counter)
+        client = LoadClient(port, latencies, statuses)
+        rng = random.Random(f'{seed}-{scenario.__name__}-{index}')
+        iterations = 0
+        while time.monotonic() < deadline:
+            scenario(ctx, client, rng)
+            iterations += 1
+        client.close()
+        results.append((iterations, latencies, statuses))
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    latencies, statuses = defaultdict(list), defaultdict(Counter)
+    for _, client_latencies, client_statuses in results:
+        for endpoint, values in client_latencies.items():
+            latencies[endpoint].extend(values)
+        for endpoint, counts in client_statuses.items():
+            statuses[endpoint].update(counts)
+
+    endpoints = {}
+    for endpoint in sorted(statuses):
+        values = sorted(latencies[endpoint])
+        counts = statuses[endpoint]
+        errors = sum(count for code, count in counts.items() if not code.startswith(('2', '3')))
+        endpoints[endpoint] = {
+            'requests': sum(counts.values()),
+            'errors': errors,
+            'req_per_sec': round(sum(counts.values()) / elapsed, 1),
+            'p50_ms': round(percentile(values, 0.50) * 1000, 2) if values else None,
+            'p95_ms': round(percentile(values, 0.95) * 1000, 2) if values else None,
+            'p99_ms': round(percentile(values, 0.99) * 1000, 2) if values else None,
+            'max_ms': round(values[-1] * 1000, 2) if values else None,
+            'statuses': dict(sorted(counts.items())),
+        }
+    iterations = sum(result[0] for result in results)
+    return {
+        'seconds': round(elapsed, 2),
+        'iterations': iterations,
+        'iterations_per_sec': round(iterations / elapsed, 1),
+        'endpoints': endpoints,
+    }
+
+
+def prepare(dataset, stripe):
+    """Tokens for every seeded user, and seeded Stripe objects in the fake"""
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from users.tokens import issue_token
+
+    users = get_user_model().objects.filter(pk__in=dataset.owners + dataset.customers)
+    tokens = {user.pk: issue_token(user) for user in users}
+    for status in ('succeeded', 'refunded'):
+        for payment in dataset.payments[status]:
+            stripe.add_intent(payment['intent'], int(Decimal(payment['amount']) * 100), 'succeeded',
+                              payment['charge'])
+    for payment in dataset.payments['pending']:
+        stripe.add_intent(payment['intent'], int(Decimal(payment['amount']) * 100))
+
+    return Context(
+        dataset=dataset, tokens=tokens, webhook_secret=settings.STRIPE_WEBHOOK_SECRET,
+        payable=[invoice for invoice in dataset.invoices if Decimal(invoice['balance']) >= 1],
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='defaults to a throwaway SQLite file')
+    parser.add_argument('--server', choices=list(CONFIGS), default='gunicorn-threaded')
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--seconds', type=float, default=10, help='duration of each scenario')
+    parser.add_argument('--warmup', type=float, default=1, help='unrecorded seconds before each scenario')
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--owners', type=int, default=5)
+    parser.add_argument('--customers', type=int, default=200)
+    parser.add_argument('--invoices', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--stripe-latency-ms', type=float, default=0, help='fake Stripe latency per call')
+    parser.add_argument('--stripe-jitter-ms', type=float, default=0)
+    parser.add_argument('--stripe-error-rate', type=float, default=0, help='fraction of Stripe calls that fail')
+    parser.add_argument('--webhooks', action='store_true',
+                        help='have the fake Stripe post webhooks for the intents it confirms and cancels')
+    parser.add_argument('--webhook-rate', type=float, help='max webhook deliveries per second')
+    parser.add_argument('--output', help='write the JSON report to this file')
+    parser.add_argument('--json', action='store_true', help='print the JSON report')
+    args = parser.parse_args()
+
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'benchmarks.settings'
+    database_url = setup_django(args.database_url)
+    dataset = generate(args.owners, args.customers, args.invoices, seed=args.seed)
+    stripe, stripe_server = start(FakeStripe(args.stripe_latency_ms, args.stripe_jitter_ms,
+                                             args.stripe_error_rate, seed=args.seed))
+    ctx = prepare(dataset, stripe)
+
+    port = free_port()
+    emitter = None
+    if args.webhooks:
+        emitter = WebhookEmitter(f'http://127.0.0.1:{port}/api/finance/webhooks/stripe/', ctx.webhook_secret,
+                                 args.webhook_rate)
+        stripe.subscribe(emitter.enqueue)
+    env = dict(os.environ, DATABASE_URL=database_url, PORT=str(port), WEB_ACCESS_LOG='',
+               STRIPE_API_BASE=stripe_server.url)
+    if args.server.startswith('gunicorn-'):
+        env['SERVER_PROFILE'] = args.server.split('-', 1)[1]
+    command = [part.format(port=port) for part in CONFIGS[args.server]]
+    server = subprocess.Popen(command, cwd=PROJECT_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                              start_new_session=True)
+    scenarios = {}
+    try:
+        wait_until_up(port)
+        if emitter:
+            emitter.start()
+        for name in args.scenarios:
+            if args.warmup:
+                run_scenario(SCENARIOS[name], ctx, port, args.clients, args.warmup, f'warmup-{args.seed}')
+            scenarios[name] = run_scenario(SCENARIOS[name], ctx, port, args.clients, args.seconds, args.seed)
+        if emitter:
+            emitter.wait(timeout=60)
+    finally:
+        os.killpg(server.pid, signal.SIGTERM)
+        server.wait()
+        stripe_server.shutdown()
+
+    report = {
+        'generated_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'json')},
+        'dataset': dataset.summary(),
+        'scenarios': scenarios,
+    }
+    if emitter:
+        report['webhooks'] = {'events': len(stripe.events), 'delivered': emitter.delivered,
+                              'failed': emitter.failed, 'pending': emitter.pending}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        rows = [
+            {'scenario': name, 'endpoint': endpoint, **{k: v for k, v in stats.items() if k != 'statuses'}}
+            for name, result in scenarios.items() for endpoint, stats in result['endpoints'].items()
+        ]
+        print_table(rows, ['scenario', 'endpoint', 'requests', 'errors', 'req_per_sec',
+                           'p50_ms', 'p95_ms', 'p99_ms', 'max_ms'])
+        if emitter:
+            print('webhooks: ' + ', '.join(f'{key} {value}' for key, value in report['webhooks'].items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Rejection throughput of PublicInvoiceView for slugs no invoice has.
+
+Seeds ``--invoices`` invoices, each with a signed slug and a legacy one, then
+requests the view directly (no HTTP, no throttle) ``--requests`` times per
+kind of bad slug:
+
+- ``lookup``: an unsigned guess, with slug checking patched out, i.e. the
+  view as it was: a cache miss and a DB query per guess
+- ``forged``: a signed-format slug with a wrong HMAC
+- ``legacy_guess``: an unsigned ``invoice-`` plus 8 hex guess, looked up
+  on the legacy slug's unique index
+- ``malformed``: anything else
+
+::
+
+    python -m benchmarks.public_slugs --invoices 20000 --requests 20000
+"""
+import argparse
+import json
+import random
+import time
+from datetime import date, timedelta
+from unittest import mock
+
+from . import print_table, setup_django
+
+KINDS = ('lookup', 'forged', 'legacy_guess', 'malformed')
+
+
+def seed(invoices, batch_size=1000):
+    from django.contrib.auth import get_user_model
+    from finance.models import Invoice
+    from finance.public_links import make_public_slug
+
+    User = get_user_model()
+    owner = User.objects.create_user(email='owner@bench.test', password='x', first_name='Bench',
+                                     last_name='Owner', role='business_owner')
+    customer = User.objects.create_user(email='customer@bench.test', password='x', first_name='Bench',
+                                        last_name='Customer', role='customer')
+    Invoice.objects.bulk_create([
+        Invoice(reference=f'BENCH-{n}', public_slug=make_public_slug(), legacy_public_slug=f'invoice-{n:08x}',
+                owner=owner, customer=customer, total_amount=100, due_date=date.today() + timedelta(days=30))
+        for n in range(invoices)
+    ], batch_size=batch_size)
+
+
+def bad_slug(kind, rng):
+    token = f'{rng.getrandbits(64):016x}'
+    if kind == 'forged':
+        return f'invoice-{token}-{rng.getrandbits(64):016x}'
+    if kind in ('lookup', 'legacy_guess'):
+        return f'invoice-{rng.getrandbits(32) | 1 << 31:08x}'  # above the seeded range
+    return token
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--invoices', type=int, default=20000)
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--kinds', nargs='+', choices=KINDS, default=list(KINDS))
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    setup_django()
+    seed(args.invoices)
+
+    from django.conf import settings
+    from django.db import connection
+    from rest_framework.test import APIRequestFactory
+    from finance.views import PublicInvoiceView
+
+    settings.THROTTLE_RATES = dict.fromkeys(settings.THROTTLE_RATES)
+    view = PublicInvoiceView.as_view()
+    factory = APIRequestFactory()
+
+    results = []
+    for kind in args.kinds:
+        rng = random.Random(0)
+        slugs = [bad_slug(kind, rng) for _ in range(args.requests)]
+        requests = [factory.get(f'/api/public/invoice/{slug}/') for slug in slugs]
+        unchecked = mock.patch('finance.views.canonical_slug', lambda slug: slug)
+        if kind == 'lookup':
+            unchecked.start()
+        queries = []
+        with connection.execute_wrapper(lambda execute, sql, *rest: queries.append(sql) or execute(sql, *rest)):
+            started = time.perf_counter()
+            for request, slug in zip(requests, slugs):
+                response = view(request, public_slug=slug)
+                assert response.status_code == 404, response.status_code
+            seconds = time.perf_counter() - started
+        if kind == 'lookup':
+            unchecked.stop()
+        results.append({
+            'kind': kind,
+            'requests': args.requests,
+            'rejected_per_sec': round(args.requests / seconds),
+            'us_per_request': round(seconds / args.requests * 1e6, 1),
+            'queries_per_request': round(len(queries) / args.requests, 2),
+        })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results, ['kind', 'requests', 'rejected_per_sec', 'us_per_request', 'queries_per_request'])
+
+
+if __name__ == '__main__':
+    main()
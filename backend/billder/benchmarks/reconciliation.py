@@ -0,0 +1,107 @@
+"""
+Throughput of ``reconcile_payments`` against the fake Stripe.
+
+Seeds data with ``benchmarks.datagen`` and settles every pending and
+processing payment's intent in the fake Stripe (``--succeed`` of them
+succeed, ``--fail`` are declined, the rest stay open) without recording
+the change locally, then reconciles them with each ``--workers`` count.
+The database changes are rolled back between runs::
+
+    python -m benchmarks.reconciliation --invoices 20000 --stripe-latency-ms 150 --workers 1 8 16
+
+``--rate-limit-rate`` makes that fraction of Stripe calls answer 429, to
+see what the shared backoff costs.
+"""
+import argparse
+import json
+import os
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from . import print_table, setup_django
+from .datagen import generate
+from .fake_stripe import FakeStripe, start
+
+
+class Rollback(Exception):
+    pass
+
+
+def settle_intents(dataset, stripe, succeed, fail, seed):
+    """Register the open payments' intents, settled in the fake only; returns the expected changes"""
+    rng = random.Random(seed)
+    changes = 0
+    for payment in dataset.payments['pending'] + dataset.payments['processing']:
+        intent = stripe.add_intent(payment['intent'], int(Decimal(payment['amount']) * 100))
+        roll = rng.random()
+        if roll < succeed:
+            charge = stripe.charge(f"ch_reconcile_{payment['intent']}", intent)
+            stripe.charges[charge['id']] = charge
+            intent.update(status='succeeded', latest_charge=charge['id'])
+            changes += 1
+        elif roll < succeed + fail:
+            intent['last_payment_error'] = {'type': 'card_error', 'code': 'card_declined',
+                                            'message': 'Your card was declined.'}
+            changes += 1
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='defaults to a throwaway SQLite file')
+    parser.add_argument('--invoices', type=int, default=20000)
+    parser.add_argument('--succeed', type=float, default=0.6, help='fraction of open intents that succeeded')
+    parser.add_argument('--fail', type=float, default=0.2, help='fraction of open intents that were declined')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 8, 16])
+    parser.add_argument('--batch-size', type=int, default=200)
+    parser.add_argument('--stripe-latency-ms', type=float, default=150)
+    parser.add_argument('--rate-limit-rate', type=float, default=0, help='fraction of Stripe calls that get a 429')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'benchmarks.settings'
+    setup_django(args.database_url)
+    dataset = generate(invoices=args.invoices, seed=args.seed)
+    stripe, server = start(FakeStripe(latency_ms=args.stripe_latency_ms, error_rate=args.rate_limit_rate,
+                                      errors=['rate_limit'], seed=args.seed))
+    changes = settle_intents(dataset, stripe, args.succeed, args.fail, args.seed)
+
+    from django.conf import settings
+    from django.db import transaction
+    from finance.reconciliation import reconcile_payments
+
+    settings.STRIPE_API_BASE = server.url
+    results = []
+    for workers in args.workers:
+        try:
+            with transaction.atomic():
+                started = time.perf_counter()
+                stats = reconcile_payments(stale_after=timedelta(0), limit=None, workers=workers,
+                                           batch_size=args.batch_size, backoff=0.05, max_retries=10)
+                elapsed = time.perf_counter() - started
+                raise Rollback
+        except Rollback:
+            pass
+        if stats.changed != changes or stats.errors:
+            raise AssertionError(f'changed {stats.changed} of {changes} payments ({stats.errors} failed)')
+        results.append({
+            'workers': workers,
+            'payments': stats.checked,
+            'changed': stats.changed,
+            'rate_limited': stats.rate_limited,
+            'seconds': round(elapsed, 2),
+            'payments_per_sec': round(stats.checked / elapsed),
+        })
+    server.shutdown()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results, ['workers', 'payments', 'changed', 'rate_limited', 'seconds', 'payments_per_sec'])
+
+
+if __name__ == '__main__':
+    main()
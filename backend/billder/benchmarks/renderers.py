@@ -0,0 +1,57 @@
+"""
+JSON rendering time for invoice list payloads, DRF JSONRenderer vs orjson.
+
+    python -m benchmarks.renderers --rows 10000
+"""
+import argparse
+import json
+
+from . import print_table, setup_django
+from .serializers import best_of, seed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    setup_django()
+    seed(args.rows)
+
+    from rest_framework.renderers import JSONRenderer
+    from billder.renderers import FastJSONRenderer
+    from finance.fast_serializers import FastInvoiceListSerializer, FastPaymentSerializer
+    from finance.models import Invoice, Payment
+
+    # remaining_balance is a raw Decimal here, so the encoders' fallback is exercised too
+    payloads = {
+        'invoice_list': FastInvoiceListSerializer(Invoice.objects.all()).data,
+        'payment_list': FastPaymentSerializer(Payment.objects.all()).data,
+    }
+
+    results = []
+    for name, payload in payloads.items():
+        expected = JSONRenderer().render(payload)
+        for variant, renderer in (('drf', JSONRenderer()), ('orjson', FastJSONRenderer())):
+            if renderer.render(payload) != expected:
+                raise AssertionError(f'{variant} output differs for {name}')
+            _, seconds = best_of(args.repeat, lambda: renderer.render(payload))
+            results.append({
+                'payload': name,
+                'renderer': variant,
+                'rows': len(payload),
+                'bytes': len(expected),
+                'ms': round(seconds * 1000, 1),
+                'rows_per_sec': round(len(payload) / seconds),
+            })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results, ['payload', 'renderer', 'rows', 'bytes', 'ms', 'rows_per_sec'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Invoice search latency: DRF SearchFilter (joined icontains) vs the indexed
+search documents.
+
+    python -m benchmarks.search --rows 200000
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from . import print_table, setup_django
+
+FIRST_NAMES = ['John', 'Jane', 'Ali', 'Maria', 'Wei', 'Fatima', 'Lucas', 'Aiko', 'Omar', 'Sofia']
+LAST_NAMES = ['Smith', 'Doe', 'Tremblay', 'Nguyen', 'Garcia', 'Khan', 'Rossi', 'Sato', 'Haddad', 'Roy']
+QUERIES = ['INV-0004242', 'INV-00042', 'customer1234@', 'tremblay 1234', 'maria', 'example.com', 'zz']
+
+
+def seed(rows, customers, batch_size=5000):
+    from django.contrib.auth import get_user_model
+    from finance.models import Invoice, InvoiceSearchDocument
+    from finance.search import invoice_document
+
+    User = get_user_model()
+    rng = random.Random(42)
+    owner = User.objects.create_user(email='owner@example.com', password=None, first_name='Bench',
+                                     last_name='Owner', role='business_owner')
+    users = User.objects.bulk_create([
+        User(email=f'customer{i}@example.com', first_name=rng.choice(FIRST_NAMES),
+             last_name=f'{rng.choice(LAST_NAMES)} {i}', role='customer')
+        for i in range(customers)
+    ])
+    today = date.today()
+    for start in range(0, rows, batch_size):
+        invoices = Invoice.objects.bulk_create([
+            Invoice(reference=f'INV-{i:07d}', public_slug=f'bench-{i}', owner=owner,
+                    customer=rng.choice(users), total_amount=Decimal('100.00'),
+                    due_date=today + timedelta(days=30))
+            for i in range(start, min(start + batch_size, rows))
+        ])
+        # bulk_create skips signals, so write the documents directly
+        InvoiceSearchDocument.objects.bulk_create([
+            InvoiceSearchDocument(invoice=invoice, document=invoice_document(invoice))
+            for invoice in invoices
+        ])
+    return owner
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--customers', type=int, default=5000)
+    parser.add_argument('--limit', type=int, default=50, help='rows fetched per search')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    setup_django()
+    owner = seed(args.rows, args.customers)
+
+    # Give the planner the statistics a long-running database has (see
+    # billder.sqlite_backend); a freshly bulk-loaded file has none
+    from django.db import connection
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    from rest_framework import filters
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+    from finance.models import Invoice
+    from finance.search import DocumentSearchFilter
+    from finance.views import InvoiceViewSet
+
+    factory = APIRequestFactory()
+    backends = [('search_filter', filters.SearchFilter()), ('search_document', DocumentSearchFilter())]
+
+    results = []
+    for query in QUERIES:
+        request = Request(factory.get('/api/invoices/', {'search': query}))
+        for name, backend in backends:
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                queryset = backend.filter_queryset(request, Invoice.objects.filter(owner=owner).order_by('-created_at'), InvoiceViewSet)
+                found = len(queryset.values_list('id', flat=True)[:args.limit])
+                timings.append(time.perf_counter() - started)
+            results.append({
+                'query': query,
+                'backend': name,
+                'found': found,
+                'p50_ms': round(statistics.median(timings) * 1000, 2),
+                'max_ms': round(max(timings) * 1000, 2),
+            })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results, ['query', 'backend', 'found', 'p50_ms', 'max_ms'])
+
+
+if __name__ == '__main__':
+    main()
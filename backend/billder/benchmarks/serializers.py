@@ -0,0 +1,88 @@
+"""
+Rows/sec for the invoice and payment list serializers, DRF vs fast path.
+
+    python -m benchmarks.serializers --rows 10000
+"""
+import argparse
+import json
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from . import print_table, setup_django
+
+
+def seed(rows):
+    from django.contrib.auth import get_user_model
+    from finance.models import Invoice, Payment
+
+    User = get_user_model()
+    owner = User.objects.create_user(email='owner@example.com', password=None, first_name='Bench',
+                                     last_name='Owner', role='business_owner')
+    customer = User.objects.create_user(email='customer@example.com', password=None, first_name='Bench',
+                                        last_name='Customer', role='customer')
+    today = date.today()
+    invoices = Invoice.objects.bulk_create([
+        Invoice(reference=f'BENCH-{i}', public_slug=f'bench-{i}', owner=owner, customer=customer,
+                total_amount=Decimal('100.00'), amount_paid=Decimal(i % 100),
+                due_date=today + timedelta(days=i % 60 - 30))
+        for i in range(rows)
+    ])
+    Payment.objects.bulk_create([
+        Payment(invoice=invoice, amount=Decimal('12.34'), status=Payment.Status.SUCCEEDED,
+                external_payment_id=f'pi_{i}')
+        for i, invoice in enumerate(invoices)
+    ])
+
+
+def best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = len(fn())
+        timings.append(time.perf_counter() - started)
+    return rows, min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    setup_django()
+    seed(args.rows)
+
+    from finance.fast_serializers import FastInvoiceListSerializer, FastPaymentSerializer
+    from finance.models import Invoice, Payment
+    from finance.serializers import InvoiceListSerializer, PaymentSerializer
+
+    invoices = Invoice.objects.select_related('customer', 'owner')
+    payments = Payment.objects.select_related('invoice', 'invoice__customer')
+    cases = [
+        ('invoice_list', 'drf', lambda: InvoiceListSerializer(invoices.all(), many=True).data),
+        ('invoice_list', 'fast', lambda: FastInvoiceListSerializer(invoices.all()).data),
+        ('payment_list', 'drf', lambda: PaymentSerializer(payments.all(), many=True).data),
+        ('payment_list', 'fast', lambda: FastPaymentSerializer(payments.all()).data),
+    ]
+
+    results = []
+    for name, variant, fn in cases:
+        rows, seconds = best_of(args.repeat, fn)
+        results.append({
+            'serializer': name,
+            'variant': variant,
+            'rows': rows,
+            'seconds': round(seconds, 3),
+            'rows_per_sec': round(rows / seconds),
+        })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results, ['serializer', 'variant', 'rows', 'seconds', 'rows_per_sec'])
+
+
+if __name__ == '__main__':
+    main()
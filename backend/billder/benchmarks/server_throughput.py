@@ -0,0 +1,153 @@
+"""
+Requests/sec on PublicInvoiceView under each application server config.
+
+Starts the development server and each gunicorn SERVER_PROFILE in turn
+against the same seeded SQLite file, then drives
+/api/public/invoice/<slug>/ from concurrent keep-alive clients::
+
+    python -m benchmarks.server_throughput --seconds 10 --clients 16
+
+The load generator shares the machine with the server, so compare configs
+with each other rather than reading the numbers as absolute capacity.
+"""
+import argparse
+import http.client
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from . import PROJECT_DIR, print_table, setup_django
+
+CONFIGS = {
+    'runserver': [sys.executable, 'manage.py', 'runserver', '{port}'],
+    'gunicorn-sync': ['gunicorn'],
+    'gunicorn-threaded': ['gunicorn'],
+}
+
+
+def seed():
+    """Create one invoice with a few payments; return its public slug"""
+    from django.contrib.auth import get_user_model
+    from finance.models import Invoice, Payment
+
+    User = get_user_model()
+    owner = User.objects.create_user(email='owner@example.com', password=None, first_name='Bench',
+                                     last_name='Owner', role='business_owner')
+    customer = User.objects.create_user(email='customer@example.com', password=None, first_name='Bench',
+                                        last_name='Customer', role='customer')
+    invoice = Invoice.objects.create(owner=owner, customer=customer, total_amount=Decimal('500.00'),
+                                     due_date=date.today() + timedelta(days=30))
+    Payment.objects.bulk_create([
+        Payment(invoice=invoice, amount=Decimal('10.00'), status=Payment.Status.SUCCEEDED)
+        for _ in range(5)
+    ])
+    return invoice.public_slug
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/health/')
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'Server on port {port} did not start')
+
+
+def drive(port, path, clients, seconds):
+    """Hammer path from keep-alive clients; return throughput and latency"""
+    latencies, errors = [], [0]
+    deadline = time.monotonic() + seconds
+
+    def client():
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                connection.request('GET', path)
+                response = connection.getresponse()
+                response.read()
+                if response.status != 200:
+                    errors[0] += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+            except (OSError, http.client.HTTPException):
+                errors[0] += 1
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        connection.close()
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'req_per_sec': round(len(latencies) / seconds, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 2) if latencies else None,
+        'p99_ms': round(latencies[int(len(latencies) * 0.99)] * 1000, 2) if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--configs', nargs='+', choices=list(CONFIGS), default=list(CONFIGS))
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    database_url = setup_django()
+    path = f'/api/public/invoice/{seed()}/'
+
+    results = []
+    for name in args.configs:
+        port = free_port()
+        # All clients share one IP, so the public invoice throttle is off
+        env = dict(os.environ, DATABASE_URL=database_url, PORT=str(port), WEB_ACCESS_LOG='',
+                   THROTTLE_PUBLIC_INVOICE_RATE='off')
+        if name.startswith('gunicorn-'):
+            env['SERVER_PROFILE'] = name.split('-', 1)[1]
+        command = [part.format(port=port) for part in CONFIGS[name]]
+        server = subprocess.Popen(command, cwd=PROJECT_DIR, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                  start_new_session=True)
+        try:
+            wait_until_up(port)
+            drive(port, path, args.clients, 1)  # warm up workers
+            result = drive(port, path, args.clients, args.seconds)
+        finally:
+            os.killpg(server.pid, signal.SIGTERM)
+            server.wait()
+        result['config'] = name
+        results.append(result)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results, ['config', 'requests', 'errors', 'req_per_sec', 'p50_ms', 'p99_ms'])
+
+
+if __name__ == '__main__':
+    main()
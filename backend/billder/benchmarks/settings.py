@@ -0,0 +1,14 @@
+"""
+Settings for servers started by the load harness (``benchmarks.load``).
+
+The development settings plus Stripe credentials the fake Stripe server
+accepts; ``STRIPE_API_BASE`` is set by the harness. Throttles are off: every
+simulated user comes from the same IP.
+"""
+from billder.settings import *  # noqa: F401,F403
+
+STRIPE_PUBLISHABLE_KEY = 'pk_test_load'
+STRIPE_SECRET_KEY = 'sk_test_load'
+STRIPE_WEBHOOK_SECRET = 'whsec_load'
+
+THROTTLE_RATES = dict.fromkeys(THROTTLE_RATES)  # noqa: F405
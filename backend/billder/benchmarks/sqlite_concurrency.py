@@ -0,0 +1,127 @@
+"""
+Concurrent reads while writing on SQLite, with and without tuned pragmas.
+
+Reader threads run the invoice list query while writer threads record
+payments, as webhooks do. The benchmark runs itself once with
+SQLITE_TUNING=false (SQLite defaults, rollback journal) and once with the
+WAL/pragma settings from billder.database::
+
+    python -m benchmarks.sqlite_concurrency
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from . import PROJECT_DIR, print_table, setup_django
+
+
+def run_child(args):
+    """Measure one configuration; prints a JSON result line"""
+    setup_django()
+
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from finance.models import Invoice, Payment
+
+    User = get_user_model()
+    owner = User.objects.create_user(email='owner@example.com', password=None, first_name='Bench',
+                                     last_name='Owner', role='business_owner')
+    customer = User.objects.create_user(email='customer@example.com', password=None, first_name='Bench',
+                                        last_name='Customer', role='customer')
+    due_date = date.today() + timedelta(days=30)
+    invoices = Invoice.objects.bulk_create([
+        Invoice(reference=f'BENCH-{i}', public_slug=f'bench-{i}', owner=owner, customer=customer,
+                total_amount=Decimal('100.00'), due_date=due_date)
+        for i in range(args.invoices)
+    ])
+
+    stop = threading.Event()
+    read_latencies, write_count, errors = [], [0], []
+
+    def reader():
+        try:
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    list(Invoice.objects.filter(owner=owner).select_related('customer')[:50])
+                    read_latencies.append(time.perf_counter() - started)
+                except Exception as e:
+                    errors.append(type(e).__name__)
+        finally:
+            connection.close()
+
+    def writer(worker):
+        try:
+            i = 0
+            while not stop.is_set():
+                try:
+                    Payment.objects.create(invoice=invoices[i % len(invoices)], amount=Decimal('1.00'),
+                                           external_payment_id=f'pi_{worker}_{i}')
+                    write_count[0] += 1
+                except Exception as e:
+                    errors.append(type(e).__name__)
+                i += 1
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=reader) for _ in range(args.readers)]
+    threads += [threading.Thread(target=writer, args=(w,)) for w in range(args.writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    latencies = sorted(read_latencies) or [0]
+    print(json.dumps({
+        'journal_mode': connection.cursor().execute('PRAGMA journal_mode').fetchone()[0],
+        'reads_per_sec': round(len(read_latencies) / args.seconds, 1),
+        'writes_per_sec': round(write_count[0] / args.seconds, 1),
+        'read_p50_ms': round(statistics.median(latencies) * 1000, 2),
+        'read_p95_ms': round(latencies[int(len(latencies) * 0.95)] * 1000, 2),
+        'errors': len(errors),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--invoices', type=int, default=500)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return run_child(args)
+
+    results = []
+    for tuned in ('false', 'true'):
+        env = dict(os.environ, SQLITE_TUNING=tuned)
+        env.pop('DATABASE_URL', None)
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.sqlite_concurrency', '--child'] + sys.argv[1:],
+            cwd=PROJECT_DIR, env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        result['tuned'] = tuned
+        results.append(result)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results, ['tuned', 'journal_mode', 'reads_per_sec', 'writes_per_sec',
+                              'read_p50_ms', 'read_p95_ms', 'errors'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Payment status polling with and without ``finance.status_cache``.
+
+``--pollers`` threads each look up the status of a random one of
+``--intents`` payment intents in the fake Stripe as fast as they can for
+``--seconds``, in three modes:
+
+- ``direct``: ``StripePaymentService.get_payment_status`` on every poll
+- ``coalesced``: ``status_cache.get_payment_status`` with caching off, so
+  only concurrent lookups of the same intent are shared
+- ``cached``: ``status_cache.get_payment_status`` with a ``--timeout`` TTL
+
+::
+
+    python -m benchmarks.status_cache --pollers 32 --intents 10 --stripe-latency-ms 150
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import threading
+import time
+
+from . import print_table, setup_django
+from .fake_stripe import FakeStripe, start
+
+MODES = ('direct', 'coalesced', 'cached')
+
+
+def poll(lookup, intents, seconds, seed):
+    """Poll until the deadline; returns each poll's latency in seconds"""
+    rng = random.Random(seed)
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        result = lookup(rng.choice(intents))
+        if not result['success']:
+            raise AssertionError(result['error'])
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def run(lookup, intents, pollers, seconds):
+    latencies = []
+    threads = [
+        threading.Thread(target=lambda seed=seed: latencies.extend(poll(lookup, intents, seconds, seed)))
+        for seed in range(pollers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pollers', type=int, default=32)
+    parser.add_argument('--intents', type=int, default=10, help='distinct payment intents polled')
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--timeout', type=int, default=5, help='cache TTL in the cached mode')
+    parser.add_argument('--stripe-latency-ms', type=float, default=150)
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'benchmarks.settings'
+    setup_django(migrate=False)
+    stripe, server = start(FakeStripe(latency_ms=args.stripe_latency_ms))
+    intents = [stripe.add_intent(f'pi_poll_{n:04d}', 1000)['id'] for n in range(args.intents)]
+
+    from django.conf import settings
+    from django.core.cache import cache
+    from finance import status_cache
+    from finance.services import get_payment_service
+
+    settings.STRIPE_API_BASE = server.url
+    service = get_payment_service('stripe')
+    lookups = {
+        'direct': service.get_payment_status,
+        'coalesced': status_cache.get_payment_status,
+        'cached': status_cache.get_payment_status,
+    }
+    results = []
+    for mode in args.modes:
+        cache.clear()
+        settings.PAYMENT_STATUS_CACHE_TIMEOUT = args.timeout if mode == 'cached' else 0
+        # Request-Id counter; reading it takes a number too
+        before = next(stripe.requests)
+        latencies = run(lookups[mode], intents, args.pollers, args.seconds)
+        requests = next(stripe.requests) - before - 1
+        results.append({
+            'mode': mode,
+            'polls': len(latencies),
+            'stripe_requests': requests,
+            'polls_per_sec': round(len(latencies) / args.seconds),
+            'p50_ms': round(statistics.median(latencies) * 1000, 1),
+            'p99_ms': round(statistics.quantiles(latencies, n=100)[98] * 1000, 1),
+        })
+    server.shutdown()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results, ['mode', 'polls', 'stripe_requests', 'polls_per_sec', 'p50_ms', 'p99_ms'])
+
+
+if __name__ == '__main__':
+    main()
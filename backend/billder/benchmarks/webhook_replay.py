@@ -0,0 +1,101 @@
+"""
+Recovery time after a webhook outage: ``replay_events`` against the fake Stripe.
+
+Seeds data with ``benchmarks.datagen``, confirms every pending payment's
+intent in the fake Stripe without delivering the webhooks, spreads the
+resulting events over ``--hours``, and replays them with each
+``--workers`` count (the database changes are rolled back between runs)::
+
+    python -m benchmarks.webhook_replay --invoices 20000 --hours 6 --stripe-latency-ms 150
+
+``--stripe-latency-ms`` stands in for the round trip to Stripe, which is
+what concurrent page fetches hide.
+"""
+import argparse
+import json
+import os
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from . import print_table, setup_django
+from .datagen import generate
+from .fake_stripe import FakeStripe, start
+
+
+class Rollback(Exception):
+    pass
+
+
+def simulate_outage(dataset, stripe, hours):
+    """Succeed every pending intent, with events spread evenly over the last `hours`"""
+    pending = dataset.payments['pending']
+    now = int(time.time())
+    with stripe.lock:
+        for n, payment in enumerate(pending):
+            intent = {
+                'id': payment['intent'], 'object': 'payment_intent', 'currency': 'cad', 'status': 'succeeded',
+                'amount': int(Decimal(payment['amount']) * 100), 'latest_charge': f"ch_replay_{n:08d}",
+            }
+            stripe.intents[intent['id']] = intent
+            event = stripe.emit('payment_intent.succeeded', intent)
+            event['created'] = now - int(hours * 3600 * (1 - n / len(pending)))
+    return len(pending)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='defaults to a throwaway SQLite file')
+    parser.add_argument('--invoices', type=int, default=20000)
+    parser.add_argument('--hours', type=float, default=6, help='length of the simulated outage')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--slice-minutes', type=int, default=15)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--stripe-latency-ms', type=float, default=150)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'benchmarks.settings'
+    setup_django(args.database_url)
+    dataset = generate(invoices=args.invoices, seed=args.seed)
+    stripe, server = start(FakeStripe(latency_ms=args.stripe_latency_ms, seed=args.seed))
+    events = simulate_outage(dataset, stripe, args.hours)
+
+    from django.conf import settings
+    from django.db import transaction
+    from django.utils import timezone
+    from finance.webhook_replay import replay_events
+
+    settings.STRIPE_API_BASE = server.url
+    since = timezone.now() - timedelta(hours=args.hours, minutes=1)
+    results = []
+    for workers in args.workers:
+        try:
+            with transaction.atomic():
+                started = time.perf_counter()
+                stats = replay_events(since=since, workers=workers, batch_size=args.batch_size,
+                                      slice_length=timedelta(minutes=args.slice_minutes))
+                elapsed = time.perf_counter() - started
+                raise Rollback
+        except Rollback:
+            pass
+        if stats.applied != events:
+            raise AssertionError(f'applied {stats.applied} of {events} events ({stats.failed} failed)')
+        results.append({
+            'workers': workers,
+            'events': stats.events,
+            'pages': stats.pages,
+            'seconds': round(elapsed, 2),
+            'events_per_sec': round(stats.events / elapsed),
+        })
+    server.shutdown()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results, ['workers', 'events', 'pages', 'seconds', 'events_per_sec'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class BillderConfig(AppConfig):
+    name = 'billder'
+    verbose_name = 'Billder project'
+
+    def ready(self):
+        from . import checks  # noqa: F401
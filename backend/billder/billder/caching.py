@@ -0,0 +1,78 @@
+"""
+Cache configuration from the environment.
+
+``CACHE_URL`` selects the backend of the default cache:
+
+    locmem://                            (each process keeps its own copy)
+    db://billder_cache                   (a table in the default database)
+    redis://cache.internal:6379/0        (also rediss://; needs redis-py)
+    memcached://cache.internal:11211     (comma-separated hosts; needs pymemcache)
+    file:///var/tmp/billder-cache        (one host only)
+
+Public invoice payloads, their invalidations, read-your-writes pins,
+idempotency and rate limits all go through this cache, so behind several
+worker processes it has to be one they share: an invalidation or a pin made
+by one worker must be seen by the next request, whichever worker takes it.
+``billder.checks`` fails when ``CACHE_REQUIRE_SHARED`` is set (production)
+and the cache is local to each process. Use Redis or Memcached: the database
+and file caches are shared, but every hit on them is a query or a file read
+(and expiry a write), which is what the cached paths exist to avoid. The
+database cache needs its table (``manage.py createcachetable``).
+"""
+import os
+from urllib.parse import unquote, urlsplit
+
+DEFAULT_CACHE_URL = 'locmem://'
+
+# Backends whose entries only the process that wrote them can see
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def cache_config(url=None):
+    """Build a ``CACHES['default']`` entry from a cache URL"""
+    url = url or os.environ.get('CACHE_URL') or DEFAULT_CACHE_URL
+    parts = urlsplit(url)
+
+    if parts.scheme == 'locmem':
+        config = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': parts.netloc}
+    elif parts.scheme == 'db':
+        config = {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': parts.netloc}
+    elif parts.scheme in ('redis', 'rediss'):
+        config = {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': url}
+    elif parts.scheme == 'memcached':
+        config = {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': parts.netloc.split(','),
+        }
+    elif parts.scheme == 'file':
+        config = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': unquote(parts.path)}
+    elif parts.scheme == 'dummy':
+        config = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+    else:
+        raise ValueError(f"Unsupported CACHE_URL scheme: {parts.scheme}")
+
+    key_prefix = os.environ.get('CACHE_KEY_PREFIX')
+    if key_prefix:
+        config['KEY_PREFIX'] = key_prefix
+    return config
+
+
+# Backends with an atomic incr, served without a database query
+ATOMIC_INCR_BACKENDS = (
+    'django.core.cache.backends.redis.RedisCache',
+    'django.core.cache.backends.memcached.PyMemcacheCache',
+    'django.core.cache.backends.memcached.PyLibMCCache',
+)
+
+
+def is_process_local(config):
+    """Whether a ``CACHES`` entry is private to each worker process"""
+    return config.get('BACKEND') in PROCESS_LOCAL_BACKENDS
+
+
+def has_atomic_incr(config):
+    """Whether a ``CACHES`` entry can hold counters shared by workers (see ``billder.throttling``)"""
+    return config.get('BACKEND') in ATOMIC_INCR_BACKENDS
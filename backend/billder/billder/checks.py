@@ -0,0 +1,104 @@
+from django.conf import settings
+from django.core.checks import Error, Warning, register
+from django.urls import reverse, NoReverseMatch
+from .middleware_profiles import compile_routes, select_profile
+
+# What admin.E408-E410 require, checked against the profile serving /admin/
+ADMIN_MIDDLEWARE = [
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+]
+
+
+@register()
+def check_middleware_profiles(app_configs, **kwargs):
+    profiles = getattr(settings, 'MIDDLEWARE_PROFILES', None)
+    if profiles is None:
+        return []
+
+    errors = []
+    routes = getattr(settings, 'MIDDLEWARE_PROFILE_ROUTES', [])
+    default = getattr(settings, 'MIDDLEWARE_DEFAULT_PROFILE', None)
+    for pattern, profile in [(None, default)] + list(routes):
+        if profile not in profiles:
+            errors.append(Error(
+                f"Unknown middleware profile '{profile}'"
+                + (f" for route '{pattern}'" if pattern else ' in MIDDLEWARE_DEFAULT_PROFILE'),
+                hint=f'Valid options: {list(profiles)}',
+                id='billder.E001',
+            ))
+    if errors:
+        return errors
+
+    try:
+        admin_path = reverse('admin:index')
+    except NoReverseMatch:
+        return []
+    profile = select_profile(admin_path, compile_routes(routes), default)
+    for middleware in ADMIN_MIDDLEWARE:
+        if middleware not in profiles[profile]:
+            errors.append(Error(
+                f"'{middleware}' must be in the '{profile}' middleware profile, which serves the admin",
+                id='billder.E002',
+            ))
+    return errors
+
+
+@register()
+def check_throttling(app_configs, **kwargs):
+    from .caching import has_atomic_incr
+    from .throttling import BACKENDS, parse_rate
+
+    errors = []
+    backend = getattr(settings, 'THROTTLE_BACKEND', 'local')
+    if backend not in BACKENDS:
+        errors.append(Error(
+            f"Unknown THROTTLE_BACKEND '{backend}'",
+            hint=f'Valid options: {list(BACKENDS)}',
+            id='billder.E003',
+        ))
+    elif backend == 'cache' and not has_atomic_incr(settings.CACHES.get(settings.THROTTLE_CACHE, {})):
+        errors.append(Warning(
+            f"THROTTLE_BACKEND 'cache' uses the '{settings.THROTTLE_CACHE}' cache, which is not Redis or Memcached",
+            hint='A per-process cache multiplies the rates by the number of workers; the database and file '
+                 'caches cost I/O on every check and lose concurrent updates. Point THROTTLE_CACHE at '
+                 "Redis or Memcached, or use 'local'.",
+            id='billder.W001',
+        ))
+    for scope, rate in getattr(settings, 'THROTTLE_RATES', {}).items():
+        try:
+            parse_rate(rate)
+        except (ValueError, KeyError, IndexError):
+            errors.append(Error(
+                f"Invalid rate '{rate}' for throttle scope '{scope}'",
+                hint="Use '<requests>/<second|minute|hour|day>', or 'off'",
+                id='billder.E004',
+            ))
+    return errors
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    from .caching import is_process_local
+
+    if not getattr(settings, 'CACHE_REQUIRE_SHARED', False) or not is_process_local(settings.CACHES['default']):
+        return []
+    return [Error(
+        f"The default cache ({settings.CACHES['default']['BACKEND']}) is local to each process",
+        hint='Invalidations and primary pins would only reach the worker that made them. '
+             'Set CACHE_URL (or REDIS_URL) to Redis or Memcached.',
+        id='billder.E005',
+    )]
+
+
+@register()
+def check_public_slug_secret(app_configs, **kwargs):
+    if getattr(settings, 'PUBLIC_SLUG_SECRET', None):
+        return []
+    return [Error(
+        'PUBLIC_SLUG_SECRET is not set',
+        hint='Public invoice links are signed with it (finance.public_links). Set it to a random value '
+             'of its own, not SECRET_KEY, and never change it: every link already sent depends on it.',
+        id='billder.E006',
+    )]
@@ -0,0 +1,182 @@
+"""
+Negotiated response compression.
+
+``CompressionMiddleware`` replaces Django's ``GZipMiddleware``: it picks the
+best coding the client accepts out of ``COMPRESSION_ENCODINGS`` (brotli and
+zstd need the optional ``brotli``/``zstandard`` packages; gzip is always
+available) and leaves responses under ``COMPRESSION_MIN_SIZE`` bytes alone.
+
+Streaming responses (exports) are compressed chunk by chunk and flushed after
+every chunk, so clients still receive rows as they are produced.
+
+Views that cache their rendered output can store it precompressed with
+``precompress()`` and attach the result as ``response.precompressed``; the
+middleware then sends the stored bytes instead of compressing again.
+"""
+import re
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional codec
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional codec
+    zstandard = None
+
+DEFAULT_ENCODINGS = ['br', 'zstd', 'gzip']
+DEFAULT_MIN_SIZE = 1024
+
+accept_encoding_re = re.compile(r'\s*([^\s;,]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*(?:,|$)')
+
+
+class GzipCodec:
+    name = 'gzip'
+    level = 6
+    cache_level = 9
+
+    def compress(self, data, level=None):
+        compressor = zlib.compressobj(level or self.level, zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+
+    def stream(self):
+        """Return (compress_and_flush(chunk), finish()) for one response"""
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        return (
+            lambda chunk: compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH),
+            compressor.flush,
+        )
+
+
+class BrotliCodec:
+    name = 'br'
+    level = 5
+    cache_level = 9
+
+    def compress(self, data, level=None):
+        return brotli.compress(data, quality=level or self.level)
+
+    def stream(self):
+        compressor = brotli.Compressor(quality=self.level)
+        return lambda chunk: compressor.process(chunk) + compressor.flush(), compressor.finish
+
+
+class ZstdCodec:
+    name = 'zstd'
+    level = 3
+    cache_level = 19
+
+    def compress(self, data, level=None):
+        return zstandard.ZstdCompressor(level=level or self.level).compress(data)
+
+    def stream(self):
+        compressor = zstandard.ZstdCompressor(level=self.level).compressobj()
+        return (
+            lambda chunk: compressor.compress(chunk) + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK),
+            compressor.flush,
+        )
+
+
+CODECS = {codec.name: codec for codec in (
+    GzipCodec(),
+    BrotliCodec() if brotli is not None else None,
+    ZstdCodec() if zstandard is not None else None,
+) if codec is not None}
+
+
+def enabled_codecs():
+    """Available codecs in server preference order"""
+    names = getattr(settings, 'COMPRESSION_ENCODINGS', DEFAULT_ENCODINGS)
+    return [CODECS[name] for name in names if name in CODECS]
+
+
+def negotiate(accept_encoding):
+    """Pick the codec for an Accept-Encoding header, or None for identity"""
+    if not accept_encoding:
+        return None
+
+    qualities = {}
+    for coding, quality in accept_encoding_re.findall(accept_encoding):
+        try:
+            qualities[coding.lower()] = float(quality) if quality else 1.0
+        except ValueError:
+            continue
+
+    best, best_quality = None, 0
+    for codec in enabled_codecs():
+        quality = qualities.get(codec.name, qualities.get('*', 0))
+        if quality > best_quality:
+            best, best_quality = codec, quality
+    return best
+
+
+def precompress(content):
+    """Compress content once, with every enabled codec at its (slower) cache level"""
+    if len(content) < getattr(settings, 'COMPRESSION_MIN_SIZE', DEFAULT_MIN_SIZE):
+        return {}
+    return {codec.name: codec.compress(content, codec.cache_level) for codec in enabled_codecs()}
+
+
+def compress_sequence(codec, sequence):
+    compress, finish = codec.stream()
+    for chunk in sequence:
+        data = compress(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+async def acompress_sequence(codec, sequence):
+    compress, finish = codec.stream()
+    async for chunk in sequence:
+        data = compress(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compress responses with gzip, brotli or zstd, whichever the client prefers.
+    """
+
+    def process_response(self, request, response):
+        min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', DEFAULT_MIN_SIZE)
+        if not response.streaming and len(response.content) < min_size:
+            return response
+        if response.has_header('Content-Encoding'):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        codec = negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if codec is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = acompress_sequence(codec, response.streaming_content)
+            else:
+                response.streaming_content = compress_sequence(codec, response.streaming_content)
+            del response.headers['Content-Length']
+        else:
+            precompressed = getattr(response, 'precompressed', None) or {}
+            compressed = precompressed.get(codec.name) or codec.compress(response.content)
+            # Incompressible payloads go out as they are
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # The representation changed, so a strong ETag no longer applies
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = codec.name
+        return response
@@ -1,7 +1,39 @@
 import re
+from functools import lru_cache
 from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 from django.middleware.csrf import CsrfViewMiddleware
 
+# '^/api/' style patterns: anchored, literal prefixes with no other regex syntax
+LITERAL_PREFIX_RE = re.compile(r'^\^((?:[^\\.^$*+?{}\[\]|()]|\\[^A-Za-z0-9])*)$')
+
+
+@lru_cache(maxsize=None)
+def get_exempt_matcher():
+    """
+    Compile ``settings.CSRF_EXEMPT_URLS`` into a single path test.
+
+    Plain prefixes become one ``str.startswith`` call; anything else is
+    combined into one regex. Cached until the setting changes.
+    """
+    patterns = list(getattr(settings, 'CSRF_EXEMPT_URLS', []))
+    if not patterns:
+        return lambda path: False
+
+    prefixes = [LITERAL_PREFIX_RE.match(pattern) for pattern in patterns]
+    if all(prefixes):
+        prefixes = tuple(re.sub(r'\\(.)', r'\1', match.group(1)) for match in prefixes)
+        return lambda path: path.startswith(prefixes)
+
+    return re.compile('|'.join(f'(?:{pattern})' for pattern in patterns)).match
+
+
+@receiver(setting_changed)
+def reset_exempt_matcher(setting, **kwargs):
+    if setting == 'CSRF_EXEMPT_URLS':
+        get_exempt_matcher.cache_clear()
+
 
 class CsrfExemptMiddleware(CsrfViewMiddleware):
     """
@@ -10,17 +42,9 @@ class CsrfExemptMiddleware(CsrfViewMiddleware):
     """
     
     def process_view(self, request, callback, callback_args, callback_kwargs):
-        # Check if the current path should be exempt from CSRF
-        path = request.path_info
-        
-        # Get exempt URLs from settings
-        exempt_urls = getattr(settings, 'CSRF_EXEMPT_URLS', [])
-        
-        # Check if current path matches any exempt pattern
-        for pattern in exempt_urls:
-            if re.match(pattern, path):
-                # Skip CSRF protection for this request
-                return None
+        # Skip CSRF protection for exempt paths (settings.CSRF_EXEMPT_URLS)
+        if get_exempt_matcher()(request.path_info):
+            return None
         
         # For all other paths, use the default CSRF protection
         return super().process_view(request, callback, callback_args, callback_kwargs)
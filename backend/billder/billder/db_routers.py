@@ -0,0 +1,122 @@
+"""
+Read-replica routing.
+
+Reads go to the primary unless a view opts in with ``@read_from_replica``.
+Inside a marked view, ORM reads are sent to the ``replica`` alias (configured
+from ``DATABASE_REPLICA_URL``). Writes always go to the primary.
+
+Replicas lag behind the primary, so a user who just wrote something is
+pinned to the primary for ``DATABASE_REPLICA_LAG_SECONDS``; otherwise they
+could save an invoice and not see it in the list they are sent back to. The
+pin is recorded by ``billder.replica_middleware.PrimaryPinMiddleware`` in the
+shared cache (``billder.caching``), and handed to the client as a signed
+token that expires with the lag window, for reads that land on a worker that
+cannot see the writer's cache. The frontend is on another site, so the token
+travels two ways: an ``X-Primary-Pin`` response header the client echoes on
+its next requests (exposed and allowed through CORS), and a
+``SameSite=None; Secure`` cookie for clients that send credentials.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_ALIAS = 'replica'
+
+PIN_COOKIE = 'primary_pin'
+PIN_HEADER = 'X-Primary-Pin'
+PIN_SALT = 'billder.db_routers.pin'
+
+# Alias for reads in the current request/thread; None means the primary
+_read_alias = ContextVar('read_alias', default=None)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in connections.settings
+
+
+def pin_key(user_id):
+    return f'db-primary-pin:{user_id}'
+
+
+def pin_to_primary(user):
+    """Send this user's replica reads to the primary for the lag window"""
+    if replica_configured() and user is not None and user.is_authenticated:
+        cache.set(pin_key(user.pk), True, settings.DATABASE_REPLICA_LAG_SECONDS)
+
+
+def send_pin(response, user):
+    """Hand the pin to the client, for reads served by another worker"""
+    if replica_configured() and user is not None and user.is_authenticated:
+        token = signing.TimestampSigner(salt=PIN_SALT).sign(str(user.pk))
+        response[PIN_HEADER] = token
+        # Sent cross-site only with SameSite=None, which browsers require to be Secure
+        response.set_cookie(PIN_COOKIE, token, max_age=settings.DATABASE_REPLICA_LAG_SECONDS,
+                            secure=True, httponly=True, samesite='None')
+
+
+def has_pin(request, user):
+    """Whether the request carries an unexpired pin for this user, in the header or the cookie"""
+    if request is None:
+        return False
+    token = request.headers.get(PIN_HEADER) or request.COOKIES.get(PIN_COOKIE)
+    if not token:
+        return False
+    try:
+        value = signing.TimestampSigner(salt=PIN_SALT).unsign(token, max_age=settings.DATABASE_REPLICA_LAG_SECONDS)
+    except signing.BadSignature:
+        return False
+    return value == str(user.pk)
+
+
+def is_pinned_to_primary(user, request=None):
+    if user is None or not user.is_authenticated:
+        return False
+    return has_pin(request, user) or bool(cache.get(pin_key(user.pk)))
+
+
+@contextmanager
+def replica_reads(user=None, request=None):
+    """Route ORM reads in this block to the replica, unless the user is pinned"""
+    if not replica_configured() or is_pinned_to_primary(user, request):
+        yield DEFAULT_DB_ALIAS
+        return
+
+    token = _read_alias.set(REPLICA_ALIAS)
+    try:
+        yield REPLICA_ALIAS
+    finally:
+        _read_alias.reset(token)
+
+
+def read_from_replica(view_method):
+    """Mark a read-only view method as safe to serve from the replica"""
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        with replica_reads(getattr(request, 'user', None), request):
+            return view_method(self, request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    """Send reads to the alias chosen by ``replica_reads``, writes to the primary"""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == 'django_cache':
+            # The database cache holds invalidations the replica may not have yet
+            return DEFAULT_DB_ALIAS
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primary and replica hold the same data
+        databases = {DEFAULT_DB_ALIAS, REPLICA_ALIAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
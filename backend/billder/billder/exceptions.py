@@ -46,6 +46,12 @@ def custom_exception_handler(exc, context):
                 'message': 'The requested resource was not found.',
                 'code': 'NOT_FOUND'
             })
+        elif response.status_code == 429:
+            custom_response_data.update({
+                'error': 'Too many requests',
+                'message': 'Too many requests. Please wait a moment and try again.',
+                'code': 'THROTTLED'
+            })
         elif response.status_code == 500:
             custom_response_data.update({
                 'error': 'Internal server error',
@@ -0,0 +1,32 @@
+import sqlite3
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+# 0x10000 has optimize check every table, not only those this (new)
+# connection has queried; SQLite before 3.46 ignores it
+OPTIMIZE_ALL = 'PRAGMA optimize=0x10002'
+
+
+class Command(BaseCommand):
+    help = (
+        'Refresh SQLite query planner statistics. Per-request connections are too short-lived '
+        'to run PRAGMA optimize themselves (see billder.sqlite_backend); run this daily from cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='database alias to optimize')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'sqlite':
+            self.stdout.write(f"{options['database']} is not SQLite; nothing to do")
+            return
+
+        with connection.cursor() as cursor:
+            if sqlite3.sqlite_version_info >= (3, 46):
+                cursor.execute(OPTIMIZE_ALL)
+            else:
+                # Bounded by the connection's analysis_limit
+                cursor.execute('ANALYZE')
+        self.stdout.write(self.style.SUCCESS(f"Refreshed planner statistics for {options['database']}"))
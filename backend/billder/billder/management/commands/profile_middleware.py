@@ -0,0 +1,117 @@
+import logging
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.base import BaseHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+
+from billder.middleware_profiles import TimedMiddleware, build_chain, compile_routes, select_profile
+
+
+class Command(BaseCommand):
+    help = (
+        'Time each middleware layer over a sample request mix. Requests go through the '
+        'profile their path selects, or through --profile. Sample data is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='requests per sample path')
+        parser.add_argument('--profile', help='run every sample through this middleware profile')
+
+    def handle(self, *args, **options):
+        profiles = settings.MIDDLEWARE_PROFILES
+        if options['profile'] and options['profile'] not in profiles:
+            raise CommandError(f"Unknown profile '{options['profile']}'. Valid options: {list(profiles)}")
+
+        handlers = {name: self.build_handler(paths) for name, paths in profiles.items()}
+        routes = compile_routes(settings.MIDDLEWARE_PROFILE_ROUTES)
+
+        # Sample views log 4xx responses and webhook signature errors
+        logging.disable(logging.WARNING)
+        try:
+            with transaction.atomic():
+                samples = self.sample_requests()
+                results = []
+                for label, make_request in samples:
+                    request = make_request()
+                    profile = options['profile'] or select_profile(
+                        request.path_info, routes, settings.MIDDLEWARE_DEFAULT_PROFILE
+                    )
+                    handler = handlers[profile][0]
+                    started = time.perf_counter()
+                    for _ in range(options['requests']):
+                        response = handler.get_response(make_request())
+                    elapsed = time.perf_counter() - started
+                    results.append((label, profile, response.status_code, elapsed / options['requests']))
+                transaction.set_rollback(True)
+        finally:
+            logging.disable(logging.NOTSET)
+
+        self.stdout.write(f"{'request':<44} {'profile':<8} {'status':>6} {'ms/request':>11}")
+        for label, profile, status_code, seconds in results:
+            self.stdout.write(f'{label:<44} {profile:<8} {status_code:>6} {seconds * 1000:>11.3f}')
+
+        for name, (handler, timers, view) in handlers.items():
+            calls = timers[0].calls if timers else view.calls
+            if not calls:
+                continue
+            self.stdout.write('')
+            self.stdout.write(self.style.MIGRATE_HEADING(f"Profile '{name}' ({calls} requests)"))
+            self.stdout.write(f"{'layer':<60} {'us/request':>11}")
+            inner = [timer.inclusive for timer in timers[1:]] + [view.inclusive]
+            hooks = sum(timer.hooks for timer in timers)
+            for timer, inner_time in zip(timers, inner):
+                own = timer.inclusive - inner_time + timer.hooks
+                self.stdout.write(f'{timer.name:<60} {own / calls * 1e6:>11.1f}')
+            self.stdout.write(f"{'(url resolution and view)':<60} {(view.inclusive - hooks) / calls * 1e6:>11.1f}")
+            total = timers[0].inclusive if timers else view.inclusive
+            self.stdout.write(f"{'total':<60} {total / calls * 1e6:>11.1f}")
+
+    def build_handler(self, middleware_paths):
+        """A request handler for one profile with every layer timed"""
+        handler = BaseHandler()
+        timers = []
+
+        def wrap(path, middleware):
+            timer = TimedMiddleware(path, middleware)
+            timers.insert(0, timer)
+            return timer
+
+        view = TimedMiddleware('view', handler._get_response)
+        chain = build_chain(middleware_paths, view, wrap)
+        handler._view_middleware = chain.view_middleware
+        handler._template_response_middleware = chain.template_response_middleware
+        handler._exception_middleware = chain.exception_middleware
+        handler._middleware_chain = chain.handler
+        return handler, timers, view
+
+    def sample_requests(self):
+        """(label, request factory) pairs covering API, public, webhook and admin traffic"""
+        from finance.models import Invoice
+        from users.tokens import issue_token
+
+        User = get_user_model()
+        owner = User.objects.create_user(email='profile-owner@example.com', password=None,
+                                         first_name='Profile', last_name='Owner', role='business_owner')
+        customer = User.objects.create_user(email='profile-customer@example.com', password=None,
+                                            first_name='Profile', last_name='Customer', role='customer')
+        invoice = Invoice.objects.create(owner=owner, customer=customer, total_amount=Decimal('100.00'),
+                                         due_date=date.today() + timedelta(days=30))
+        auth = {'HTTP_AUTHORIZATION': f'Token {issue_token(owner)}', 'HTTP_ACCEPT': 'application/json'}
+
+        host = next((host for host in settings.ALLOWED_HOSTS if host != '*' and not host.startswith('.')), 'localhost')
+        factory = RequestFactory(HTTP_HOST=host)
+        return [
+            ('GET /api/invoices/', lambda: factory.get('/api/invoices/', **auth)),
+            ('GET /api/invoices/customers/?q=pro', lambda: factory.get('/api/invoices/customers/', {'q': 'pro'}, **auth)),
+            ('GET /api/public/invoice/<slug>/', lambda: factory.get(f'/api/public/invoice/{invoice.public_slug}/')),
+            ('POST /api/finance/webhooks/stripe/ (unsigned)', lambda: factory.post(
+                '/api/finance/webhooks/stripe/', b'{}', content_type='application/json')),
+            ('GET /health/', lambda: factory.get('/health/')),
+            ('GET /admin/login/', lambda: factory.get('/admin/login/')),
+        ]
@@ -0,0 +1,110 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Run in a fresh interpreter: this process has imported everything already.
+# Phase markers go to stderr, in line with -X importtime's output.
+COLD_START = '''
+import json, sys, time
+started = time.perf_counter()
+sys.stderr.write('phase: setup\\n')
+import django
+django.setup()
+setup = time.perf_counter()
+sys.stderr.write('phase: urlconf\\n')
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(json.dumps({'setup': setup - started, 'urlconf': time.perf_counter() - setup}))
+'''
+PHASES = ('setup', 'urlconf')
+
+
+def parse_importtime(stderr):
+    """{module: (phase, self_us, cumulative_us)} from -X importtime output"""
+    modules = {}
+    phase = None
+    for line in stderr.splitlines():
+        if line.startswith('phase: '):
+            phase = line[len('phase: '):]
+        elif line.startswith('import time:') and phase is not None:
+            fields = line[len('import time:'):].split('|')
+            if not fields[0].strip().isdigit():
+                continue  # the header line
+            modules[fields[2].strip()] = (phase, int(fields[0]), int(fields[1]))
+    return modules
+
+
+class Command(BaseCommand):
+    help = (
+        'Profile a cold start: time django.setup() and the URLconf import (which imports every view) '
+        'in fresh interpreters under -X importtime, and list the slowest imports and packages. '
+        'Times are medians over --runs starts; importtime itself adds a little to each.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='cold starts to take the median of')
+        parser.add_argument('--top', type=int, default=20, help='modules and packages to list')
+        parser.add_argument('--json', action='store_true', help='print results as JSON')
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        walls = defaultdict(list)
+        modules = defaultdict(list)
+        for _ in range(options['runs']):
+            process = subprocess.run([sys.executable, '-X', 'importtime', '-c', COLD_START], env=env,
+                                     cwd=settings.BASE_DIR, capture_output=True, text=True, check=True)
+            for phase, seconds in json.loads(process.stdout.splitlines()[-1]).items():
+                walls[phase].append(seconds * 1000)
+            for module, timing in parse_importtime(process.stderr).items():
+                modules[module].append(timing)
+
+        # Median per module; a module imported in every run belongs to the same phase each time
+        imports = {
+            module: {
+                'phase': timings[0][0],
+                'self_ms': statistics.median(timing[1] for timing in timings) / 1000,
+                'cumulative_ms': statistics.median(timing[2] for timing in timings) / 1000,
+            }
+            for module, timings in modules.items()
+        }
+        packages = defaultdict(float)
+        for module, timing in imports.items():
+            packages[module.split('.')[0]] += timing['self_ms']
+        report = {
+            'phases': {phase: round(statistics.median(walls[phase]), 1) for phase in PHASES},
+            'modules': sorted(
+                ({'module': module, **timing} for module, timing in imports.items()),
+                key=lambda row: -row['cumulative_ms'],
+            )[:options['top']],
+            'packages': [
+                {'package': package, 'self_ms': round(ms, 1)}
+                for package, ms in sorted(packages.items(), key=lambda item: -item[1])[:options['top']]
+            ],
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Cold start ({options['runs']} runs, median)"))
+        for phase in PHASES:
+            self.stdout.write(f'{phase:<44} {report["phases"][phase]:>9.1f} ms')
+        self.stdout.write(f'{"total":<44} {sum(report["phases"].values()):>9.1f} ms')
+
+        self.stdout.write('')
+        self.stdout.write(self.style.MIGRATE_HEADING('Slowest imports'))
+        self.stdout.write(f"{'module':<52} {'phase':<8} {'self ms':>8} {'cumul. ms':>10}")
+        for row in report['modules']:
+            self.stdout.write(f"{row['module']:<52} {row['phase']:<8} {row['self_ms']:>8.1f} "
+                              f"{row['cumulative_ms']:>10.1f}")
+
+        self.stdout.write('')
+        self.stdout.write(self.style.MIGRATE_HEADING('Import time by package'))
+        for row in report['packages']:
+            self.stdout.write(f"{row['package']:<52} {row['self_ms']:>8.1f}")
@@ -0,0 +1,141 @@
+"""
+Per-path middleware stacks.
+
+``MIDDLEWARE`` holds only ``MiddlewareProfileRouter``. It builds one chain per
+entry of ``MIDDLEWARE_PROFILES`` and sends each request through the chain
+of the first ``MIDDLEWARE_PROFILE_ROUTES`` pattern matching its path, or
+through ``MIDDLEWARE_DEFAULT_PROFILE``. The API uses token auth and never
+touches sessions, messages or static files, so its profile leaves those
+middleware out; the admin keeps the full stack.
+
+Django only calls ``process_view``, ``process_exception`` and
+``process_template_response`` on the middleware listed in ``MIDDLEWARE``, so
+the router forwards those hooks to the selected chain in the same order
+Django would.
+"""
+import re
+import time
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.handlers.exception import convert_exception_to_response
+from django.utils.module_loading import import_string
+
+
+@dataclass
+class MiddlewareChain:
+    handler: object
+    view_middleware: list = field(default_factory=list)
+    template_response_middleware: list = field(default_factory=list)
+    exception_middleware: list = field(default_factory=list)
+
+
+def build_chain(middleware_paths, get_response, wrap=None):
+    """
+    Instantiate middleware around get_response, as BaseHandler.load_middleware.
+
+    ``wrap(path, middleware)`` may replace each instance, e.g. with a timer.
+    """
+    chain = MiddlewareChain(handler=get_response)
+    handler = get_response
+    for middleware_path in reversed(middleware_paths):
+        middleware_class = import_string(middleware_path)
+        try:
+            middleware = middleware_class(handler)
+        except MiddlewareNotUsed:
+            continue
+        if wrap is not None:
+            middleware = wrap(middleware_path, middleware)
+
+        if hasattr(middleware, 'process_view'):
+            chain.view_middleware.insert(0, middleware.process_view)
+        if hasattr(middleware, 'process_template_response'):
+            chain.template_response_middleware.append(middleware.process_template_response)
+        if hasattr(middleware, 'process_exception'):
+            chain.exception_middleware.append(middleware.process_exception)
+        handler = convert_exception_to_response(middleware)
+    chain.handler = handler
+    return chain
+
+
+def compile_routes(routes):
+    return [(re.compile(pattern).match, profile) for pattern, profile in routes]
+
+
+def select_profile(path, routes, default):
+    for match, profile in routes:
+        if match(path):
+            return profile
+    return default
+
+
+class MiddlewareProfileRouter:
+    """Run each request through the middleware profile for its path"""
+
+    def __init__(self, get_response):
+        self.chains = {
+            name: build_chain(paths, get_response)
+            for name, paths in settings.MIDDLEWARE_PROFILES.items()
+        }
+        self.routes = compile_routes(settings.MIDDLEWARE_PROFILE_ROUTES)
+        self.default = settings.MIDDLEWARE_DEFAULT_PROFILE
+
+    def __call__(self, request):
+        request.middleware_profile = select_profile(request.path_info, self.routes, self.default)
+        return self.chains[request.middleware_profile].handler(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        for process_view in self.chains[request.middleware_profile].view_middleware:
+            response = process_view(request, view_func, view_args, view_kwargs)
+            if response is not None:
+                return response
+        return None
+
+    def process_template_response(self, request, response):
+        for process_template_response in self.chains[request.middleware_profile].template_response_middleware:
+            response = process_template_response(request, response)
+        return response
+
+    def process_exception(self, request, exception):
+        for process_exception in self.chains[request.middleware_profile].exception_middleware:
+            response = process_exception(request, exception)
+            if response is not None:
+                return response
+        return None
+
+
+class TimedMiddleware:
+    """
+    Records the time spent in one middleware, for ``manage.py profile_middleware``.
+
+    ``inclusive`` covers the middleware and everything inside it; hook timings
+    are kept separately because hooks run inside the innermost handler.
+    """
+
+    def __init__(self, name, middleware):
+        self.name = name
+        self.middleware = middleware
+        self.calls = 0
+        self.inclusive = 0.0
+        self.hooks = 0.0
+        for hook in ('process_view', 'process_template_response', 'process_exception'):
+            if hasattr(middleware, hook):
+                setattr(self, hook, self.timed(getattr(middleware, hook)))
+
+    def timed(self, method):
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.hooks += time.perf_counter() - started
+        return wrapper
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        try:
+            return self.middleware(request)
+        finally:
+            self.calls += 1
+            self.inclusive += time.perf_counter() - started
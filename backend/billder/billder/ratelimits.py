@@ -0,0 +1,32 @@
+"""
+Rate limit settings from the environment, read by both settings modules.
+
+``THROTTLE_<SCOPE>_RATE`` sets each scope's rate (``'off'`` disables it).
+``THROTTLE_BACKEND`` defaults to ``'cache'`` when the ``THROTTLE_CACHE``
+cache is Redis or Memcached, so a client gets the configured rate rather
+than that rate once per worker, at no database query. Otherwise it defaults
+to ``'local'``: a per-process cache is no better, and the database and file
+caches would cost I/O on every check. See ``billder.throttling``.
+"""
+import os
+
+from .caching import has_atomic_incr
+
+DEFAULT_RATES = {
+    'public_invoice': '120/min',
+    'login': '10/min',
+    'register': '10/hour',
+}
+
+
+def throttle_settings(caches):
+    """(THROTTLE_RATES, THROTTLE_BACKEND, THROTTLE_CACHE, THROTTLE_MAX_KEYS)"""
+    rates = {}
+    for scope, default in DEFAULT_RATES.items():
+        rate = os.environ.get(f'THROTTLE_{scope.upper()}_RATE', default)
+        rates[scope] = None if rate == 'off' else rate
+
+    cache = os.environ.get('THROTTLE_CACHE', 'default')
+    atomic = cache in caches and has_atomic_incr(caches[cache])
+    backend = os.environ.get('THROTTLE_BACKEND', 'cache' if atomic else 'local')
+    return rates, backend, cache, int(os.environ.get('THROTTLE_MAX_KEYS', '100000'))
@@ -0,0 +1,66 @@
+"""
+orjson-backed JSON renderer and parser for the REST API.
+
+Both classes are drop-in replacements for DRF's ``JSONRenderer`` and
+``JSONParser`` and produce the same bytes: types orjson doesn't encode the
+way DRF does (``Decimal``, ``datetime``, lazy strings, querysets) are handed
+to DRF's own ``JSONEncoder.default``, so e.g. ``Decimal`` values still render
+as JSON numbers. Anything orjson can't handle at all (indented output,
+non-UTF-8 bodies, integers beyond 64 bits) falls back to the stdlib path, as
+does everything when orjson isn't installed.
+"""
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+# Let DRF's encoder format datetimes ('Z' suffix for UTC) instead of orjson
+DUMPS_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS if orjson else 0
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Renders with orjson when the output would be compact, UTF-8 JSON.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Pretty printing (?indent=, browsable API) stays on the stdlib path
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=DUMPS_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Same strict javascript subset escaping as JSONRenderer
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class FastJSONParser(JSONParser):
+    """
+    Parses UTF-8 request bodies with orjson.
+    """
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        # orjson always rejects NaN/Infinity, i.e. behaves as STRICT_JSON
+        if orjson is None or not self.strict or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
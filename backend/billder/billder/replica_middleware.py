@@ -0,0 +1,23 @@
+from .db_routers import pin_to_primary, send_pin
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class PrimaryPinMiddleware:
+    """
+    Pin a user's reads to the primary database right after they write.
+
+    Runs after the view so it sees the user DRF authenticated; only
+    successful unsafe requests set the pin.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            user = getattr(request, 'user', None)
+            pin_to_primary(user)
+            send_pin(response, user)
+        return response
@@ -10,9 +10,14 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+from datetime import timedelta
 from pathlib import Path
 import os
 
+from .caching import cache_config
+from .database import database_config, replica_config
+from .ratelimits import throttle_settings
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -43,19 +48,74 @@ INSTALLED_APPS = [
     'users',
     'finance',
     'corsheaders',
+    'billder',
 ]
 
+# Each request runs through the middleware profile for its path (see
+# billder.middleware_profiles); measure them with `manage.py profile_middleware`
 MIDDLEWARE = [
-    'corsheaders.middleware.CorsMiddleware',
-    'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
-    'django.middleware.common.CommonMiddleware',
-    'billder.csrf_middleware.CsrfExemptMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'billder.middleware_profiles.MiddlewareProfileRouter',
+]
+
+MIDDLEWARE_PROFILES = {
+    'full': [
+        'corsheaders.middleware.CorsMiddleware',
+        'django.middleware.security.SecurityMiddleware',
+        'whitenoise.middleware.WhiteNoiseMiddleware',
+        'billder.compression.CompressionMiddleware',
+        'django.contrib.sessions.middleware.SessionMiddleware',
+        'django.middleware.common.CommonMiddleware',
+        'billder.csrf_middleware.CsrfExemptMiddleware',
+        'django.contrib.auth.middleware.AuthenticationMiddleware',
+        'billder.replica_middleware.PrimaryPinMiddleware',
+        'django.contrib.messages.middleware.MessageMiddleware',
+        'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    ],
+    # /api/ uses token auth: no sessions, messages, framing headers or static
+    # files. CSRF middleware is skipped too: /api/ is CSRF_EXEMPT_URLS and
+    # DRF views and the webhook are csrf_exempt anyway.
+    'api': [
+        'corsheaders.middleware.CorsMiddleware',
+        'django.middleware.security.SecurityMiddleware',
+        'billder.compression.CompressionMiddleware',
+        'django.middleware.common.CommonMiddleware',
+        'billder.replica_middleware.PrimaryPinMiddleware',
+    ],
+}
+
+MIDDLEWARE_PROFILE_ROUTES = [
+    (r'^/api/', 'api'),
+    (r'^/health/$', 'api'),
 ]
+MIDDLEWARE_DEFAULT_PROFILE = 'full'
+
+# The admin middleware checks only look at MIDDLEWARE; billder.E002 checks
+# the profiles instead
+SILENCED_SYSTEM_CHECKS = ['admin.E408', 'admin.E409', 'admin.E410']
+
+# Response compression (billder.compression): codings in preference order;
+# 'br' and 'zstd' are used when the brotli/zstandard packages are installed
+COMPRESSION_ENCODINGS = ['br', 'zstd', 'gzip']
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))
+
+# Rendered public invoice payloads are cached (precompressed) this long
+PUBLIC_INVOICE_CACHE_TIMEOUT = int(os.environ.get('PUBLIC_INVOICE_CACHE_TIMEOUT', '300'))
+
+# Public invoice links are signed with this (finance.public_links); changing
+# it breaks every link already sent. Unsigned links issued before signing
+# keep working while PUBLIC_SLUG_ACCEPT_LEGACY is on.
+PUBLIC_SLUG_SECRET = os.environ.get('PUBLIC_SLUG_SECRET', SECRET_KEY)
+PUBLIC_SLUG_ACCEPT_LEGACY = os.environ.get('PUBLIC_SLUG_ACCEPT_LEGACY', 'True').lower() == 'true'
+
+# Provider payment statuses (finance.status_cache) are cached this long
+PAYMENT_STATUS_CACHE_TIMEOUT = int(os.environ.get('PAYMENT_STATUS_CACHE_TIMEOUT', '5'))
+
+# Idempotency-Key responses for payment mutations (finance.idempotency) are
+# replayed this long
+IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', str(24 * 60 * 60)))
+# A key still in progress after this long belongs to a request whose worker
+# died, and may be claimed again; keep it above gunicorn's WEB_TIMEOUT
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.environ.get('IDEMPOTENCY_LOCK_TIMEOUT', '60'))
 
 ROOT_URLCONF = 'billder.urls'
 
@@ -81,13 +141,30 @@ WSGI_APPLICATION = 'billder.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Configured from DATABASE_URL; SQLite at BASE_DIR / 'db.sqlite3' when unset
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_config(base_dir=BASE_DIR),
 }
 
+# Optional read replica for list/stats/public views marked @read_from_replica
+replica_database = replica_config(base_dir=BASE_DIR)
+if replica_database:
+    DATABASES['replica'] = replica_database
+
+DATABASE_ROUTERS = ['billder.db_routers.ReplicaRouter']
+
+# Cache
+# Configured from CACHE_URL (billder.caching); local to each process when
+# unset, which only suits a single process. Set CACHE_REQUIRE_SHARED to fail
+# the system checks unless the cache is shared between workers.
+CACHES = {
+    'default': cache_config(),
+}
+CACHE_REQUIRE_SHARED = os.environ.get('CACHE_REQUIRE_SHARED', 'False').lower() == 'true'
+
+# Users are pinned to the primary this long after a write, covering replica lag
+DATABASE_REPLICA_LAG_SECONDS = int(os.environ.get('DATABASE_REPLICA_LAG_SECONDS', '5'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -141,12 +218,41 @@ AUTH_USER_MODEL = 'users.User'
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'users.authentication.StatelessJWTAuthentication',
         'rest_framework.authentication.TokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'billder.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'billder.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'EXCEPTION_HANDLER': 'billder.exceptions.custom_exception_handler',
+    # Proxies that append to X-Forwarded-For in front of the app; client IPs
+    # for throttling are read from behind them
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', '0')),
+}
+
+# Token-bucket limits for unauthenticated endpoints, per client IP
+# (billder.throttling); read from THROTTLE_* by billder.ratelimits, and kept
+# in the cache when it is Redis or Memcached
+THROTTLE_RATES, THROTTLE_BACKEND, THROTTLE_CACHE, THROTTLE_MAX_KEYS = throttle_settings(CACHES)
+
+# Auth tokens issued on login/registration: 'db' (opaque DRF tokens, one
+# query per request) or 'jwt' (signed stateless tokens, no auth queries)
+AUTH_TOKEN_BACKEND = os.environ.get('AUTH_TOKEN_BACKEND', 'db')
+
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=int(os.environ.get('JWT_ACCESS_TOKEN_MINUTES', '60'))),
+    # Accept 'Token <jwt>' too, so clients don't change headers between backends
+    'AUTH_HEADER_TYPES': ('Bearer', 'Token'),
+    'SIGNING_KEY': os.environ.get('JWT_SIGNING_KEY', SECRET_KEY),
 }
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
@@ -167,10 +273,26 @@ CORS_ALLOW_HEADERS = [
     'origin',
     'user-agent',
     'x-csrftoken',
+    'x-primary-pin',
     'x-requested-with',
 ]
-
-
+# Read-your-writes pin the frontend echoes back (billder.db_routers)
+CORS_EXPOSE_HEADERS = ['x-primary-pin']
+
+
+# Stripe credentials are only configured in settings_production.py; the API
+# base can point the client at a local fake (benchmarks/fake_stripe.py)
+STRIPE_API_BASE = os.environ.get('STRIPE_API_BASE', 'https://api.stripe.com')
+# Seconds before a Stripe request gives up; the SDK's own default is 80
+STRIPE_TIMEOUT = float(os.environ.get('STRIPE_TIMEOUT', '10'))
+
+# Circuit breaker and bulkhead around payment provider calls, per process
+# (finance.services.resilience)
+PAYMENT_PROVIDER_MAX_CONCURRENCY = int(os.environ.get('PAYMENT_PROVIDER_MAX_CONCURRENCY', '4'))
+PAYMENT_PROVIDER_QUEUE_TIMEOUT = float(os.environ.get('PAYMENT_PROVIDER_QUEUE_TIMEOUT', '1'))
+PAYMENT_PROVIDER_FAILURE_THRESHOLD = int(os.environ.get('PAYMENT_PROVIDER_FAILURE_THRESHOLD', '5'))
+PAYMENT_PROVIDER_RESET_TIMEOUT = float(os.environ.get('PAYMENT_PROVIDER_RESET_TIMEOUT', '30'))
+PAYMENT_PROVIDER_SLOW_CALL = float(os.environ.get('PAYMENT_PROVIDER_SLOW_CALL', '5'))
 
 # WhiteNoise configuration for static files
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
@@ -0,0 +1,44 @@
+"""
+SQLite backend that keeps query planner statistics current.
+
+Runs ``PRAGMA optimize`` as a long-lived connection closes: it ANALYZEs the
+tables this connection queried when their statistics are missing or stale
+(bounded by ``analysis_limit``). Without statistics SQLite assumes every
+index is selective, and e.g. walks all of an owner's invoices rather than
+looking up a handful of search matches by primary key.
+
+With ``CONN_MAX_AGE=0`` each request opens its own connection, and running
+the pragma on every close would add its cost to every request. Only
+connections open for at least ``SQLITE_OPTIMIZE_MIN_AGE`` seconds run it;
+``manage.py optimize_database`` covers the per-request case and is meant to
+run periodically from cron.
+"""
+import time
+
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+DEFAULT_OPTIMIZE_MIN_AGE = 300
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    opened_at = None
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        self.opened_at = time.monotonic()
+        return conn
+
+    def should_optimize(self):
+        """Whether this connection has been open long enough to be worth ``PRAGMA optimize``"""
+        if self.opened_at is None or self.is_in_memory_db():
+            return False
+        min_age = getattr(settings, 'SQLITE_OPTIMIZE_MIN_AGE', DEFAULT_OPTIMIZE_MIN_AGE)
+        return time.monotonic() - self.opened_at >= min_age
+
+    def _close(self):
+        if self.connection is not None and self.should_optimize():
+            with self.wrap_database_errors:
+                self.connection.execute('PRAGMA optimize')
+        self.opened_at = None
+        super()._close()
@@ -0,0 +1,142 @@
+"""
+Token-bucket rate limiting for endpoints anyone can call.
+
+``TokenBucketThrottle`` is a DRF throttle for the unauthenticated views
+(public invoices, login, registration). Each client IP gets one bucket per
+``throttle_scope``, sized and refilled by ``THROTTLE_RATES``: ``'30/min'``
+holds 30 requests and refills one every 2 seconds. A request that finds its
+bucket empty gets 429 with ``Retry-After`` before the view runs, so it costs
+no query and no password hash. Set a scope's rate to None to turn it off.
+
+Buckets are kept in GCRA form: one "theoretical arrival time" per key rather
+than a token count and a refill timestamp, so a check is one compare and one
+update. ``THROTTLE_BACKEND`` picks where they live:
+
+- ``'local'``: a dict in each process (at most ``THROTTLE_MAX_KEYS``, least
+  recently used dropped first). No I/O, but with N worker processes a client
+  gets up to N times the rate.
+- ``'cache'``: the ``THROTTLE_CACHE`` Django cache, for Redis or Memcached,
+  where a busy bucket is one atomic ``incr`` and no database query; the
+  default whenever THROTTLE_CACHE is one of them. Two workers that refill
+  the same idle bucket at once may each let one request through. Other
+  caches are not used by default and billder.W001 warns about them: locmem
+  is per process, and the database and file caches cost queries or file
+  I/O on every check and ``incr`` there is a get and a set, so concurrent
+  workers lose updates and the limit leaks.
+
+Client IPs come from DRF's ``get_ident``, so ``NUM_PROXIES`` must match the
+proxies in front of the app, or clients can pick their own X-Forwarded-For.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.throttling import BaseThrottle
+
+BACKENDS = ('local', 'cache')
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """'30/min' -> (30, 60): requests per bucket, and seconds to refill it"""
+    if rate is None:
+        return None
+    requests, period = rate.split('/')
+    return int(requests), PERIODS[period[0]]
+
+
+class LocalBuckets:
+    def __init__(self, max_keys):
+        self.max_keys = max_keys
+        self.tats = OrderedDict()
+        self.lock = threading.Lock()
+
+    def take(self, key, interval, period):
+        """Take a token; returns 0, or the seconds until one is available"""
+        now = time.monotonic()
+        with self.lock:
+            tat = max(self.tats.get(key, now), now) + interval
+            if tat - now > period:
+                return tat - period - now
+            self.tats[key] = tat
+            self.tats.move_to_end(key)
+            if len(self.tats) > self.max_keys:
+                self.tats.popitem(last=False)
+            return 0
+
+
+class CacheBuckets:
+    """Arrival times in milliseconds, so they can be moved with incr/decr"""
+
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def take(self, key, interval, period):
+        now = int(time.time() * 1000)
+        step = math.ceil(interval * 1000)
+        tat = self.cache.get(key)
+        if tat is None or tat <= now:
+            # A full bucket; the key expires when it would be full again
+            self.cache.set(key, now + step, timeout=math.ceil(step / 1000))
+            return 0
+        try:
+            tat = self.cache.incr(key, step)
+        except ValueError:
+            # Expired since the get
+            self.cache.set(key, now + step, timeout=math.ceil(step / 1000))
+            return 0
+        if tat - now > period * 1000:
+            self.cache.decr(key, step)
+            return (tat - period * 1000 - now) / 1000
+        self.cache.touch(key, math.ceil((tat - now) / 1000))
+        return 0
+
+
+_buckets = {}
+_lock = threading.Lock()
+
+
+def get_buckets():
+    """The process-wide buckets for THROTTLE_BACKEND"""
+    backend = settings.THROTTLE_BACKEND
+    buckets = _buckets.get(backend)
+    if buckets is None:
+        if backend not in BACKENDS:
+            raise ImproperlyConfigured(f"Unknown THROTTLE_BACKEND '{backend}'. Valid options: {list(BACKENDS)}")
+        with _lock:
+            buckets = _buckets.get(backend)
+            if buckets is None:
+                buckets = _buckets[backend] = (
+                    LocalBuckets(settings.THROTTLE_MAX_KEYS) if backend == 'local'
+                    else CacheBuckets(settings.THROTTLE_CACHE)
+                )
+    return buckets
+
+
+def reset_buckets():
+    """Forget the buckets, so every client starts full (shared cache entries are left alone)"""
+    with _lock:
+        _buckets.clear()
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Per-IP token bucket for the view's ``throttle_scope``"""
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        rate = parse_rate(settings.THROTTLE_RATES.get(scope))
+        if rate is None:
+            return True
+        requests, period = rate
+        self.retry_after = get_buckets().take(f'throttle:{scope}:{self.get_ident(request)}',
+                                              period / requests, period)
+        return not self.retry_after
+
+    def wait(self):
+        return self.retry_after
@@ -0,0 +1,126 @@
+"""
+Customer autocomplete for invoice creation.
+
+Each business owner's past customers (the distinct customers of their
+invoices) are held in memory as a sorted list of lower-cased keys, email and
+name, so a prefix lookup is a bisect plus a short scan. An owner's index is
+built on first use, extended when they create an invoice and dropped when
+one of their customers changes name or email (see ``finance.signals``).
+
+Indexes are per process: they are rebuilt after ``INDEX_TTL`` seconds so
+invoices created through other workers show up, and only the
+``MAX_OWNERS`` most recently used are kept.
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from django.contrib.auth import get_user_model
+
+MAX_OWNERS = 1000
+INDEX_TTL = 300
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+CUSTOMER_FIELDS = ('id', 'email', 'first_name', 'last_name')
+
+_indexes = OrderedDict()
+_lock = threading.Lock()
+
+
+def customer_entry(customer):
+    return {field: getattr(customer, field) for field in CUSTOMER_FIELDS}
+
+
+def entry_keys(entry):
+    """Prefixes of these keys match: 'jo', 'john d', 'doe', 'john.doe@'"""
+    first, last = entry['first_name'].lower(), entry['last_name'].lower()
+    keys = {entry['email'].lower(), f'{first} {last}'.strip()}
+    if last:
+        keys.add(last)
+    return keys
+
+
+class CustomerIndex:
+    """Sorted (key, customer id) pairs for one owner's customers"""
+
+    def __init__(self, entries=()):
+        self.customers = {entry['id']: entry for entry in entries}
+        self.keys = sorted(
+            (key, customer_id)
+            for customer_id, entry in self.customers.items()
+            for key in entry_keys(entry)
+        )
+        self.built_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def expired(self):
+        return time.monotonic() - self.built_at > INDEX_TTL
+
+    def add(self, entry):
+        with self.lock:
+            if entry['id'] in self.customers:
+                return
+            self.customers[entry['id']] = entry
+            for key in entry_keys(entry):
+                insort(self.keys, (key, entry['id']))
+
+    def search(self, prefix, limit=DEFAULT_LIMIT):
+        """Customers with a key starting with prefix, in key order"""
+        prefix = prefix.lower()
+        results, seen = [], set()
+        with self.lock:
+            position = bisect_left(self.keys, (prefix,))
+            while position < len(self.keys) and len(results) < limit:
+                key, customer_id = self.keys[position]
+                if not key.startswith(prefix):
+                    break
+                if customer_id not in seen:
+                    seen.add(customer_id)
+                    results.append(self.customers[customer_id])
+                position += 1
+        return results
+
+
+def load_customers(owner_id):
+    return get_user_model().objects.filter(
+        invoices__owner_id=owner_id
+    ).distinct().values(*CUSTOMER_FIELDS)
+
+
+def get_index(owner_id):
+    """Return the owner's index, building it if missing or expired"""
+    with _lock:
+        index = _indexes.get(owner_id)
+        if index is not None and not index.expired():
+            _indexes.move_to_end(owner_id)
+            return index
+
+    # Built outside the lock: a slow query must not block other owners
+    index = CustomerIndex(load_customers(owner_id))
+    with _lock:
+        _indexes[owner_id] = index
+        _indexes.move_to_end(owner_id)
+        while len(_indexes) > MAX_OWNERS:
+            _indexes.popitem(last=False)
+    return index
+
+
+def customer_added(owner_id, customer):
+    """Add an invoice's customer to the owner's index, if it is loaded"""
+    with _lock:
+        index = _indexes.get(owner_id)
+    if index is not None:
+        index.add(customer_entry(customer))
+
+
+def customer_changed(customer_id):
+    """Drop every index listing the customer; they rebuild on next use"""
+    with _lock:
+        for owner_id in [owner_id for owner_id, index in _indexes.items() if customer_id in index.customers]:
+            del _indexes[owner_id]
+
+
+def clear():
+    with _lock:
+        _indexes.clear()
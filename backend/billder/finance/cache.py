@@ -0,0 +1,43 @@
+"""
+Cached public invoice payloads.
+
+Public invoice links are opened repeatedly (emails, previews, payment page
+reloads), so the rendered JSON is cached per slug together with its
+precompressed variants; a hit costs no queries, no rendering and no
+compression. Entries are dropped when the invoice or one of its payments is
+saved (see ``finance.signals``). Customer/owner name changes show up after
+``PUBLIC_INVOICE_CACHE_TIMEOUT`` seconds. Behind several workers the default
+cache must be shared (``billder.caching``), or an invalidation only clears
+the copy held by the worker that handled the write.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from billder.compression import precompress
+from billder.db_routers import replica_configured
+
+# Stored while replicas may still serve the pre-write rows, so that a lagging
+# read can't repopulate the entry with stale data
+INVALIDATED = {}
+
+
+def public_invoice_key(public_slug):
+    return f'public-invoice:{public_slug}'
+
+
+def get_public_invoice(public_slug):
+    """Return {'content': bytes, <encoding>: bytes, ...} or None"""
+    return cache.get(public_invoice_key(public_slug)) or None
+
+
+def set_public_invoice(public_slug, content):
+    entry = {'content': content, **precompress(content)}
+    cache.add(public_invoice_key(public_slug), entry, settings.PUBLIC_INVOICE_CACHE_TIMEOUT)
+    return entry
+
+
+def invalidate_public_invoice(public_slug):
+    key = public_invoice_key(public_slug)
+    if replica_configured():
+        cache.set(key, INVALIDATED, settings.DATABASE_REPLICA_LAG_SECONDS)
+    else:
+        cache.delete(key)
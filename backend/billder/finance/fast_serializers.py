@@ -0,0 +1,133 @@
+"""
+Read-only fast paths for the list serializers.
+
+``InvoiceListSerializer`` and ``PaymentSerializer`` build every row through
+DRF field objects and model instances, which dominates CPU on large lists.
+The classes here produce the same output from a single ``.values()`` query:
+names, balances and the overdue flag are computed by the database (see
+``InvoiceQuerySet.with_balance``) and rows are formatted with plain Python.
+They only support reads; keep their fields in sync with the serializers
+they mirror.
+"""
+from django.db.models import F, Value
+from django.db.models.functions import Concat
+from django.utils import timezone
+from .models import Payment
+from .money import exponent, format_minor, to_major
+
+
+def full_name(prefix):
+    """'first last' for the user at the given relation path"""
+    return Concat(F(f'{prefix}__first_name'), Value(' '), F(f'{prefix}__last_name'))
+
+
+def format_money(minor, currency):
+    """Match serializers.MoneyField output for an amount in minor units"""
+    return None if minor is None else format_minor(minor, exponent(currency))
+
+
+class DateTimeFormatter:
+    """Match serializers.DateTimeField ISO 8601 output"""
+
+    def __init__(self):
+        self.tz = timezone.get_current_timezone()
+
+    def __call__(self, value):
+        if value is None:
+            return None
+        value = value.astimezone(self.tz).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+
+
+class FastInvoiceListSerializer:
+    """Drop-in for ``InvoiceListSerializer(queryset, many=True).data``"""
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+
+    def get_rows(self):
+        queryset = self.queryset
+        if 'remaining_balance' not in queryset.query.annotations:
+            queryset = queryset.with_balance()
+        return queryset.values(
+            'id', 'reference', 'currency', 'total_amount', 'amount_paid', 'remaining_balance', 'status',
+            'due_date', 'created_at', 'is_overdue',
+            customer_name=full_name('customer'),
+            customer_email=F('customer__email'),
+            owner_name=full_name('owner'),
+            owner_email=F('owner__email'),
+        )
+
+    @property
+    def data(self):
+        format_datetime = DateTimeFormatter()
+        return [
+            {
+                'id': str(row['id']),
+                'reference': row['reference'],
+                'customer_name': row['customer_name'],
+                'customer_email': row['customer_email'],
+                'owner_name': row['owner_name'],
+                'owner_email': row['owner_email'],
+                'total_amount': format_money(row['total_amount'], row['currency']),
+                'amount_paid': format_money(row['amount_paid'], row['currency']),
+                'remaining_balance': to_major(row['remaining_balance'], row['currency']),
+                'status': row['status'],
+                'due_date': row['due_date'].isoformat(),
+                'created_at': format_datetime(row['created_at']),
+                'is_overdue': row['is_overdue'],
+            }
+            for row in self.get_rows()
+        ]
+
+
+class FastPaymentSerializer:
+    """Drop-in for ``PaymentSerializer(queryset, many=True).data``"""
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+
+    def get_rows(self):
+        return self.queryset.values(
+            'id', 'invoice_id', 'amount', 'currency', 'status', 'payment_provider', 'payment_method',
+            'external_payment_id', 'external_charge_id', 'external_refund_id', 'client_secret',
+            'payment_method_token', 'description', 'created_at', 'updated_at', 'processed_at',
+            invoice_reference=F('invoice__reference'),
+            customer_name=full_name('invoice__customer'),
+            customer_email=F('invoice__customer__email'),
+        )
+
+    @property
+    def data(self):
+        format_datetime = DateTimeFormatter()
+        failed = (Payment.Status.FAILED, Payment.Status.CANCELED)
+        return [
+            {
+                'id': str(row['id']),
+                'invoice': row['invoice_id'],
+                'invoice_reference': row['invoice_reference'],
+                'customer_name': row['customer_name'],
+                'customer_email': row['customer_email'],
+                'amount': format_money(row['amount'], row['currency']),
+                'amount_cents': row['amount'],
+                'currency': row['currency'],
+                'status': row['status'],
+                'payment_provider': row['payment_provider'],
+                'payment_method': row['payment_method'],
+                'external_payment_id': row['external_payment_id'],
+                'external_charge_id': row['external_charge_id'],
+                'external_refund_id': row['external_refund_id'],
+                'client_secret': row['client_secret'],
+                'payment_method_token': row['payment_method_token'],
+                'description': row['description'],
+                'is_successful': row['status'] == Payment.Status.SUCCEEDED,
+                'is_failed': row['status'] in failed,
+                'is_refunded': row['status'] == Payment.Status.REFUNDED,
+                'created_at': format_datetime(row['created_at']),
+                'updated_at': format_datetime(row['updated_at']),
+                'processed_at': format_datetime(row['processed_at']),
+            }
+            for row in self.get_rows()
+        ]
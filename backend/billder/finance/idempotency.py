@@ -0,0 +1,148 @@
+"""
+``Idempotency-Key`` handling for payment mutations.
+
+A client that times out and retries ``create_payment`` would otherwise
+create a second payment intent and a second ``Payment``. With an
+``Idempotency-Key`` header, the first request with a key is recorded in
+``IdempotencyKey`` before it runs, and its response is stored when it
+finishes. A retry with the same key:
+
+- gets the stored response, marked ``Idempotent-Replayed: true``, without
+  running the view or calling the provider;
+- gets 409 while the first request is still in progress;
+- gets 422 if its method, path or body differ from the first request's.
+
+Responses of 500 and above (including 503 for an unavailable provider) are
+not stored, nor are failures whose ``error_type`` may pass on a retry
+(``RETRYABLE_ERRORS``, e.g. a Stripe timeout reported as a 400). The key is
+released so that a retry runs again. The provider sees the same attempt:
+``request.provider_idempotency_key``, derived from the user, endpoint and
+key, is forwarded as Stripe's idempotency key, so a retry of a call that
+did reach Stripe gets Stripe's stored result instead of a second charge.
+
+A worker killed mid-request (a timeout or out of memory) never stores a
+response nor releases its key. A claim still in progress after
+``IDEMPOTENCY_LOCK_TIMEOUT`` seconds, which should cover the longest a
+request may run, is taken to be abandoned, and the next retry claims the
+key again instead of getting 409 until the key expires.
+
+Keys expire after ``IDEMPOTENCY_KEY_TTL`` seconds; ``purge_idempotency_keys``
+deletes the expired rows.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+RETRYABLE_ERRORS = ('provider_unavailable', 'rate_limit', 'stripe_error', 'internal_error')
+
+
+def request_hash(request):
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = dict(data.lists())
+    payload = json.dumps([request.method, request.path, data], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def provider_key(user, endpoint, key):
+    """The provider-side key: clients only choose keys unique among their own requests"""
+    return hashlib.sha256(f'{user.pk}:{endpoint}:{key}'.encode()).hexdigest()
+
+
+def expired_before():
+    return timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+
+
+def abandoned_before():
+    return timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT)
+
+
+def is_stale(record):
+    """Whether a record has expired, or was claimed by a request that never finished"""
+    if record.status_code is None:
+        return record.created_at < abandoned_before()
+    return record.created_at < expired_before()
+
+
+def claim(user, key, endpoint, digest):
+    """Record a new key; returns (record, created), created False for an existing live record"""
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                return IdempotencyKey.objects.create(user=user, key=key, endpoint=endpoint,
+                                                     request_hash=digest), True
+        except IntegrityError:
+            record = IdempotencyKey.objects.filter(user=user, key=key).first()
+            if record is None:
+                continue
+            if not is_stale(record):
+                return record, False
+            # Only the row that was judged stale; another retry may have claimed it since
+            IdempotencyKey.objects.filter(pk=record.pk, created_at=record.created_at).delete()
+    raise IntegrityError(f'Could not claim idempotency key {key}')
+
+
+def is_final(response):
+    """Whether a retry should get this response rather than run again"""
+    if response is None or response.status_code >= 500:
+        return False
+    data = response.data if isinstance(response.data, dict) else {}
+    return data.get('error_type') not in RETRYABLE_ERRORS
+
+
+def error(message, code, status_code):
+    return Response({'error': message, 'code': code}, status=status_code)
+
+
+def idempotent(view_method):
+    """Honour an Idempotency-Key header on a payment mutation action"""
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return error(f'{HEADER} must be at most {MAX_KEY_LENGTH} characters',
+                         'invalid_idempotency_key', status.HTTP_400_BAD_REQUEST)
+
+        endpoint = f'{self.basename}.{view_method.__name__}'
+        digest = request_hash(request)
+        record, created = claim(request.user, key, endpoint, digest)
+        if not created:
+            if record.endpoint != endpoint or record.request_hash != digest:
+                return error(f'This {HEADER} was used with a different request',
+                             'idempotency_key_reused', status.HTTP_422_UNPROCESSABLE_ENTITY)
+            if record.status_code is None:
+                return error(f'A request with this {HEADER} is still in progress',
+                             'idempotency_key_in_progress', status.HTTP_409_CONFLICT)
+            response = HttpResponse(record.response_body, status=record.status_code,
+                                    content_type='application/json')
+            response['Idempotent-Replayed'] = 'true'
+            return response
+
+        request.provider_idempotency_key = provider_key(request.user, endpoint, key)
+        response = None
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        finally:
+            # By pk: a retry that took over this claim as abandoned owns the key now
+            keys = IdempotencyKey.objects.filter(pk=record.pk)
+            if not is_final(response):
+                keys.delete()
+            else:
+                keys.update(status_code=response.status_code,
+                            response_body=JSONRenderer().render(response.data).decode())
+        return response
+    return wrapper
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from finance.idempotency import expired_before
+from finance.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete Idempotency-Key records older than IDEMPOTENCY_KEY_TTL. Expired keys are already '
+        'ignored by the API; this keeps the table small. Run it daily from cron.'
+    )
+
+    def handle(self, *args, **options):
+        deleted, _ = IdempotencyKey.objects.filter(created_at__lt=expired_before()).delete()
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} idempotency keys older than {settings.IDEMPOTENCY_KEY_TTL}s'
+        ))
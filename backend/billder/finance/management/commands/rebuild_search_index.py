@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+from finance.models import Invoice, Payment
+from finance.search import rebuild_documents
+
+
+class Command(BaseCommand):
+    help = 'Write search documents for all invoices and payments (e.g. after bulk imports)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = rebuild_documents(Invoice, Payment, using=options['database'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} invoices and payments'))
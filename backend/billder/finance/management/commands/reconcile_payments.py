@@ -0,0 +1,53 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from finance.reconciliation import reconcile_payments
+
+
+class Command(BaseCommand):
+    help = (
+        'Fetch the Stripe status of payments that have been pending or processing for longer than '
+        '--stale-minutes and apply what changed. Runs once, or every --interval seconds until '
+        'interrupted.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stale-minutes', type=int, default=15, help='check payments open at least this long')
+        parser.add_argument('--limit', type=int, default=5000, help='payments checked per run, oldest first')
+        parser.add_argument('--workers', type=int, default=8, help='concurrent status fetches')
+        parser.add_argument('--batch-size', type=int, default=200, help='payments applied per transaction')
+        parser.add_argument('--rate', type=float, help='max status fetches per second (unlimited by default)')
+        parser.add_argument('--max-retries', type=int, default=5,
+                            help='retries of a fetch that was rate limited or hit an open circuit')
+        parser.add_argument('--interval', type=float, help='seconds between runs; run once if omitted')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            stats = reconcile_payments(
+                stale_after=timedelta(minutes=options['stale_minutes']),
+                limit=options['limit'],
+                workers=options['workers'],
+                batch_size=options['batch_size'],
+                rate=options['rate'],
+                max_retries=options['max_retries'],
+            )
+            self.report(stats)
+            if not options['interval']:
+                return
+            time.sleep(max(options['interval'] - (time.monotonic() - started), 0))
+
+    def report(self, stats):
+        transitions = ', '.join(f'{count} {status}' for status, count in sorted(stats.transitions.items()))
+        self.stdout.write(f'Checked:      {stats.checked} of {stats.stale} stale '
+                          f'({stats.checked / stats.seconds:.0f}/s)')
+        self.stdout.write(f'Changed:      {stats.changed}' + (f' ({transitions})' if transitions else ''))
+        self.stdout.write(f'Unchanged:    {stats.unchanged}')
+        self.stdout.write(f'Rate limited: {stats.rate_limited} retries (429s and open circuit)')
+        self.stdout.write(f'Lag:          {stats.lag.total_seconds():.0f}s oldest, {stats.backlog} still stale')
+        message = f'Reconciled {stats.checked} payments in {stats.seconds:.1f}s'
+        if stats.errors:
+            self.stdout.write(self.style.ERROR(f'{message}; {stats.errors} failed, see the log'))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-19 09:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0006_payment_refund_amount_payment_refund_status_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['owner', 'due_date', 'status'], name='finance_inv_owner_i_030669_idx'),
+        ),
+    ]
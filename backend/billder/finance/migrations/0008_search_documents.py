@@ -0,0 +1,116 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The search module as of this migration, copied so that later changes to
+# finance.search can't change what this migration does
+
+BATCH_SIZE = 1000
+MODELS = (
+    ('InvoiceSearchDocument', 'Invoice', 'invoice'),
+    ('PaymentSearchDocument', 'Payment', 'payment'),
+)
+
+
+def normalize(*parts):
+    return ' '.join(str(part).lower() for part in parts if part not in (None, ''))
+
+
+def invoice_document(invoice):
+    customer = invoice.customer
+    return normalize(invoice.reference, customer.first_name, customer.last_name, customer.email)
+
+
+def payment_document(payment):
+    return normalize(payment.invoice.reference, payment.amount, payment.description)
+
+
+def index_statements(vendor, qn, table):
+    if vendor == 'sqlite':
+        fts = qn(f'{table}_fts')
+        return [
+            f"CREATE VIRTUAL TABLE {fts} USING fts5(document, content='{table}', "
+            f"content_rowid='id', tokenize='trigram')",
+            f"CREATE TRIGGER {qn(table + '_ai')} AFTER INSERT ON {qn(table)} BEGIN "
+            f"INSERT INTO {fts}(rowid, document) VALUES (new.id, new.document); END",
+            f"CREATE TRIGGER {qn(table + '_ad')} AFTER DELETE ON {qn(table)} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, document) VALUES ('delete', old.id, old.document); END",
+            f"CREATE TRIGGER {qn(table + '_au')} AFTER UPDATE ON {qn(table)} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, document) VALUES ('delete', old.id, old.document); "
+            f"INSERT INTO {fts}(rowid, document) VALUES (new.id, new.document); END",
+            f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+        ]
+    if vendor == 'postgresql':
+        return [
+            'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+            f'CREATE INDEX {qn(table + "_trgm")} ON {qn(table)} USING gin ("document" gin_trgm_ops)',
+        ]
+    return []
+
+
+def create_indexes(apps, schema_editor):
+    """Write a document for every invoice and payment, then index the document tables"""
+    alias = schema_editor.connection.alias
+    builds = {'invoice': (invoice_document, 'customer'), 'payment': (payment_document, 'invoice')}
+    for document_name, source_name, field in MODELS:
+        Document = apps.get_model('finance', document_name)
+        build, related = builds[field]
+        sources = apps.get_model('finance', source_name).objects.using(alias).select_related(related)
+        batch = []
+        for obj in sources.order_by('pk').iterator(chunk_size=BATCH_SIZE):
+            batch.append(Document(**{field: obj, 'document': build(obj)}))
+            if len(batch) == BATCH_SIZE:
+                Document.objects.using(alias).bulk_create(batch)
+                batch = []
+        Document.objects.using(alias).bulk_create(batch)
+        # FTS5's 'rebuild' indexes the documents written above
+        for statement in index_statements(schema_editor.connection.vendor, schema_editor.quote_name,
+                                          Document._meta.db_table):
+            schema_editor.execute(statement)
+
+
+def drop_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    qn = schema_editor.quote_name
+    for document_name, _, _ in MODELS:
+        table = apps.get_model('finance', document_name)._meta.db_table
+        if vendor == 'sqlite':
+            for suffix in ('_ai', '_ad', '_au'):
+                schema_editor.execute(f'DROP TRIGGER IF EXISTS {qn(table + suffix)}')
+            schema_editor.execute(f'DROP TABLE IF EXISTS {qn(table + "_fts")}')
+        elif vendor == 'postgresql':
+            schema_editor.execute(f'DROP INDEX IF EXISTS {qn(table + "_trgm")}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0007_invoice_owner_due_date_status_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoiceSearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('document', models.TextField()),
+                ('invoice', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='search_index', to='finance.invoice')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='PaymentSearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('document', models.TextField()),
+                ('payment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='search_index', to='finance.payment')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:42
+
+import finance.ids
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0008_search_documents'),
+    ]
+
+    # The default is applied in Python, so the schema doesn't change. A plain
+    # AlterField would make SQLite copy both tables for nothing. Existing
+    # rows keep their uuid4 ids (see finance.ids).
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='invoice',
+                    name='id',
+                    field=models.UUIDField(default=finance.ids.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+                migrations.AlterField(
+                    model_name='payment',
+                    name='id',
+                    field=models.UUIDField(default=finance.ids.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+            ],
+        ),
+    ]
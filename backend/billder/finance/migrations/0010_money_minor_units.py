@@ -0,0 +1,63 @@
+# Generated by Django 5.2.6 on 2026-10-19 11:20
+
+import finance.money
+from django.db import migrations, models
+
+from finance.money import DEFAULT_EXPONENT, EXPONENTS
+
+# (model, field, old DecimalField kwargs, new MoneyField kwargs)
+AMOUNTS = [
+    ('invoice', 'total_amount', {}, {'help_text': 'Amount in minor units (cents)'}),
+    ('invoice', 'amount_paid', {'default': 0}, {'default': 0, 'help_text': 'Amount in minor units (cents)'}),
+    ('payment', 'amount', {}, {'help_text': 'Amount in minor units (cents)'}),
+    ('payment', 'refund_amount', {'blank': True}, {'blank': True, 'null': True,
+                                                   'help_text': 'Refunded amount in minor units (cents)'}),
+]
+
+
+def minor_units_factor():
+    """SQL for 10 ** exponent(currency), row by row"""
+    by_exponent = {}
+    for currency, exponent in sorted(EXPONENTS.items()):
+        by_exponent.setdefault(exponent, []).append(f"'{currency}'")
+    cases = ' '.join(f"WHEN currency IN ({', '.join(currencies)}) THEN {10 ** exponent}"
+                     for exponent, currencies in sorted(by_exponent.items()))
+    return f'(CASE {cases} ELSE {10 ** DEFAULT_EXPONENT} END)'
+
+
+def convert(model, name, old_kwargs, new_kwargs):
+    """
+    Replace a decimal amount column with a minor units one of the same name.
+
+    The old column is made nullable (in the migration state only) before it
+    is dropped, so that reversing can add it back to a populated table.
+    """
+    table = f'finance_{model}'
+    factor = minor_units_factor()
+    return [
+        migrations.AddField(model_name=model, name=f'{name}_minor', field=finance.money.MoneyField(null=True)),
+        migrations.RunSQL(
+            f'UPDATE {table} SET {name}_minor = CAST(ROUND({name} * {factor}) AS BIGINT)',
+            f'UPDATE {table} SET {name} = {name}_minor / ({factor} * 1.0)',
+        ),
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.AlterField(model_name=model, name=name, field=models.DecimalField(
+                max_digits=10, decimal_places=2, null=True, **old_kwargs)),
+        ]),
+        migrations.RemoveField(model_name=model, name=name),
+        migrations.RenameField(model_name=model, old_name=f'{name}_minor', new_name=name),
+        migrations.AlterField(model_name=model, name=name, field=finance.money.MoneyField(**new_kwargs)),
+    ]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0009_uuid7_primary_keys'),
+    ]
+
+    operations = [
+        operation
+        for model, name, old_kwargs, new_kwargs in AMOUNTS
+        for operation in convert(model, name, old_kwargs, new_kwargs)
+    ]
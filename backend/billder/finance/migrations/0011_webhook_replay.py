@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-19 11:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0010_money_minor_units'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessedWebhookEvent',
+            fields=[
+                ('event_id', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('type', models.CharField(max_length=100)),
+                ('created', models.DateTimeField(help_text='When the provider created the event')),
+                ('processed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='WebhookWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider', models.CharField(choices=[('stripe', 'Stripe'), ('paypal', 'PayPal'), ('square', 'Square')], max_length=20, unique=True)),
+                ('replayed_until', models.DateTimeField(help_text='Events created before this have been replayed')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
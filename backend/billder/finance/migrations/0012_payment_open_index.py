@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-19 11:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0011_webhook_replay'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(condition=models.Q(('status__in', ['pending', 'processing'])), fields=['payment_provider', 'updated_at'], name='payment_open_updated_idx'),
+        ),
+    ]
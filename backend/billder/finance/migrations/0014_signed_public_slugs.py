@@ -0,0 +1,60 @@
+# Generated by Django 5.2.6 on 2026-10-19 11:57
+
+import secrets
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import migrations, models
+from django.utils.crypto import salted_hmac
+
+BATCH_SIZE = 1000
+
+# The slug format of finance.public_links as of this migration, copied so
+# that later changes to that module can't change what this migration does
+KEY_SALT = 'finance.public_links'
+
+
+def make_public_slug():
+    if not settings.PUBLIC_SLUG_SECRET:
+        raise ImproperlyConfigured('PUBLIC_SLUG_SECRET must be set to sign public invoice slugs')
+    token = secrets.token_hex(8)
+    signature = salted_hmac(KEY_SALT, token, secret=settings.PUBLIC_SLUG_SECRET, algorithm='sha256').hexdigest()[:16]
+    return f'invoice-{token}-{signature}'
+
+
+def sign_public_slugs(apps, schema_editor):
+    """Keep each unsigned slug as the legacy slug and give the invoice a signed one"""
+    Invoice = apps.get_model('finance', 'Invoice')
+    invoices = Invoice.objects.using(schema_editor.connection.alias).filter(legacy_public_slug__isnull=True)
+    while True:
+        batch = list(invoices.only('pk', 'public_slug')[:BATCH_SIZE])
+        if not batch:
+            return
+        for invoice in batch:
+            invoice.legacy_public_slug = invoice.public_slug
+            invoice.public_slug = make_public_slug()
+        Invoice.objects.using(schema_editor.connection.alias).bulk_update(
+            batch, ['legacy_public_slug', 'public_slug'])
+
+
+def restore_public_slugs(apps, schema_editor):
+    """Give invoices with a legacy slug their old slug back; newer invoices keep their signed one"""
+    Invoice = apps.get_model('finance', 'Invoice')
+    Invoice.objects.using(schema_editor.connection.alias).filter(legacy_public_slug__isnull=False).update(
+        public_slug=models.F('legacy_public_slug'), legacy_public_slug=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0013_idempotency_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='legacy_public_slug',
+            field=models.SlugField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+        migrations.RunPython(sign_public_slugs, restore_public_slugs),
+    ]
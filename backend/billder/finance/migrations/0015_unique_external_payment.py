@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0014_signed_public_slugs'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='payment',
+            constraint=models.UniqueConstraint(fields=('payment_provider', 'external_payment_id'), name='unique_external_payment_per_provider'),
+        ),
+        # Covered by the constraint's index, created first so lookups by
+        # intent are never unindexed
+        migrations.RemoveIndex(
+            model_name='payment',
+            name='finance_pay_payment_04e4c6_idx',
+        ),
+    ]
@@ -1,8 +1,65 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.utils import timezone
-from decimal import Decimal
-import uuid
+from .ids import uuid7
+import math
+from collections import defaultdict
+
+from .money import DEFAULT_EXPONENT, EXPONENTS, MoneyField
+
+
+BIGINT_MAX = 2 ** 63 - 1
+
+
+def overdue_q():
+    """Past due and not paid; filter on this rather than is_overdue, which no index can serve"""
+    return models.Q(due_date__lt=timezone.now().date()) & ~models.Q(status=Invoice.Status.PAID)
+
+
+class InvoiceQuerySet(models.QuerySet):
+    def with_balance(self):
+        """
+        Annotate remaining_balance and is_overdue, computed by the database.
+
+        Lets views filter and sort on them instead of clients downloading
+        every invoice to do it in the browser.
+        """
+        return self.annotate(
+            remaining_balance=models.ExpressionWrapper(
+                models.F('total_amount') - models.F('amount_paid'),
+                output_field=MoneyField(),
+            ),
+            is_overdue=models.Case(
+                models.When(overdue_q(), then=models.Value(True)),
+                default=models.Value(False),
+                output_field=models.BooleanField(),
+            ),
+        )
+
+
+    def owing_at_least(self, amount):
+        """
+        Invoices whose remaining_balance is at least `amount` (a Decimal, in
+        major units) of their own currency.
+
+        Balances are minor units of each row's currency, so the threshold is
+        converted once per minor-unit size: 500 is 500 yen but 50000 cents.
+        A threshold finer than a currency's minor unit rounds up, as no
+        balance lies in between.
+        """
+        by_exponent = defaultdict(list)
+        for currency, places in EXPONENTS.items():
+            by_exponent[places].append(currency)
+
+        def threshold(places):
+            # Kept within BIGINT; anything beyond matches nothing or everything alike
+            return max(min(math.ceil(amount.scaleb(places)), BIGINT_MAX), -BIGINT_MAX)
+
+        condition = ~models.Q(currency__in=list(EXPONENTS)) & models.Q(
+            remaining_balance__gte=threshold(DEFAULT_EXPONENT))
+        for places, currencies in by_exponent.items():
+            condition |= models.Q(currency__in=currencies, remaining_balance__gte=threshold(places))
+        return self.filter(condition)
 
 
 class Invoice(models.Model):
@@ -17,24 +74,30 @@ class Invoice(models.Model):
         PAID = "paid", "Paid"
         REFUNDED = "refunded", "Refunded"
 
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     reference = models.CharField(max_length=40, unique=True)
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="invoices_owned")
     customer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT, related_name="invoices")
     currency = models.CharField(max_length=3, default="CAD")
-    total_amount = models.DecimalField(max_digits=10, decimal_places=2, help_text="dollar amount")
-    amount_paid = models.DecimalField(max_digits=10, decimal_places=2, default=0, help_text="dollar amount")
+    total_amount = MoneyField(help_text="Amount in minor units (cents)")
+    amount_paid = MoneyField(default=0, help_text="Amount in minor units (cents)")
     status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING, db_index=True)
     due_date = models.DateField()
-    public_slug = models.SlugField(max_length=64, unique=True)  # for public link
+    public_slug = models.SlugField(max_length=64, unique=True)  # for public link, signed (finance.public_links)
+    # The unsigned slug the invoice had before public links were signed
+    legacy_public_slug = models.SlugField(max_length=64, unique=True, null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = InvoiceQuerySet.as_manager()
+
     class Meta:
         indexes = [
             models.Index(fields=["owner", "status"]),
             models.Index(fields=["customer"]),
             models.Index(fields=["reference"]),
+            # Overdue filters: owner's invoices due before today and not paid
+            models.Index(fields=["owner", "due_date", "status"]),
         ]
                 
     def generate_reference(self):
@@ -48,9 +111,9 @@ class Invoice(models.Model):
         return f"INV-{year}{month:02d}-{count + 1:04d}"
     
     def generate_public_slug(self):
-        """Generate unique public slug for invoice"""
-        import uuid
-        return f"invoice-{uuid.uuid4().hex[:8]}"
+        """Generate unique, signed public slug for invoice"""
+        from .public_links import make_public_slug
+        return make_public_slug()
     
     def save(self, *args, **kwargs):
         """Override save to auto-generate reference and slug if not provided"""
@@ -83,9 +146,9 @@ class Payment(models.Model):
         BANK_TRANSFER = "bank_transfer", "Bank Transfer"
         WALLET = "wallet", "Digital Wallet"
 
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     invoice = models.ForeignKey(Invoice, on_delete=models.CASCADE, related_name="payments")
-    amount = models.DecimalField(max_digits=10, decimal_places=2, help_text="Amount in dollars")
+    amount = MoneyField(help_text="Amount in minor units (cents)")
     currency = models.CharField(max_length=3, default="CAD")
     status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING, db_index=True)
     payment_provider = models.CharField(max_length=20, choices=PaymentProvider.choices, default=PaymentProvider.STRIPE)
@@ -102,7 +165,7 @@ class Payment(models.Model):
     description = models.TextField(blank=True)
     
     # Refund details
-    refund_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, help_text="Refunded amount in dollars")
+    refund_amount = MoneyField(null=True, blank=True, help_text="Refunded amount in minor units (cents)")
     refund_status = models.CharField(max_length=20, choices=Status.choices, null=True, blank=True, help_text="Refund status")
     refunded_at = models.DateTimeField(null=True, blank=True, help_text="When refund was processed")
      
@@ -114,9 +177,23 @@ class Payment(models.Model):
     class Meta:
         indexes = [
             models.Index(fields=["invoice", "status"]),
-            models.Index(fields=["payment_provider", "external_payment_id"]),
             models.Index(fields=["external_charge_id"]),
             models.Index(fields=["created_at"]),
+            # Only the open payments reconciliation looks for (finance.reconciliation)
+            models.Index(
+                fields=["payment_provider", "updated_at"],
+                name="payment_open_updated_idx",
+                condition=models.Q(status__in=["pending", "processing"]),
+            ),
+        ]
+        constraints = [
+            # One payment per provider intent: webhooks look payments up by it,
+            # and a retried create_payment gets the same intent back (also
+            # serves the lookups the plain index used to)
+            models.UniqueConstraint(
+                fields=["payment_provider", "external_payment_id"],
+                name="unique_external_payment_per_provider",
+            ),
         ]
         ordering = ["-created_at"]
 
@@ -140,8 +217,39 @@ class Payment(models.Model):
 
     @property
     def amount_cents(self):
-        """Convert amount to cents for payment providers (Stripe, etc.)"""
-        return int(self.amount * 100)
+        """Amount in minor units for payment providers (Stripe, etc.)"""
+        return self.amount.minor
+
+    def mark_succeeded(self, charge_id=None):
+        """
+        Mark the payment succeeded and credit its invoice.
+
+        The API confirmation, the webhook and reconciliation can all see the
+        same success; the status change is a conditional UPDATE so only the
+        first of them credits the invoice. Only an open or failed payment can
+        succeed: a refunded one has been credited already. Returns False if
+        the payment was not in one of those states.
+        """
+        now = timezone.now()
+        changes = {'status': self.Status.SUCCEEDED, 'processed_at': now, 'updated_at': now}
+        if charge_id:
+            changes['external_charge_id'] = charge_id
+        with transaction.atomic():
+            claimed = Payment.objects.filter(
+                pk=self.pk, status__in=[self.Status.PENDING, self.Status.PROCESSING, self.Status.FAILED],
+            ).update(**changes)
+            if not claimed:
+                return False
+            for name, value in changes.items():
+                setattr(self, name, value)
+
+            invoice = Invoice.objects.select_for_update().get(pk=self.invoice_id)
+            invoice.amount_paid += self.amount
+            if invoice.amount_paid >= invoice.total_amount:
+                invoice.status = Invoice.Status.PAID
+            invoice.save(update_fields=['amount_paid', 'status', 'updated_at'])
+            self.invoice = invoice
+        return True
 
     def get_provider_service(self):
         """Get the appropriate payment service based on provider"""
@@ -160,3 +268,76 @@ class Payment(models.Model):
         self.save(update_fields=['metadata'])
 
 
+
+class ProcessedWebhookEvent(models.Model):
+    """
+    A provider event that has been applied.
+
+    Webhooks can be delivered more than once, and replays (see
+    finance.webhook_replay) overlap with live deliveries; the primary key
+    lookup makes sure each event is applied once.
+    """
+    event_id = models.CharField(max_length=255, primary_key=True)
+    type = models.CharField(max_length=100)
+    created = models.DateTimeField(help_text="When the provider created the event")
+    processed_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.type} {self.event_id}"
+
+
+class WebhookWatermark(models.Model):
+    """How far provider events have been replayed, per provider"""
+    provider = models.CharField(max_length=20, choices=Payment.PaymentProvider.choices, unique=True)
+    replayed_until = models.DateTimeField(help_text="Events created before this have been replayed")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.provider} replayed until {self.replayed_until}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    A client's Idempotency-Key for a payment mutation, and the response it got.
+
+    Retries with the same key are answered from here without calling the
+    provider again (see finance.idempotency). Keys are per user and expire
+    after IDEMPOTENCY_KEY_TTL seconds.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    key = models.CharField(max_length=255)
+    endpoint = models.CharField(max_length=100)
+    request_hash = models.CharField(max_length=64, help_text="SHA-256 of the method, path and body")
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True,
+                                                   help_text="Null while the first request is in progress")
+    response_body = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "key"], name="unique_idempotency_key_per_user"),
+        ]
+
+    def __str__(self):
+        return f"{self.endpoint} {self.key}"
+
+
+class SearchDocument(models.Model):
+    """
+    Denormalized, lower-cased text that invoice/payment search matches.
+
+    Kept in its own table so the full-text index (see finance.search) never
+    depends on the layout of the invoice and payment tables.
+    """
+    document = models.TextField()
+
+    class Meta:
+        abstract = True
+
+
+class InvoiceSearchDocument(SearchDocument):
+    invoice = models.OneToOneField(Invoice, on_delete=models.CASCADE, related_name="search_index")
+
+
+class PaymentSearchDocument(SearchDocument):
+    payment = models.OneToOneField(Payment, on_delete=models.CASCADE, related_name="search_index")
@@ -0,0 +1,253 @@
+"""
+Money amounts stored as integer minor units (cents).
+
+Invoice and payment amounts used to be ``DecimalField``s, so every
+comparison, sum and serialized value went through ``decimal.Decimal``, and
+converting to the integer amounts payment providers expect meant
+``int(amount * 100)`` on each call. They are now ``BIGINT`` columns holding
+minor units: the database sums and compares plain integers, and the
+conversion to and from major units (``Decimal('12.34')``) happens once, at
+the API boundary, and is exact.
+
+Conventions, everywhere money is handled:
+
+- ``int`` values are minor units, as stored in the column and as sent to
+  Stripe.
+- ``Decimal`` values are major units. Converting them to minor units raises
+  ``ValueError`` rather than rounding when they carry more decimal places
+  than the currency has.
+- ``float`` values are rejected: they can't represent most amounts exactly.
+
+``Money`` is a small immutable value carrying both the minor units and the
+currency, and is what ``MoneyField`` model attributes return. It compares
+equal to the ``Decimal`` it stands for, so code and tests written against
+the ``DecimalField``s keep working. Assigning a ``Decimal`` to the attribute
+is still fine; it is converted in the row's currency when read or saved.
+"""
+from decimal import Decimal, InvalidOperation
+from django.core import exceptions
+from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+
+DEFAULT_EXPONENT = 2
+
+# ISO 4217 currencies whose minor unit isn't a hundredth
+EXPONENTS = {
+    'BIF': 0, 'CLP': 0, 'DJF': 0, 'GNF': 0, 'ISK': 0, 'JPY': 0, 'KMF': 0, 'KRW': 0, 'PYG': 0,
+    'RWF': 0, 'UGX': 0, 'UYI': 0, 'VND': 0, 'VUV': 0, 'XAF': 0, 'XOF': 0, 'XPF': 0,
+    'BHD': 3, 'IQD': 3, 'JOD': 3, 'KWD': 3, 'LYD': 3, 'OMR': 3, 'TND': 3,
+}
+
+
+def exponent(currency):
+    """Number of decimal places in the currency's major unit"""
+    return EXPONENTS.get(currency, DEFAULT_EXPONENT) if currency else DEFAULT_EXPONENT
+
+
+def to_minor(value, currency=None):
+    """Exact minor units for an int (already minor), Money, or a major-unit Decimal or str"""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, Money):
+        return value.minor
+    if isinstance(value, (Decimal, str)):
+        try:
+            scaled = Decimal(value).scaleb(exponent(currency))
+        except InvalidOperation:
+            raise ValueError(f"Invalid amount '{value}'")
+        if not scaled.is_finite() or scaled != scaled.to_integral_value():
+            raise ValueError(f"Amount '{value}' has more decimal places than {currency or 'the currency'} allows")
+        return int(scaled)
+    raise TypeError(f"Unsupported amount type {type(value).__name__}")
+
+
+def to_major(minor, currency=None):
+    """Decimal major units for an amount in minor units"""
+    return Decimal(minor).scaleb(-exponent(currency))
+
+
+def format_minor(minor, places=DEFAULT_EXPONENT):
+    """'12.34' for 1234 cents, without going through Decimal"""
+    if not places:
+        return str(minor)
+    if minor < 0:
+        return '-' + format_minor(-minor, places)
+    major, fraction = divmod(minor, 10 ** places)
+    return '%d.%0*d' % (major, places, fraction)
+
+
+class Money:
+    """An immutable amount of a currency, held as integer minor units"""
+    __slots__ = ('minor', 'currency')
+
+    def __init__(self, minor, currency):
+        if minor.__class__ is not int:
+            raise TypeError(f"Money takes minor units as an int, not {type(minor).__name__}")
+        _set_minor(self, minor)
+        _set_currency(self, currency)
+
+    @classmethod
+    def from_major(cls, value, currency):
+        """Money for a major-unit Decimal or str amount, e.g. Money.from_major('12.34', 'CAD')"""
+        return cls(to_minor(value, currency), currency)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Money is immutable')
+
+    __delattr__ = __setattr__
+
+    def __reduce__(self):
+        return (Money, (self.minor, self.currency))
+
+    @property
+    def amount(self):
+        """The amount in major units, as a Decimal"""
+        return to_major(self.minor, self.currency)
+
+    def __str__(self):
+        return format_minor(self.minor, exponent(self.currency))
+
+    def __repr__(self):
+        return f"Money({self.minor}, {self.currency!r})"
+
+    def __format__(self, spec):
+        return format(self.amount, spec)
+
+    def _minor(self, other):
+        """Minor units of other in this currency, or None if it isn't an amount"""
+        if isinstance(other, Money):
+            if other.currency != self.currency:
+                raise ValueError(f"Can't combine {self.currency} and {other.currency} amounts")
+            return other.minor
+        if isinstance(other, (int, Decimal)) and not isinstance(other, bool):
+            return to_minor(other, self.currency)
+        return None
+
+    def __add__(self, other):
+        minor = self._minor(other)
+        return NotImplemented if minor is None else Money(self.minor + minor, self.currency)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        minor = self._minor(other)
+        return NotImplemented if minor is None else Money(self.minor - minor, self.currency)
+
+    def __rsub__(self, other):
+        minor = self._minor(other)
+        return NotImplemented if minor is None else Money(minor - self.minor, self.currency)
+
+    def __neg__(self):
+        return Money(-self.minor, self.currency)
+
+    def __abs__(self):
+        return Money(abs(self.minor), self.currency)
+
+    def __bool__(self):
+        return self.minor != 0
+
+    def __eq__(self, other):
+        if isinstance(other, Money):
+            return self.minor == other.minor and self.currency == other.currency
+        if isinstance(other, Decimal):
+            return self.amount == other
+        if isinstance(other, int) and not isinstance(other, bool):
+            return self.minor == other
+        return NotImplemented
+
+    def __hash__(self):
+        # Consistent with equality to the Decimal amount
+        return hash(self.amount)
+
+    def _operands(self, other):
+        """(self, other) as comparable values, or None if other isn't an amount"""
+        if isinstance(other, Decimal):
+            return self.amount, other
+        minor = self._minor(other)
+        return None if minor is None else (self.minor, minor)
+
+    def __lt__(self, other):
+        operands = self._operands(other)
+        return NotImplemented if operands is None else operands[0] < operands[1]
+
+    def __le__(self, other):
+        operands = self._operands(other)
+        return NotImplemented if operands is None else operands[0] <= operands[1]
+
+    def __gt__(self, other):
+        operands = self._operands(other)
+        return NotImplemented if operands is None else operands[0] > operands[1]
+
+    def __ge__(self, other):
+        operands = self._operands(other)
+        return NotImplemented if operands is None else operands[0] >= operands[1]
+
+
+# Slot setters, bypassing __setattr__ (and faster than object.__setattr__)
+_set_minor = Money.minor.__set__
+_set_currency = Money.currency.__set__
+
+
+class MoneyAttribute(DeferredAttribute):
+    """Model attribute returning a MoneyField's value as Money in the row's currency"""
+
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+        value = super().__get__(instance, cls)
+        if value is None or isinstance(value, Money):
+            return value
+        currency = getattr(instance, self.field.currency_field)
+        if isinstance(value, Decimal):
+            return Money(to_minor(value, currency), currency)
+        return Money(self.field.to_python(value), currency)
+
+    def __set__(self, instance, value):
+        # Stored as given: the currency may not be set yet while the model is
+        # being initialized
+        instance.__dict__[self.field.attname] = value
+
+
+class MoneyField(models.BigIntegerField):
+    """
+    An amount stored as integer minor units.
+
+    The currency comes from ``currency_field`` on the same model. Lookups,
+    ``F()`` arithmetic and aggregates work on the integers; ``.values()``
+    and aggregates return them as ints. ``Decimal`` lookup values are taken
+    to have two decimal places; filter with Money or ints for currencies
+    that don't.
+    """
+    descriptor_class = MoneyAttribute
+    description = "Amount in minor units"
+
+    def __init__(self, *args, currency_field='currency', **kwargs):
+        self.currency_field = currency_field
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.currency_field != 'currency':
+            kwargs['currency_field'] = self.currency_field
+        return name, path, args, kwargs
+
+    def to_python(self, value):
+        if isinstance(value, float):
+            raise exceptions.ValidationError(f"'{value}' is a float; use a Decimal or minor units",
+                                             code='invalid')
+        if isinstance(value, (Money, Decimal)):
+            try:
+                return to_minor(value)
+            except ValueError as e:
+                raise exceptions.ValidationError(str(e), code='invalid')
+        return super().to_python(value)
+
+    def get_prep_value(self, value):
+        if isinstance(value, (Money, Decimal, float)):
+            value = self.to_python(value)
+        return super().get_prep_value(value)
+
+    def value_from_object(self, obj):
+        """Minor units, for forms and model serialization"""
+        value = getattr(obj, self.attname)
+        return None if value is None else value.minor
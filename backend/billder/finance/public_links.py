@@ -0,0 +1,50 @@
+"""
+Signed public invoice slugs.
+
+Public links are ``invoice-<16 hex random>-<16 hex HMAC>``. The HMAC of the
+random part, keyed by ``PUBLIC_SLUG_SECRET``, lets ``PublicInvoiceView`` turn
+away malformed and guessed slugs with one regex match and one HMAC, before the
+cache or the database is consulted. Changing the secret breaks every link
+already sent out.
+
+Slugs issued before signing (``invoice-`` plus 8 hex) were moved to
+``Invoice.legacy_public_slug`` by migration 0014, and each invoice got a
+signed slug. ``canonical_slug`` maps a legacy slug to its invoice's signed
+one with a query on that column's unique index, made only for slugs of the
+legacy form; guesses at them are limited by the view's per-IP throttle. Set
+``PUBLIC_SLUG_ACCEPT_LEGACY`` to False once old links no longer need to work.
+"""
+import re
+import secrets
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+KEY_SALT = 'finance.public_links'
+SIGNED_SLUG_RE = re.compile(r'invoice-([0-9a-f]{16})-([0-9a-f]{16})')
+LEGACY_SLUG_RE = re.compile(r'invoice-[0-9a-f]{8}')
+
+
+def signature(token):
+    # Never SECRET_KEY in its place: rotating that would break every link
+    if not settings.PUBLIC_SLUG_SECRET:
+        raise ImproperlyConfigured('PUBLIC_SLUG_SECRET must be set to sign public invoice slugs')
+    return salted_hmac(KEY_SALT, token, secret=settings.PUBLIC_SLUG_SECRET, algorithm='sha256').hexdigest()[:16]
+
+
+def make_public_slug(token=None):
+    """A signed slug for `token` (16 hex), or for a random one"""
+    token = token or secrets.token_hex(8)
+    return f'invoice-{token}-{signature(token)}'
+
+
+def canonical_slug(slug):
+    """The signed slug to look `slug` up by, or None when no invoice can have it"""
+    match = SIGNED_SLUG_RE.fullmatch(slug)
+    if match:
+        return slug if constant_time_compare(match[2], signature(match[1])) else None
+    if settings.PUBLIC_SLUG_ACCEPT_LEGACY and LEGACY_SLUG_RE.fullmatch(slug):
+        from .models import Invoice
+        return Invoice.objects.filter(legacy_public_slug=slug).values_list('public_slug', flat=True).first()
+    return None
@@ -0,0 +1,212 @@
+"""
+Bring stale pending and processing payments in line with Stripe.
+
+A payment stays pending or processing locally until the confirm request or a
+webhook says otherwise; when both are lost it drifts from the payment
+intent's real status. ``reconcile_payments`` looks the drifted ones up:
+
+- Payments open for longer than ``stale_after`` are selected through the
+  partial ``payment_open_updated_idx`` index, oldest first, so the query
+  never touches the settled bulk of the table.
+- Their intents are retrieved by ``workers`` threads. A ``RateGate``
+  spaces calls to at most ``rate`` per second and, when Stripe answers
+  429 or its circuit breaker is open, holds every thread back with
+  exponential backoff before retrying.
+- Results are applied in batches of ``batch_size``, one transaction per
+  batch: the status changes are one bulk update and the invoices credited
+  by newly succeeded payments are locked and updated together. Only
+  payments still open inside the transaction change, so a webhook or
+  ``Payment.mark_succeeded`` racing the batch can't credit an invoice twice.
+
+Payments that were checked but are still open get a new ``updated_at``, so
+they are looked at again after another ``stale_after`` rather than at the
+head of every run.
+"""
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.db import connection, models, transaction
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from .cache import invalidate_public_invoice
+from .models import Invoice, Payment
+from .services import get_payment_service
+from .services.resilience import get_guard
+
+logger = logging.getLogger(__name__)
+
+OPEN_STATUSES = [Payment.Status.PENDING, Payment.Status.PROCESSING]
+# The partial index's condition, with literals: SQLite only uses a partial
+# index when the query repeats its condition, which bound parameters (and so
+# Q(status__in=...)) don't. Raw SQL isn't tied to a table, so the column is
+# qualified; unqualified it would be ambiguous once Invoice, which has a
+# status too, is joined.
+OPEN_INDEX = next(index for index in Payment._meta.indexes if index.name == 'payment_open_updated_idx')
+IS_OPEN = RawSQL('{}.{} IN ({})'.format(
+    connection.ops.quote_name(Payment._meta.db_table),
+    connection.ops.quote_name(Payment._meta.get_field('status').column),
+    ', '.join(f"'{value}'" for value in dict(OPEN_INDEX.condition.children)['status__in']),
+), (), output_field=models.BooleanField())
+
+# Provider answers worth backing off and asking again
+RETRIED_ERRORS = ('rate_limit', 'provider_unavailable')
+
+# Payment intent status -> payment status; anything else leaves the payment open
+INTENT_STATUSES = {
+    'succeeded': Payment.Status.SUCCEEDED,
+    'canceled': Payment.Status.CANCELED,
+    'processing': Payment.Status.PROCESSING,
+}
+
+
+@dataclass
+class ReconcileStats:
+    stale: int = 0
+    checked: int = 0
+    transitions: Counter = field(default_factory=Counter)
+    unchanged: int = 0
+    errors: int = 0
+    rate_limited: int = 0
+    lag: timedelta = timedelta(0)
+    backlog: int = 0
+    seconds: float = 0.0
+
+    @property
+    def changed(self):
+        return sum(self.transitions.values())
+
+
+class RateGate:
+    """Spaces calls across threads to `rate` per second, and pauses them all after a rate limit"""
+
+    def __init__(self, rate=None, backoff=1.0, max_backoff=30.0):
+        self.interval = 1 / rate if rate else 0
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.lock = threading.Lock()
+        self.next_at = time.monotonic()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_at)
+            self.next_at = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def back_off(self, attempt):
+        delay = min(self.backoff * 2 ** attempt, self.max_backoff)
+        with self.lock:
+            self.next_at = max(self.next_at, time.monotonic() + delay)
+
+
+def stale_payments(cutoff, provider=Payment.PaymentProvider.STRIPE):
+    """Open payments not updated since cutoff, oldest first"""
+    return Payment.objects.filter(
+        IS_OPEN, payment_provider=provider, updated_at__lt=cutoff,
+    ).exclude(external_payment_id=None).order_by('updated_at')
+
+
+def fetch_status(service, gate, payment_intent_id, max_retries):
+    """The provider's status result and the number of rate limited or rejected attempts"""
+    for attempt in range(max_retries + 1):
+        gate.wait()
+        result = service.get_payment_status(payment_intent_id)
+        if result['success'] or result.get('error_type') not in RETRIED_ERRORS:
+            return result, attempt
+        gate.back_off(attempt)
+    return result, max_retries + 1
+
+
+def target_status(result):
+    """The payment status an intent status result calls for, or None to leave it open"""
+    if result['status'] == 'requires_payment_method' and result.get('failure_message'):
+        return Payment.Status.FAILED
+    return INTENT_STATUSES.get(result['status'])
+
+
+def apply_statuses(checked, stats):
+    """Apply [(payment_id, result), ...] in one transaction"""
+    now = timezone.now()
+    results = dict(checked)
+    changed, credits, touched_invoices = [], defaultdict(int), set()
+    with transaction.atomic():
+        payments = Payment.objects.select_for_update().filter(pk__in=results, status__in=OPEN_STATUSES).only(
+            'id', 'invoice', 'amount', 'currency', 'status', 'external_charge_id', 'processed_at', 'updated_at',
+        )
+        for payment in payments:
+            result = results[payment.pk]
+            status = target_status(result) if result['success'] else None
+            if status is None or status == payment.status:
+                continue
+            stats.transitions[status] += 1
+            payment.status = status
+            payment.updated_at = now
+            if status == Payment.Status.SUCCEEDED:
+                payment.processed_at = now
+                payment.external_charge_id = result.get('latest_charge') or payment.external_charge_id
+                credits[payment.invoice_id] += payment.amount.minor
+            changed.append(payment)
+            touched_invoices.add(payment.invoice_id)
+
+        Payment.objects.bulk_update(changed, ['status', 'processed_at', 'external_charge_id', 'updated_at'])
+        # Checked but still open: back of the queue
+        Payment.objects.filter(pk__in=results, status__in=OPEN_STATUSES).update(updated_at=now)
+
+        invoices = Invoice.objects.select_for_update().in_bulk(credits)
+        for invoice in invoices.values():
+            invoice.amount_paid += credits[invoice.pk]
+            if invoice.amount_paid >= invoice.total_amount:
+                invoice.status = Invoice.Status.PAID
+            invoice.updated_at = now
+        Invoice.objects.bulk_update(invoices.values(), ['amount_paid', 'status', 'updated_at'])
+
+        # Bulk updates send no post_save, so drop the public payloads here
+        slugs = list(Invoice.objects.filter(pk__in=touched_invoices).values_list('public_slug', flat=True))
+        transaction.on_commit(lambda: invalidate_public_invoices(slugs))
+    stats.unchanged += sum(1 for _, result in checked if result['success']) - len(changed)
+
+
+def invalidate_public_invoices(slugs):
+    for slug in slugs:
+        invalidate_public_invoice(slug)
+
+
+def reconcile_payments(stale_after=timedelta(minutes=15), limit=5000, workers=8, batch_size=200, rate=None,
+                       max_retries=5, backoff=1.0, provider=Payment.PaymentProvider.STRIPE):
+    """Check up to `limit` payments open for longer than stale_after; returns ReconcileStats"""
+    started = time.perf_counter()
+    now = timezone.now()
+    cutoff = now - stale_after
+    stale = list(stale_payments(cutoff, provider).values_list('id', 'external_payment_id', 'updated_at')[:limit])
+    stats = ReconcileStats(stale=len(stale))
+    if stale:
+        stats.lag = now - stale[0][2]
+
+    service = get_payment_service(provider)
+    get_guard(provider).bulkhead.ensure_capacity(workers)
+    gate = RateGate(rate, backoff)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Applied batch by batch while later statuses are still being fetched
+        futures = [executor.submit(fetch_status, service, gate, intent_id, max_retries) for _, intent_id, _ in stale]
+        for offset in range(0, len(stale), batch_size):
+            checked = []
+            for (payment_id, intent_id, _), future in zip(stale[offset:offset + batch_size],
+                                                          futures[offset:offset + batch_size]):
+                result, rate_limited = future.result()
+                stats.rate_limited += rate_limited
+                if not result['success']:
+                    logger.error(f"Error reconciling payment {payment_id} ({intent_id}): {result.get('error')}")
+                    stats.errors += 1
+                stats.checked += 1
+                checked.append((payment_id, result))
+            apply_statuses(checked, stats)
+
+    stats.backlog = stale_payments(cutoff, provider).count()
+    stats.seconds = time.perf_counter() - started
+    return stats
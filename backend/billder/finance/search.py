@@ -0,0 +1,170 @@
+"""
+Invoice and payment search.
+
+``filters.SearchFilter`` ORs ``icontains`` lookups across joined tables, so
+every search is a sequential LIKE scan over invoices joined to users.
+Instead each invoice and payment has a lower-cased search document
+(``InvoiceSearchDocument`` / ``PaymentSearchDocument``) that is rewritten
+when the row, or the customer it mentions, is saved (see ``finance.signals``),
+and indexed by the database:
+
+- SQLite: an external-content FTS5 table with the trigram tokenizer, kept in
+  step with the document table by triggers.
+- PostgreSQL: a ``pg_trgm`` GIN index, which serves ``LIKE '%term%'``.
+
+Both are created by migration 0008, which carries its own copy of the DDL.
+
+Terms shorter than a trigram can't use either index; they fall back to LIKE
+on the document table, which is still a single-table scan without joins.
+Rows written with ``bulk_create`` have no documents until
+``manage.py rebuild_search_index`` runs.
+"""
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework import filters
+
+TRIGRAM = 3
+
+# Backends with INSERT ... ON CONFLICT ... DO UPDATE ... WHERE support
+UPSERT_VENDORS = ('postgresql', 'sqlite')
+
+
+def normalize(*parts):
+    return ' '.join(str(part).lower() for part in parts if part not in (None, ''))
+
+
+def invoice_document(invoice):
+    customer = invoice.customer
+    return normalize(invoice.reference, customer.first_name, customer.last_name, customer.email)
+
+
+def payment_document(payment):
+    return normalize(payment.invoice.reference, payment.amount, payment.description)
+
+
+def source_field(model):
+    """The search document's one-to-one field pointing at ``model``"""
+    return model._meta.get_field('search_index').field
+
+
+def fts_table(model):
+    return f'{model._meta.db_table}_fts'
+
+
+def save_document(obj, document, using=DEFAULT_DB_ALIAS):
+    """
+    Insert or refresh the search document of an invoice or payment.
+
+    Returns whether anything was written: unchanged documents are left alone
+    so the full-text index isn't churned by unrelated saves.
+    """
+    field = source_field(type(obj))
+    model = field.model
+    connection = connections[using]
+    if connection.vendor not in UPSERT_VENDORS:
+        search_index, created = model.objects.using(using).get_or_create(
+            **{field.name: obj}, defaults={'document': document}
+        )
+        if created or search_index.document == document:
+            return created
+        search_index.document = document
+        search_index.save(using=using, update_fields=['document'])
+        return True
+
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    column = qn(field.column)
+    sql = (
+        f'INSERT INTO {table} ({column}, "document") VALUES (%s, %s) '
+        f'ON CONFLICT ({column}) DO UPDATE SET "document" = excluded."document" '
+        f'WHERE {table}."document" <> excluded."document"'
+    )
+    source_id = field.get_db_prep_value(obj.pk, connection)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [source_id, document])
+        return cursor.rowcount > 0
+
+
+class SearchBackend:
+    """Keep rows whose search document contains every term (LIKE '%term%')"""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def filter(self, queryset, terms):
+        for term in terms:
+            queryset = queryset.filter(search_index__document__contains=term)
+        return queryset
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """
+    Match terms of a trigram or longer through the FTS5 table.
+
+    The matching ids are fetched first and filtered as a literal list, which
+    lets SQLite drive the query from the (usually few) matches instead of
+    scanning every invoice of the owner and probing a subquery. Terms common
+    enough to match more than ``max_matches`` rows gain nothing from the index
+    and fall back to LIKE.
+    """
+    max_matches = 1000
+
+    def filter(self, queryset, terms):
+        indexed = [term for term in terms if len(term) >= TRIGRAM]
+        if indexed:
+            ids = self.match(queryset.model, indexed)
+            if len(ids) <= self.max_matches:
+                queryset = queryset.filter(pk__in=ids)
+                terms = [term for term in terms if len(term) < TRIGRAM]
+        return super().filter(queryset, terms)
+
+    def match(self, model, terms):
+        field = source_field(model)
+        qn = self.connection.ops.quote_name
+        table = qn(field.model._meta.db_table)
+        fts = qn(fts_table(field.model))
+        # Each term is a quoted phrase; adjacent phrases are ANDed
+        match = ' '.join('"%s"' % term.replace('"', '""') for term in terms)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT d.{qn(field.column)} FROM {fts} JOIN {table} d ON d."id" = {fts}."rowid" '
+                f'WHERE {fts} MATCH %s LIMIT %s',
+                [match, self.max_matches + 1],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+BACKENDS = {
+    'sqlite': SQLiteFTSBackend,
+}
+
+
+def get_search_backend(using=DEFAULT_DB_ALIAS):
+    connection = connections[using]
+    return BACKENDS.get(connection.vendor, SearchBackend)(connection)
+
+
+class DocumentSearchFilter(filters.SearchFilter):
+    """
+    ``?search=`` over the indexed search document.
+
+    Drop-in for ``filters.SearchFilter`` on models with a ``search_index``;
+    the view's ``search_fields`` only describe what the document contains.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = [term.lower() for term in self.get_search_terms(request)]
+        if not terms:
+            return queryset
+        return get_search_backend(queryset.db).filter(queryset, terms)
+
+
+def rebuild_documents(invoice_model, payment_model, using=DEFAULT_DB_ALIAS, batch_size=1000):
+    """Write search documents for every invoice and payment; returns the count"""
+    count = 0
+    invoices = invoice_model.objects.using(using).select_related('customer').order_by('pk')
+    payments = payment_model.objects.using(using).select_related('invoice').order_by('pk')
+    for queryset, build in ((invoices, invoice_document), (payments, payment_document)):
+        for obj in queryset.iterator(chunk_size=batch_size):
+            save_document(obj, build(obj), using)
+            count += 1
+    return count
@@ -1,11 +1,55 @@
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 from decimal import Decimal
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+from . import money
 from .models import Invoice, Payment
 
 User = get_user_model()
 
-class InvoiceListSerializer(serializers.ModelSerializer):
+
+class MoneyField(serializers.DecimalField):
+    """Amounts in major units ('12.34') for model MoneyFields"""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('max_digits', None)
+        kwargs.setdefault('decimal_places', 2)
+        # The model field's integer range is in minor units
+        kwargs.pop('min_value', None)
+        kwargs.pop('max_value', None)
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not isinstance(value, money.Money):
+            return super().to_representation(value)
+        if getattr(self, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING):
+            return str(value)
+        return value.amount
+
+
+class ModelSerializer(serializers.ModelSerializer):
+    """ModelSerializer that maps model MoneyFields to MoneyField"""
+    serializer_field_mapping = {
+        **serializers.ModelSerializer.serializer_field_mapping,
+        money.MoneyField: MoneyField,
+    }
+
+
+def invoice_remaining_balance(obj):
+    """Use the with_balance() annotation when the queryset provides it"""
+    if hasattr(obj, 'remaining_balance'):
+        return money.to_major(obj.remaining_balance, obj.currency)
+    return (obj.total_amount - obj.amount_paid).amount
+
+
+def invoice_is_overdue(obj):
+    if hasattr(obj, 'is_overdue'):
+        return obj.is_overdue
+    return obj.due_date < timezone.now().date() and obj.status != 'paid'
+
+
+class InvoiceListSerializer(ModelSerializer):
     customer_name = serializers.SerializerMethodField()
     customer_email = serializers.SerializerMethodField()
     owner_name = serializers.SerializerMethodField()
@@ -34,14 +78,13 @@ class InvoiceListSerializer(serializers.ModelSerializer):
         return obj.owner.email
     
     def get_remaining_balance(self, obj):
-        return obj.total_amount - obj.amount_paid
+        return invoice_remaining_balance(obj)
     
     def get_is_overdue(self, obj):
-        from django.utils import timezone
-        return obj.due_date < timezone.now().date() and obj.status != 'paid'
+        return invoice_is_overdue(obj)
 
 
-class PaymentSerializer(serializers.ModelSerializer):
+class PaymentSerializer(ModelSerializer):
     """Serializer for Payment model - used for API responses"""
     invoice_reference = serializers.CharField(source='invoice.reference', read_only=True)
     customer_name = serializers.SerializerMethodField()
@@ -139,7 +182,7 @@ class PaymentConfirmSerializer(serializers.Serializer):
             raise serializers.ValidationError("Payment intent not found")
 
 
-class InvoiceCreateSerializer(serializers.ModelSerializer):
+class InvoiceCreateSerializer(ModelSerializer):
     """Serializer for creating invoices"""
     customer_email = serializers.EmailField(write_only=True)
     
@@ -169,7 +212,7 @@ class InvoiceCreateSerializer(serializers.ModelSerializer):
         )
         return invoice
 
-class InvoiceDetailSerializer(serializers.ModelSerializer):
+class InvoiceDetailSerializer(ModelSerializer):
     """Serializer for detailed invoice view with full customer and owner info"""
     customer = serializers.SerializerMethodField()
     owner = serializers.SerializerMethodField()
@@ -199,14 +242,13 @@ class InvoiceDetailSerializer(serializers.ModelSerializer):
         }
     
     def get_remaining_balance(self, obj):
-        return obj.total_amount - obj.amount_paid
+        return invoice_remaining_balance(obj)
     
     def get_is_overdue(self, obj):
-        from django.utils import timezone
-        return obj.due_date < timezone.now().date() and obj.status != 'paid'
+        return invoice_is_overdue(obj)
 
 
-class PaymentStatusSerializer(serializers.ModelSerializer):
+class PaymentStatusSerializer(ModelSerializer):
     """Serializer for payment status responses"""
     invoice_reference = serializers.CharField(source='invoice.reference', read_only=True)
     is_successful = serializers.ReadOnlyField()
@@ -256,7 +298,7 @@ class RefundCreateSerializer(serializers.Serializer):
         return value
 
 
-class RefundSerializer(serializers.ModelSerializer):
+class RefundSerializer(ModelSerializer):
     """Serializer for refund responses"""
     payment_reference = serializers.CharField(source='invoice.reference', read_only=True)
     customer_name = serializers.SerializerMethodField()
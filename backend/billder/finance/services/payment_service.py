@@ -6,17 +6,19 @@ class PaymentService(ABC):
     """Simple payment service interface"""
     
     @abstractmethod
-    def create_payment_intent(self, amount: Decimal, currency: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
+    def create_payment_intent(self, amount: Decimal, currency: str, metadata: Dict[str, Any],
+                              idempotency_key: str = None) -> Dict[str, Any]:
         """Create payment intent with provider"""
         pass
     
     @abstractmethod
-    def confirm_payment(self, payment_intent_id: str) -> Dict[str, Any]:
+    def confirm_payment(self, payment_intent_id: str, payment_method_id: str = None,
+                        idempotency_key: str = None) -> Dict[str, Any]:
         """Confirm payment with provider"""
         pass
     
     @abstractmethod
-    def cancel_payment(self, payment_intent_id: str) -> Dict[str, Any]:
+    def cancel_payment(self, payment_intent_id: str, idempotency_key: str = None) -> Dict[str, Any]:
         """Cancel payment with provider"""
         pass
     
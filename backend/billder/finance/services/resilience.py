@@ -0,0 +1,195 @@
+"""
+Circuit breaker and bulkhead around payment provider calls.
+
+A slow or failing provider would otherwise hold every web thread that calls
+it for the full client timeout, and requests that never touch the provider
+(invoice lists, public invoices) starve behind them. Each provider gets one
+``ProviderGuard`` per process, which payment services wrap their API calls
+in:
+
+- The bulkhead admits at most ``PAYMENT_PROVIDER_MAX_CONCURRENCY`` calls at
+  once. A call waits up to ``PAYMENT_PROVIDER_QUEUE_TIMEOUT`` seconds for a
+  slot and is then rejected.
+- The circuit breaker opens after ``PAYMENT_PROVIDER_FAILURE_THRESHOLD``
+  consecutive failures: connection errors and timeouts, provider 5xx, and
+  calls slower than ``PAYMENT_PROVIDER_SLOW_CALL`` seconds. Declined cards
+  and other client errors mean the provider is up, and count as successes.
+  While open, calls are rejected without touching the network. After
+  ``PAYMENT_PROVIDER_RESET_TIMEOUT`` seconds one trial call is let through
+  (half-open), and its outcome closes or reopens the circuit.
+
+Rejections raise ``ProviderUnavailable``; the services turn it into an
+``error_type`` of ``'provider_unavailable'``. ``guard_metrics()`` reports
+each guard's state for the metrics endpoint.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from django.conf import settings
+
+
+class ProviderUnavailable(Exception):
+    pass
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.times_opened = 0
+
+    def allow(self):
+        """Whether a call may go ahead; in half-open, only one trial at a time"""
+        with self.lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class Bulkhead:
+    """At most `limit` calls in flight; others wait up to `timeout` seconds for a slot"""
+
+    def __init__(self, limit, timeout):
+        self.limit = limit
+        self.timeout = timeout
+        self.in_flight = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.in_flight < self.limit, self.timeout):
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify()
+
+    def ensure_capacity(self, limit):
+        """Admit at least `limit` calls, e.g. for a command's worker threads"""
+        with self.condition:
+            self.limit = max(self.limit, limit)
+            self.condition.notify_all()
+
+
+class ProviderGuard:
+    def __init__(self, name, breaker, bulkhead, slow_call):
+        self.name = name
+        self.breaker = breaker
+        self.bulkhead = bulkhead
+        self.slow_call = slow_call
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.rejected = 0
+        self.short_circuited = 0
+
+    @contextmanager
+    def call(self, failures=(Exception,)):
+        """
+        Run the block as one provider call.
+
+        Exceptions that are instances of `failures` count against the
+        provider; anything else (e.g. a declined card) passes through as a
+        success.
+        """
+        if not self.bulkhead.acquire():
+            self.count('rejected')
+            raise ProviderUnavailable(f'Too many {self.name} calls in progress, try again shortly')
+        try:
+            if not self.breaker.allow():
+                self.count('short_circuited')
+                raise ProviderUnavailable(f'{self.name} is unavailable, try again shortly')
+            self.count('calls')
+            started = time.monotonic()
+            try:
+                yield
+            except failures:
+                self.breaker.record_failure()
+                raise
+            except BaseException:
+                self.breaker.record_success()
+                raise
+            if time.monotonic() - started > self.slow_call:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+        finally:
+            self.bulkhead.release()
+
+    def count(self, counter):
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def metrics(self):
+        breaker = self.breaker
+        return {
+            'state': breaker.state,
+            'consecutive_failures': breaker.failures,
+            'times_opened': breaker.times_opened,
+            'in_flight': self.bulkhead.in_flight,
+            'max_concurrency': self.bulkhead.limit,
+            'calls': self.calls,
+            'rejected': self.rejected,
+            'short_circuited': self.short_circuited,
+        }
+
+
+_guards = {}
+_lock = threading.Lock()
+
+
+def get_guard(name):
+    """The process-wide guard for a provider, configured from settings on first use"""
+    with _lock:
+        guard = _guards.get(name)
+        if guard is None:
+            guard = _guards[name] = ProviderGuard(
+                name,
+                CircuitBreaker(settings.PAYMENT_PROVIDER_FAILURE_THRESHOLD, settings.PAYMENT_PROVIDER_RESET_TIMEOUT),
+                Bulkhead(settings.PAYMENT_PROVIDER_MAX_CONCURRENCY, settings.PAYMENT_PROVIDER_QUEUE_TIMEOUT),
+                settings.PAYMENT_PROVIDER_SLOW_CALL,
+            )
+        return guard
+
+
+def reset_guards():
+    """Forget every guard, so the next calls start closed with current settings"""
+    with _lock:
+        _guards.clear()
+
+
+def guard_metrics():
+    with _lock:
+        return {name: guard.metrics() for name, guard in _guards.items()}
@@ -1,31 +1,86 @@
-import stripe
 from decimal import Decimal
-from typing import Dict, Any
+from importlib import import_module
+from typing import Dict, Any, List
 from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+from ..money import to_major, to_minor
 from .payment_service import PaymentService
+from .resilience import ProviderUnavailable, get_guard
 import logging
 
 logger = logging.getLogger(__name__)
 
+# The SDK takes longer to import than the rest of the app, so it is imported
+# on first use rather than by every worker and management command
+stripe = SimpleLazyObject(lambda: import_module('stripe'))
+
+
+def provider_failures():
+    """Errors that mean Stripe itself is unhealthy (timeouts, connection failures,
+    5xx); declined cards and bad requests don't count against the breaker"""
+    return (stripe.error.APIConnectionError, stripe.error.APIError)
+
+_http_clients = {}
+
+
+def http_client(timeout):
+    """A pooled HTTP client per timeout, rather than the SDK's 80 second default"""
+    if timeout not in _http_clients:
+        _http_clients[timeout] = stripe.new_default_http_client(timeout=timeout)
+    return _http_clients[timeout]
+
+
+def request_options(idempotency_key):
+    """Stripe request options for a mutation, retried with the same key"""
+    return {'idempotency_key': idempotency_key} if idempotency_key else {}
+
+
+def provider_unavailable(e) -> Dict[str, Any]:
+    logger.warning(f"Stripe call rejected: {e}")
+    return {
+        'success': False,
+        'error': str(e),
+        'error_type': 'provider_unavailable'
+    }
+
+
+def intent_status(intent) -> Dict[str, Any]:
+    """get_payment_status's result for a payment intent, retrieved or from a webhook"""
+    return {
+        'success': True,
+        'status': intent['status'],
+        'payment_intent_id': intent['id'],
+        'amount': to_major(intent['amount'], intent['currency'].upper()),
+        'currency': intent['currency'],
+        'latest_charge': intent.get('latest_charge'),
+        'failure_message': (intent.get('last_payment_error') or {}).get('message')
+    }
+
 class StripePaymentService(PaymentService):
     """Simple Stripe payment service implementation"""
     
     def __init__(self):
         stripe.api_key = settings.STRIPE_SECRET_KEY
+        stripe.api_base = settings.STRIPE_API_BASE
+        stripe.default_http_client = http_client(settings.STRIPE_TIMEOUT)
+        self.guard = get_guard('stripe')
     
-    def create_payment_intent(self, amount: Decimal, currency: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
+    def create_payment_intent(self, amount: Decimal, currency: str, metadata: Dict[str, Any],
+                              idempotency_key: str = None) -> Dict[str, Any]:
         """Create Stripe payment intent"""
         try:
             # Check if Stripe API key is valid
             if not stripe.api_key or stripe.api_key.startswith('sk_test_your_') or stripe.api_key.startswith('sk_live_your_'):
                 raise ValueError("Invalid Stripe API key")
                 
-            intent = stripe.PaymentIntent.create(
-                amount=int(amount * 100),  # Convert to cents
-                currency='cad',  # Force CAD currency
-                metadata=metadata,
-                payment_method_types=['card'],  # Only allow card payments
-            )
+            with self.guard.call(provider_failures()):
+                intent = stripe.PaymentIntent.create(
+                    amount=to_minor(amount, 'CAD'),
+                    currency='cad',  # Force CAD currency
+                    metadata=metadata,
+                    payment_method_types=['card'],  # Only allow card payments
+                    **request_options(idempotency_key),
+                )
             
             return {
                 'success': True,
@@ -36,6 +91,8 @@ class StripePaymentService(PaymentService):
                 'currency': currency
             }
             
+        except ProviderUnavailable as e:
+            return provider_unavailable(e)
         except (stripe.error.StripeError, ValueError) as e:
             logger.error(f"Stripe error creating payment intent: {e}")
             return {
@@ -51,10 +108,12 @@ class StripePaymentService(PaymentService):
                 'error_type': 'internal_error'
             }
     
-    def confirm_payment(self, payment_intent_id: str, payment_method_id: str = None) -> Dict[str, Any]:
+    def confirm_payment(self, payment_intent_id: str, payment_method_id: str = None,
+                        idempotency_key: str = None) -> Dict[str, Any]:
         """Confirm Stripe payment intent"""
         try:
-            intent = stripe.PaymentIntent.retrieve(payment_intent_id)
+            with self.guard.call(provider_failures()):
+                intent = stripe.PaymentIntent.retrieve(payment_intent_id)
             
             if intent.status == 'succeeded':
                 return {
@@ -66,10 +125,12 @@ class StripePaymentService(PaymentService):
             if intent.status == 'requires_payment_method':
                 if payment_method_id:
                     # Confirm the payment intent with the payment method
-                    confirmed_intent = stripe.PaymentIntent.confirm(
-                        payment_intent_id,
-                        payment_method=payment_method_id
-                    )
+                    with self.guard.call(provider_failures()):
+                        confirmed_intent = stripe.PaymentIntent.confirm(
+                            payment_intent_id,
+                            payment_method=payment_method_id,
+                            **request_options(idempotency_key),
+                        )
                     return {
                         'success': True,
                         'status': confirmed_intent.status,
@@ -88,6 +149,8 @@ class StripePaymentService(PaymentService):
                 'payment_intent_id': payment_intent_id
             }
             
+        except ProviderUnavailable as e:
+            return provider_unavailable(e)
         except stripe.error.CardError as e:
             logger.error(f"Stripe card error: {e}")
             return {
@@ -124,10 +187,11 @@ class StripePaymentService(PaymentService):
                 'error_type': 'internal_error'
             }
     
-    def cancel_payment(self, payment_intent_id: str) -> Dict[str, Any]:
+    def cancel_payment(self, payment_intent_id: str, idempotency_key: str = None) -> Dict[str, Any]:
         """Cancel Stripe payment intent"""
         try:
-            intent = stripe.PaymentIntent.cancel(payment_intent_id)
+            with self.guard.call(provider_failures()):
+                intent = stripe.PaymentIntent.cancel(payment_intent_id, **request_options(idempotency_key))
             
             return {
                 'success': True,
@@ -135,6 +199,8 @@ class StripePaymentService(PaymentService):
                 'payment_intent_id': payment_intent_id
             }
             
+        except ProviderUnavailable as e:
+            return provider_unavailable(e)
         except stripe.error.StripeError as e:
             logger.error(f"Stripe error canceling payment: {e}")
             return {
@@ -153,16 +219,19 @@ class StripePaymentService(PaymentService):
     def get_payment_status(self, payment_intent_id: str) -> Dict[str, Any]:
         """Get Stripe payment status"""
         try:
-            intent = stripe.PaymentIntent.retrieve(payment_intent_id)
+            with self.guard.call(provider_failures()):
+                intent = stripe.PaymentIntent.retrieve(payment_intent_id)
+            return intent_status(intent)
             
+        except ProviderUnavailable as e:
+            return provider_unavailable(e)
+        except stripe.error.RateLimitError as e:
+            logger.warning(f"Stripe rate limit getting payment status: {e}")
             return {
-                'success': True,
-                'status': intent.status,
-                'payment_intent_id': payment_intent_id,
-                'amount': intent.amount / 100,  # Convert from cents
-                'currency': intent.currency
+                'success': False,
+                'error': str(e),
+                'error_type': 'rate_limit'
             }
-            
         except stripe.error.StripeError as e:
             logger.error(f"Stripe error getting payment status: {e}")
             return {
@@ -178,14 +247,16 @@ class StripePaymentService(PaymentService):
                 'error_type': 'internal_error'
             }
 
-    def create_refund(self, payment_intent_id: str, amount: Decimal = None) -> Dict[str, Any]:
+    def create_refund(self, payment_intent_id: str, amount: Decimal = None,
+                      idempotency_key: str = None) -> Dict[str, Any]:
         """Create Stripe refund"""
         try:
-            # Get the payment intent
-            intent = stripe.PaymentIntent.retrieve(payment_intent_id)
-            
-            # Get the latest charge
-            charges = stripe.Charge.list(payment_intent=payment_intent_id)
+            with self.guard.call(provider_failures()):
+                # Get the payment intent
+                intent = stripe.PaymentIntent.retrieve(payment_intent_id)
+                
+                # Get the latest charge
+                charges = stripe.Charge.list(payment_intent=payment_intent_id)
             if not charges.data:
                 return {
                     'success': False,
@@ -198,18 +269,21 @@ class StripePaymentService(PaymentService):
             # Create refund
             refund_data = {'charge': charge.id}
             if amount:
-                refund_data['amount'] = int(amount * 100)  # Convert to cents
+                refund_data['amount'] = to_minor(amount, charge.currency.upper())
             
-            refund = stripe.Refund.create(**refund_data)
+            with self.guard.call(provider_failures()):
+                refund = stripe.Refund.create(**refund_data, **request_options(idempotency_key))
             
             return {
                 'success': True,
                 'refund_id': refund.id,
                 'status': refund.status,
-                'amount': refund.amount / 100,  # Convert back to dollars
+                'amount': to_major(refund.amount, charge.currency.upper()),
                 'charge_id': charge.id
             }
             
+        except ProviderUnavailable as e:
+            return provider_unavailable(e)
         except stripe.error.InvalidRequestError as e:
             logger.error(f"Stripe invalid request error: {e}")
             return {
@@ -245,3 +319,40 @@ class StripePaymentService(PaymentService):
                 'error': 'Internal server error',
                 'error_type': 'internal_error'
             }
+
+    def list_events(self, types: List[str], created_gte: int, created_lt: int,
+                    starting_after: str = None, limit: int = 100) -> Dict[str, Any]:
+        """List one page of events created in [created_gte, created_lt), newest first"""
+        try:
+            params = {
+                'types': types,
+                'created': {'gte': created_gte, 'lt': created_lt},
+                'limit': limit,
+            }
+            if starting_after:
+                params['starting_after'] = starting_after
+            with self.guard.call(provider_failures()):
+                page = stripe.Event.list(**params)
+            
+            return {
+                'success': True,
+                'events': page.data,
+                'has_more': page.has_more
+            }
+            
+        except ProviderUnavailable as e:
+            return provider_unavailable(e)
+        except stripe.error.StripeError as e:
+            logger.error(f"Stripe error listing events: {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'error_type': 'stripe_error'
+            }
+        except Exception as e:
+            logger.error(f"Unexpected error listing events: {e}")
+            return {
+                'success': False,
+                'error': 'Internal server error',
+                'error_type': 'internal_error'
+            }
@@ -0,0 +1,71 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from . import autocomplete
+from .cache import invalidate_public_invoice
+from .models import Invoice, Payment
+from .search import invoice_document, payment_document, save_document
+
+User = get_user_model()
+
+# Fields each search document is built from; saves touching none of them
+# (e.g. update_fields=['last_login']) leave the document alone
+INVOICE_SEARCH_FIELDS = {'reference', 'customer'}
+PAYMENT_SEARCH_FIELDS = {'invoice', 'amount', 'description'}
+CUSTOMER_SEARCH_FIELDS = {'first_name', 'last_name', 'email'}
+
+
+def touches(update_fields, fields):
+    return update_fields is None or not fields.isdisjoint(update_fields)
+
+
+@receiver([post_save, post_delete], sender=Invoice)
+def invoice_changed(sender, instance, **kwargs):
+    """Drop the cached public payload of a changed invoice"""
+    invalidate_public_invoice(instance.public_slug)
+
+
+@receiver([post_save, post_delete], sender=Payment)
+def payment_changed(sender, instance, **kwargs):
+    """Public invoice payloads list payments, so drop the invoice's entry"""
+    invalidate_public_invoice(instance.invoice.public_slug)
+
+
+@receiver(post_save, sender=Invoice)
+def index_invoice(sender, instance, created, update_fields, using, **kwargs):
+    """Refresh the invoice's search document, and its payments' on a new reference"""
+    if not touches(update_fields, INVOICE_SEARCH_FIELDS):
+        return
+    changed = save_document(instance, invoice_document(instance), using)
+    if changed and not created:
+        for payment in instance.payments.using(using):
+            payment.invoice = instance
+            save_document(payment, payment_document(payment), using)
+
+
+@receiver(post_save, sender=Payment)
+def index_payment(sender, instance, update_fields, using, **kwargs):
+    if touches(update_fields, PAYMENT_SEARCH_FIELDS):
+        save_document(instance, payment_document(instance), using)
+
+
+@receiver(post_save, sender=User)
+def index_customer_invoices(sender, instance, created, update_fields, using, **kwargs):
+    """Invoice documents include the customer's name and email"""
+    if created or not touches(update_fields, CUSTOMER_SEARCH_FIELDS):
+        return
+    for invoice in Invoice.objects.using(using).filter(customer=instance).only('id', 'reference', 'customer'):
+        invoice.customer = instance
+        save_document(invoice, invoice_document(invoice), using)
+
+
+@receiver(post_save, sender=Invoice)
+def add_autocomplete_customer(sender, instance, created, **kwargs):
+    if created:
+        autocomplete.customer_added(instance.owner_id, instance.customer)
+
+
+@receiver(post_save, sender=User)
+def refresh_autocomplete_customer(sender, instance, created, update_fields, **kwargs):
+    if not created and touches(update_fields, CUSTOMER_SEARCH_FIELDS):
+        autocomplete.customer_changed(instance.pk)
@@ -0,0 +1,85 @@
+"""
+Short-lived cache of provider payment statuses.
+
+Clients poll ``PaymentViewSet.status`` while a payment settles, and every
+poll would otherwise be its own ``PaymentIntent.retrieve``.
+``get_payment_status`` keeps successful lookups for
+``PAYMENT_STATUS_CACHE_TIMEOUT`` seconds. Concurrent misses for the same
+intent within a process share a single in-flight request: the first caller
+fetches and the others wait for its result. Failed lookups are shared with
+the callers already waiting but not cached.
+
+Webhooks write the intent they carry through to the cache (see
+``webhook_views.process_event``), so a poll right after a webhook sees the
+new status. Entries record when their data was current, and an older event,
+e.g. one being replayed, doesn't replace a newer lookup. Events older than
+the cache timeout aren't written at all: with nothing cached for the intent
+there is nothing to compare them to, and a poll would be served their stale
+status for the full timeout.
+"""
+import logging
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from .services import get_payment_service
+
+logger = logging.getLogger(__name__)
+
+_flights = {}
+_lock = threading.Lock()
+
+
+class Flight:
+    """A lookup in progress, and its result once done"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = {'success': False, 'error': 'Internal server error', 'error_type': 'internal_error'}
+
+
+def payment_status_key(provider, payment_intent_id):
+    return f'payment-status:{provider}:{payment_intent_id}'
+
+
+def get_payment_status(payment_intent_id, provider='stripe'):
+    """The provider's get_payment_status result, cached and coalesced"""
+    key = payment_status_key(provider, payment_intent_id)
+    entry = cache.get(key)
+    if entry is not None:
+        return entry['result']
+
+    with _lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = Flight()
+    if not leader:
+        flight.done.wait()
+        return flight.result
+
+    try:
+        as_of = time.time()
+        flight.result = get_payment_service(provider).get_payment_status(payment_intent_id)
+        if flight.result['success']:
+            # add: a webhook written through meanwhile is newer
+            cache.add(key, {'result': flight.result, 'as_of': as_of}, settings.PAYMENT_STATUS_CACHE_TIMEOUT)
+    except Exception as e:
+        logger.error(f"Error getting payment status for {payment_intent_id}: {e}")
+    finally:
+        with _lock:
+            del _flights[key]
+        flight.done.set()
+    return flight.result
+
+
+def write_through(result, as_of, provider='stripe'):
+    """Cache a status result current as of `as_of` (epoch seconds), unless it is stale or a newer one is cached"""
+    if time.time() - as_of > settings.PAYMENT_STATUS_CACHE_TIMEOUT:
+        return
+    key = payment_status_key(provider, result['payment_intent_id'])
+    entry = cache.get(key)
+    # Event times are whole seconds, so only a lookup started a second later is surely newer
+    if entry is not None and entry['as_of'] >= as_of + 1:
+        return
+    cache.set(key, {'result': result, 'as_of': as_of}, settings.PAYMENT_STATUS_CACHE_TIMEOUT)
@@ -0,0 +1,123 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
+from rest_framework import status
+from decimal import Decimal
+from datetime import date, timedelta
+from .. import autocomplete
+from ..models import Invoice
+
+User = get_user_model()
+
+
+class CustomerIndexTest(TestCase):
+    def setUp(self):
+        """Set up an index over a few customers"""
+        self.index = autocomplete.CustomerIndex([
+            {'id': 1, 'email': 'john.doe@test.com', 'first_name': 'John', 'last_name': 'Doe'},
+            {'id': 2, 'email': 'jane@example.org', 'first_name': 'Jane', 'last_name': 'Smith'},
+            {'id': 3, 'email': 'dora@test.com', 'first_name': 'Dora', 'last_name': 'Jones'},
+        ])
+
+    def ids(self, prefix, limit=10):
+        return [customer['id'] for customer in self.index.search(prefix, limit)]
+
+    def test_prefix_matches_email_and_names(self):
+        """Test matching on email, full name and last name"""
+        self.assertEqual(self.ids('jane@'), [2])
+        self.assertEqual(self.ids('JOHN D'), [1])
+        self.assertEqual(self.ids('smi'), [2])
+        self.assertEqual(self.ids('do'), [1, 3])
+        self.assertEqual(self.ids('x'), [])
+
+    def test_each_customer_listed_once(self):
+        """Test that a customer matching several keys appears once"""
+        self.assertEqual(self.ids('j'), [2, 1, 3])
+
+    def test_limit(self):
+        """Test that only the top N matches are returned"""
+        self.assertEqual(len(self.ids('j', limit=2)), 2)
+
+    def test_add(self):
+        """Test adding a customer keeps the index sorted"""
+        self.index.add({'id': 4, 'email': 'dan@test.com', 'first_name': 'Dan', 'last_name': 'Brown'})
+        self.assertEqual(self.ids('d'), [4, 1, 3])
+
+
+class CustomerAutocompleteViewTest(APITestCase):
+    def setUp(self):
+        """Set up an owner with past customers"""
+        autocomplete.clear()
+        self.owner = User.objects.create_user(
+            email='owner@test.com',
+            password='testpass123',
+            first_name='Business',
+            last_name='Owner',
+            role='business_owner'
+        )
+        self.customer = User.objects.create_user(
+            email='customer@test.com',
+            password='testpass123',
+            first_name='John',
+            last_name='Doe',
+            role='customer'
+        )
+        self.other_customer = User.objects.create_user(
+            email='cora@test.com',
+            password='testpass123',
+            first_name='Cora',
+            last_name='Lee',
+            role='customer'
+        )
+        self.create_invoice(self.customer)
+        self.client.force_authenticate(user=self.owner)
+
+    def create_invoice(self, customer, owner=None):
+        return Invoice.objects.create(
+            owner=owner or self.owner,
+            customer=customer,
+            total_amount=Decimal('100.00'),
+            due_date=date.today() + timedelta(days=30)
+        )
+
+    def autocomplete(self, query, **params):
+        return self.client.get('/api/invoices/customers/', {'q': query, **params})
+
+    def test_returns_past_customers_only(self):
+        """Test that only customers the owner has invoiced are suggested"""
+        response = self.autocomplete('c')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([customer['email'] for customer in response.data], ['customer@test.com'])
+
+    def test_index_updated_on_invoice_creation(self):
+        """Test that a new invoice's customer is suggested without a rebuild"""
+        self.autocomplete('c')
+        self.create_invoice(self.other_customer)
+        with self.assertNumQueries(0):
+            response = self.autocomplete('co')
+        self.assertEqual([customer['email'] for customer in response.data], ['cora@test.com'])
+
+    def test_scoped_to_owner(self):
+        """Test that other owners' customers are not suggested"""
+        other_owner = User.objects.create_user(
+            email='other@test.com',
+            password='testpass123',
+            first_name='Other',
+            last_name='Owner',
+            role='business_owner'
+        )
+        self.create_invoice(self.other_customer, owner=other_owner)
+        self.assertEqual(self.autocomplete('cora').data, [])
+
+    def test_customer_rename(self):
+        """Test that renamed customers are found under their new name"""
+        self.autocomplete('doe')
+        self.customer.last_name = 'Smith'
+        self.customer.save()
+        self.assertEqual(self.autocomplete('doe').data, [])
+        self.assertEqual(len(self.autocomplete('smith').data), 1)
+
+    def test_invalid_limit(self):
+        """Test that a non-numeric limit is rejected"""
+        response = self.autocomplete('c', limit='ten')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
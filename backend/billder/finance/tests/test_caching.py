@@ -0,0 +1,74 @@
+import importlib
+import os
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from billder.caching import cache_config, is_process_local
+from billder.checks import check_shared_cache
+from billder.db_routers import ReplicaRouter, replica_reads
+
+LOCMEM = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+DATABASE_CACHE = {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'billder_cache'}
+
+
+class CacheConfigTest(SimpleTestCase):
+    """CACHES entries built from CACHE_URL"""
+
+    def config(self, url=None, **environ):
+        with mock.patch.dict(os.environ, environ, clear=True):
+            return cache_config(url)
+
+    def test_backends(self):
+        """Test that each URL scheme picks its backend and location"""
+        self.assertEqual(self.config(), {'BACKEND': LOCMEM['BACKEND'], 'LOCATION': ''})
+        self.assertEqual(self.config('db://billder_cache'), DATABASE_CACHE)
+        self.assertEqual(self.config(CACHE_URL='redis://cache.internal:6379/0'), {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': 'redis://cache.internal:6379/0',
+        })
+        self.assertEqual(self.config('memcached://one:11211,two:11211')['LOCATION'], ['one:11211', 'two:11211'])
+        self.assertEqual(self.config('file:///var/tmp/billder-cache')['LOCATION'], '/var/tmp/billder-cache')
+        self.assertEqual(self.config('db://billder_cache', CACHE_KEY_PREFIX='blue')['KEY_PREFIX'], 'blue')
+
+    def test_unsupported_scheme(self):
+        """Test that an unknown scheme fails loudly rather than falling back to a local cache"""
+        with self.assertRaises(ValueError):
+            self.config('mongodb://cache.internal')
+
+    def production_settings(self, **environ):
+        # Reloaded: a plain import would return the module as first imported,
+        # whatever the environment is now
+        with mock.patch.dict(os.environ, environ, clear=True):
+            return importlib.reload(importlib.import_module('billder.settings_production'))
+
+    def test_production_cache_must_be_configured(self):
+        """Test that production takes CACHE_URL or REDIS_URL, and fails the checks without either"""
+        production = self.production_settings(CACHE_URL='memcached://cache.internal:11211')
+        self.assertEqual(production.CACHES['default']['LOCATION'], ['cache.internal:11211'])
+        production = self.production_settings(REDIS_URL='redis://redis.internal:6379/0')
+        self.assertEqual(production.CACHES['default']['LOCATION'], 'redis://redis.internal:6379/0')
+
+        production = self.production_settings()
+        self.assertTrue(is_process_local(production.CACHES['default']))
+        self.assertTrue(production.CACHE_REQUIRE_SHARED)
+        with override_settings(CACHES=production.CACHES, CACHE_REQUIRE_SHARED=production.CACHE_REQUIRE_SHARED):
+            self.assertEqual([error.id for error in check_shared_cache(None)], ['billder.E005'])
+
+    def test_process_local_cache_fails_check(self):
+        """Test that a per-process cache is an error only where a shared one is required"""
+        with override_settings(CACHES={'default': LOCMEM}, CACHE_REQUIRE_SHARED=True):
+            self.assertEqual([error.id for error in check_shared_cache(None)], ['billder.E005'])
+        with override_settings(CACHES={'default': DATABASE_CACHE}, CACHE_REQUIRE_SHARED=True):
+            self.assertEqual(check_shared_cache(None), [])
+        with override_settings(CACHES={'default': LOCMEM}, CACHE_REQUIRE_SHARED=False):
+            self.assertEqual(check_shared_cache(None), [])
+
+    def test_database_cache_reads_primary(self):
+        """Test that database cache reads skip the replica, which may not have an invalidation yet"""
+        from django.core.cache.backends.db import DatabaseCache
+
+        cache_model = DatabaseCache('billder_cache', {}).cache_model_class
+        with mock.patch('billder.db_routers.replica_configured', return_value=True):
+            with replica_reads():
+                self.assertEqual(ReplicaRouter().db_for_read(cache_model), 'default')
@@ -0,0 +1,151 @@
+import gzip
+import zlib
+import brotli
+import zstandard
+from django.test import TestCase, RequestFactory, override_settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+from rest_framework.test import APITestCase
+from rest_framework import status
+from decimal import Decimal
+from datetime import date, timedelta
+from billder.compression import CompressionMiddleware, negotiate
+from ..cache import get_public_invoice
+from ..models import Invoice, Payment
+
+User = get_user_model()
+
+
+class NegotiationTest(TestCase):
+    def test_prefers_server_order_on_ties(self):
+        """Test that brotli wins when the client accepts everything equally"""
+        self.assertEqual(negotiate('gzip, deflate, br, zstd').name, 'br')
+
+    def test_honours_quality_values(self):
+        """Test that client q-values take precedence over server order"""
+        self.assertEqual(negotiate('br;q=0.5, gzip;q=1.0').name, 'gzip')
+        self.assertEqual(negotiate('*;q=0.1, zstd').name, 'zstd')
+
+    def test_identity(self):
+        """Test that no compression is chosen for missing or refused codings"""
+        self.assertIsNone(negotiate(''))
+        self.assertIsNone(negotiate('identity'))
+        self.assertIsNone(negotiate('gzip;q=0, br;q=0, zstd;q=0'))
+
+    @override_settings(COMPRESSION_ENCODINGS=['gzip'])
+    def test_disabled_encodings(self):
+        """Test that only configured encodings are negotiated"""
+        self.assertEqual(negotiate('br, gzip').name, 'gzip')
+        self.assertIsNone(negotiate('br'))
+
+
+class CompressionMiddlewareTest(TestCase):
+    def setUp(self):
+        """Set up a request factory and a compressible payload"""
+        self.factory = RequestFactory()
+        self.payload = b'{"reference": "INV-0001", "status": "pending"}' * 100
+
+    def process(self, response, accept_encoding):
+        request = self.factory.get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_compresses_large_responses(self):
+        """Test that each coding round-trips to the original payload"""
+        decompress = {
+            'gzip': gzip.decompress,
+            'br': brotli.decompress,
+            'zstd': zstandard.ZstdDecompressor().decompress,
+        }
+        for encoding, decode in decompress.items():
+            response = self.process(HttpResponse(self.payload), encoding)
+            self.assertEqual(response['Content-Encoding'], encoding)
+            self.assertEqual(response['Vary'], 'Accept-Encoding')
+            self.assertEqual(int(response['Content-Length']), len(response.content))
+            self.assertEqual(decode(response.content), self.payload)
+
+    def test_skips_small_responses(self):
+        """Test that responses under the threshold are sent as they are"""
+        response = self.process(HttpResponse(b'{"ok": true}'), 'gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, b'{"ok": true}')
+
+    def test_streaming_response(self):
+        """Test that streamed rows are compressed and flushed per chunk"""
+        rows = [b'id,reference\n'] + [f'{i},INV-{i:04d}\n'.encode() for i in range(500)]
+        response = self.process(StreamingHttpResponse(iter(rows)), 'gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+
+        decompressor = zlib.decompressobj(31)
+        chunks = list(response.streaming_content)
+        # Each chunk decodes on arrival, without waiting for the end of the stream
+        self.assertEqual(decompressor.decompress(chunks[0]), rows[0])
+        self.assertEqual(decompressor.decompress(b''.join(chunks[1:])), b''.join(rows[1:]))
+
+    def test_uses_precompressed_variant(self):
+        """Test that stored compressed bytes are sent without recompressing"""
+        response = HttpResponse(self.payload)
+        response.precompressed = {'gzip': gzip.compress(self.payload, mtime=0)}
+        response = self.process(response, 'gzip')
+        self.assertEqual(response.content, gzip.compress(self.payload, mtime=0))
+
+
+class PublicInvoiceCacheTest(APITestCase):
+    def setUp(self):
+        """Set up an invoice with enough payments to be compressed"""
+        cache.clear()
+        self.owner = User.objects.create_user(
+            email='owner@test.com',
+            password='testpass123',
+            first_name='Business',
+            last_name='Owner',
+            role='business_owner'
+        )
+        self.customer = User.objects.create_user(
+            email='customer@test.com',
+            password='testpass123',
+            first_name='John',
+            last_name='Doe',
+            role='customer'
+        )
+        self.invoice = Invoice.objects.create(
+            owner=self.owner,
+            customer=self.customer,
+            total_amount=Decimal('100.00'),
+            due_date=date.today() + timedelta(days=30)
+        )
+        for _ in range(5):
+            Payment.objects.create(invoice=self.invoice, amount=Decimal('10.00'))
+        self.url = f'/api/public/invoice/{self.invoice.public_slug}/'
+
+    def test_repeat_hits_are_served_from_cache(self):
+        """Test that a cached public invoice costs no queries"""
+        first = self.client.get(self.url, HTTP_ACCEPT_ENCODING='br')
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(first['Content-Encoding'], 'br')
+
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url, HTTP_ACCEPT_ENCODING='br')
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(second.content), brotli.decompress(first.content))
+        self.assertEqual(second.content, get_public_invoice(self.invoice.public_slug)['br'])
+
+    def test_payment_change_invalidates(self):
+        """Test that saving a payment drops the cached invoice payload"""
+        self.client.get(self.url)
+        self.assertIsNotNone(get_public_invoice(self.invoice.public_slug))
+
+        Payment.objects.create(invoice=self.invoice, amount=Decimal('5.00'))
+        self.assertIsNone(get_public_invoice(self.invoice.public_slug))
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.json()['payments']), 6)
+
+    def test_invoice_change_invalidates(self):
+        """Test that saving the invoice drops the cached payload"""
+        self.client.get(self.url)
+        self.invoice.amount_paid = Decimal('50.00')
+        self.invoice.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.json()['invoice']['amount_paid'], '50.00')
@@ -0,0 +1,39 @@
+from django.test import TestCase, RequestFactory, override_settings
+from django.http import HttpResponse
+from billder.csrf_middleware import CsrfExemptMiddleware, get_exempt_matcher
+
+
+def view(request):
+    return HttpResponse()
+
+
+class CsrfExemptMiddlewareTest(TestCase):
+    def setUp(self):
+        """Set up the middleware and a request factory"""
+        self.middleware = CsrfExemptMiddleware(lambda request: HttpResponse())
+        self.factory = RequestFactory()
+
+    def process_post(self, path):
+        return self.middleware.process_view(self.factory.post(path), view, (), {})
+
+    def test_exempt_prefix(self):
+        """Test that POSTs under exempt prefixes skip the CSRF check"""
+        self.assertIsNone(self.process_post('/api/invoices/'))
+
+    def test_other_paths_are_checked(self):
+        """Test that POSTs elsewhere without a token are rejected"""
+        self.assertEqual(self.process_post('/accounts/login/').status_code, 403)
+
+    @override_settings(CSRF_EXEMPT_URLS=[r'^/hooks/v\d+/'])
+    def test_regex_patterns(self):
+        """Test that non-literal patterns are matched as regexes"""
+        self.assertIsNone(self.process_post('/hooks/v2/stripe/'))
+        self.assertEqual(self.process_post('/hooks/latest/').status_code, 403)
+
+    def test_reloads_when_setting_changes(self):
+        """Test that the compiled matcher follows settings changes"""
+        self.assertTrue(get_exempt_matcher()('/api/'))
+        with self.settings(CSRF_EXEMPT_URLS=[]):
+            self.assertFalse(get_exempt_matcher()('/api/'))
+            self.assertEqual(self.process_post('/api/invoices/').status_code, 403)
+        self.assertTrue(get_exempt_matcher()('/api/'))
@@ -0,0 +1,131 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.utils import timezone
+from decimal import Decimal
+from datetime import date, timedelta
+from rest_framework.authtoken.models import Token
+from ..idempotency import provider_key
+from ..models import IdempotencyKey, Invoice, Payment
+from .test_stripe_service import FakeStripeTestCase
+
+User = get_user_model()
+
+
+class IdempotencyKeyTest(FakeStripeTestCase):
+    def setUp(self):
+        """Set up an invoice and a customer token for the payment API"""
+        super().setUp()
+        self.owner = User.objects.create_user(email='owner@test.com', password='testpass123',
+                                              first_name='Business', last_name='Owner', role='business_owner')
+        self.customer = User.objects.create_user(email='customer@test.com', password='testpass123',
+                                                 first_name='John', last_name='Doe', role='customer')
+        self.invoice = Invoice.objects.create(owner=self.owner, customer=self.customer,
+                                              total_amount=Decimal('100.00'),
+                                              due_date=date.today() + timedelta(days=30))
+        self.token = Token.objects.create(user=self.customer)
+
+    def create_payment(self, key, amount='40.00', token=None, invoice=None):
+        return self.client.post('/api/payments/create_payment/',
+                                {'invoice_id': (invoice or self.invoice).pk, 'amount': amount},
+                                HTTP_AUTHORIZATION=f'Token {(token or self.token).key}', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_the_first_response(self):
+        """Test that a retried create_payment returns the stored response without a second payment"""
+        intents = len(self.stripe.intents)
+        first = self.create_payment('order-1')
+        retry = self.create_payment('order-1')
+        self.assertEqual((first.status_code, retry.status_code), (201, 201))
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertNotIn('Idempotent-Replayed', first)
+        self.assertEqual(Payment.objects.count(), 1)
+        self.assertEqual(len(self.stripe.intents), intents + 1)
+        self.assertIn(provider_key(self.customer, 'payment.create_payment', 'order-1'), self.stripe.idempotent)
+
+    def test_key_reused_for_another_request(self):
+        """Test that a key reused with a different body is rejected, and an in-flight key conflicts"""
+        self.assertEqual(self.create_payment('order-1').status_code, 201)
+        response = self.create_payment('order-1', amount='50.00')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(response.json()['code'], 'idempotency_key_reused')
+
+        IdempotencyKey.objects.update(status_code=None, response_body='')
+        response = self.create_payment('order-1')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['code'], 'idempotency_key_in_progress')
+        self.assertEqual(Payment.objects.count(), 1)
+
+    def test_abandoned_claim_is_taken_over(self):
+        """Test that a key left in progress by a killed worker is claimed again after the lock timeout"""
+        # The first attempt's worker died before the payment or the response was saved
+        self.create_payment('order-1')
+        Payment.objects.all().delete()
+        IdempotencyKey.objects.update(status_code=None, response_body='')
+        response = self.create_payment('order-1')
+        self.assertEqual(response.status_code, 409)
+
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(seconds=61))
+        with self.settings(IDEMPOTENCY_LOCK_TIMEOUT=60):
+            response = self.create_payment('order-1')
+            retry = self.create_payment('order-1')
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Payment.objects.count(), 1)
+
+    def test_takeover_after_payment_was_saved(self):
+        """Test that a retry after a worker died between saving the payment and the response keeps one payment"""
+        first = self.create_payment('order-1')
+        IdempotencyKey.objects.update(status_code=None, response_body='',
+                                      created_at=timezone.now() - timedelta(seconds=61))
+        with self.settings(IDEMPOTENCY_LOCK_TIMEOUT=60):
+            retry = self.create_payment('order-1')
+        self.assertEqual(retry.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', retry)
+        self.assertEqual(retry.json()['payment']['id'], first.json()['payment']['id'])
+        self.assertEqual(Payment.objects.count(), 1)
+
+    def test_keys_are_scoped_per_user(self):
+        """Test that two users sending the same key get separate payments"""
+        other = User.objects.create_user(email='other@test.com', password='testpass123', first_name='Jane',
+                                         last_name='Doe', role='customer')
+        invoice = Invoice.objects.create(owner=self.owner, customer=other, total_amount=Decimal('100.00'),
+                                         due_date=date.today() + timedelta(days=30))
+        self.create_payment('order-1')
+        response = self.create_payment('order-1', token=Token.objects.create(user=other), invoice=invoice)
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(Payment.objects.count(), 2)
+
+    def test_provider_failure_releases_the_key(self):
+        """Test that a failed provider call is not stored, so the retry runs again"""
+        self.addCleanup(setattr, self.stripe, 'errors', self.stripe.errors)
+        self.stripe.errors = ['api_error']
+        self.stripe.error_rate = 1
+        response = self.create_payment('order-1')
+        self.assertEqual(response.json()['error_type'], 'stripe_error')
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        self.stripe.error_rate = 0
+        response = self.create_payment('order-1')
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', response)
+
+    def test_expired_keys_run_again_and_are_purged(self):
+        """Test that an expired key no longer replays, and purge_idempotency_keys deletes old keys"""
+        self.create_payment('order-1')
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+        self.stripe.idempotent.clear()  # Stripe forgets keys after 24 hours as well
+        response = self.create_payment('order-1')
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(Payment.objects.count(), 2)
+
+        IdempotencyKey.objects.create(user=self.customer, key='order-2', endpoint='payment.create_payment',
+                                      request_hash='old')
+        IdempotencyKey.objects.filter(key='order-2').update(created_at=timezone.now() - timedelta(days=2))
+        out = StringIO()
+        call_command('purge_idempotency_keys', stdout=out)
+        self.assertIn('Deleted 1 idempotency keys', out.getvalue())
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['order-1'])
@@ -0,0 +1,56 @@
+import uuid
+from unittest import mock
+
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from decimal import Decimal
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from ..ids import uuid7, uuid7_time
+from ..models import Invoice, Payment
+
+User = get_user_model()
+
+
+class UUID7Test(TestCase):
+    def test_version_and_variant(self):
+        """Test that generated ids are RFC 9562 version 7 UUIDs"""
+        value = uuid7()
+        self.assertEqual(value.version, 7)
+        self.assertEqual(value.variant, uuid.RFC_4122)
+
+    def test_embeds_generation_time(self):
+        """Test that the timestamp prefix records when the id was generated"""
+        generated = uuid7_time(uuid7())
+        self.assertLess(abs(datetime.now(dt_timezone.utc) - generated), timedelta(seconds=5))
+        self.assertIsNone(uuid7_time(uuid.uuid4()))
+
+    def test_monotonic_within_a_millisecond(self):
+        """Test that ids keep increasing when the clock doesn't move"""
+        with mock.patch('finance.ids.time.time_ns', return_value=1_700_000_000_000_000_000):
+            values = [uuid7() for _ in range(5000)]
+        self.assertEqual(values, sorted(values))
+        self.assertEqual(len(set(values)), len(values))
+
+    def test_monotonic_when_clock_goes_back(self):
+        """Test that a clock stepping backwards doesn't produce smaller ids"""
+        first = uuid7()
+        with mock.patch('finance.ids.time.time_ns', return_value=0):
+            self.assertGreater(uuid7(), first)
+
+
+class ModelPrimaryKeyTest(TestCase):
+    def test_new_rows_get_uuid7_ids(self):
+        """Test that invoices and payments default to time-ordered ids"""
+        owner = User.objects.create_user(email='owner@test.com', password='testpass123', first_name='Business',
+                                         last_name='Owner', role='business_owner')
+        customer = User.objects.create_user(email='customer@test.com', password='testpass123', first_name='John',
+                                            last_name='Doe', role='customer')
+        invoices = [
+            Invoice.objects.create(owner=owner, customer=customer, total_amount=Decimal('100.00'),
+                                   due_date=date.today())
+            for _ in range(3)
+        ]
+        payment = Payment.objects.create(invoice=invoices[0], amount=Decimal('10.00'))
+        self.assertEqual([invoice.id.version for invoice in invoices], [7, 7, 7])
+        self.assertEqual(payment.id.version, 7)
+        self.assertEqual(list(Invoice.objects.order_by('id')), invoices)
@@ -0,0 +1,60 @@
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from billder.checks import check_middleware_profiles
+
+
+class MiddlewareProfileRouterTest(TestCase):
+    def test_api_requests_use_api_profile(self):
+        """Test that API requests skip the session and message middleware"""
+        response = self.client.get(reverse('health'))
+        self.assertEqual(response.wsgi_request.middleware_profile, 'api')
+        self.assertFalse(hasattr(response.wsgi_request, 'session'))
+        self.assertNotIn('X-Frame-Options', response)
+
+    def test_admin_requests_use_full_profile(self):
+        """Test that the admin still goes through the full middleware stack"""
+        response = self.client.get('/admin/login/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.wsgi_request.middleware_profile, 'full')
+        self.assertTrue(hasattr(response.wsgi_request, 'session'))
+        self.assertEqual(response['X-Frame-Options'], 'DENY')
+
+    def test_view_hooks_are_forwarded(self):
+        """Test that process_view of profile middleware still runs (CSRF on the admin login)"""
+        response = self.client_class(enforce_csrf_checks=True).post('/admin/login/', {})
+        self.assertEqual(response.status_code, 403)
+
+
+class MiddlewareProfileChecksTest(TestCase):
+    def test_settings_pass(self):
+        """Test that the shipped profiles pass the system checks"""
+        self.assertEqual(check_middleware_profiles(None), [])
+
+    @override_settings(MIDDLEWARE_PROFILE_ROUTES=[(r'^/api/', 'missing')])
+    def test_unknown_profile(self):
+        """Test that routes to undefined profiles are reported"""
+        errors = check_middleware_profiles(None)
+        self.assertEqual([error.id for error in errors], ['billder.E001'])
+
+    @override_settings(MIDDLEWARE_PROFILE_ROUTES=[(r'^/admin/', 'api')])
+    def test_admin_profile_needs_sessions(self):
+        """Test that serving the admin from a lean profile is reported"""
+        errors = check_middleware_profiles(None)
+        self.assertEqual(len(errors), 3)
+        self.assertTrue(all(error.id == 'billder.E002' for error in errors))
+
+
+class ProfileMiddlewareCommandTest(TestCase):
+    def test_reports_layers(self):
+        """Test that the profiler times every layer of the profiles it ran"""
+        out = StringIO()
+        call_command('profile_middleware', requests=2, stdout=out)
+        output = out.getvalue()
+        self.assertIn("Profile 'api'", output)
+        self.assertIn("Profile 'full'", output)
+        for path in settings.MIDDLEWARE_PROFILES['full']:
+            self.assertIn(path, output)
@@ -74,7 +74,7 @@ class InvoiceModelTest(TestCase):
         )
         
         self.assertTrue(invoice.public_slug.startswith('invoice-'))
-        self.assertEqual(len(invoice.public_slug), 16)  # 'invoice-' + 8 chars
+        self.assertEqual(len(invoice.public_slug), 41)  # 'invoice-' + 16 chars + '-' + 16 char signature
 
     def test_invoice_str_representation(self):
         """Test string representation of invoice"""
@@ -0,0 +1,92 @@
+import pickle
+
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from decimal import Decimal
+from datetime import date, timedelta
+from rest_framework.authtoken.models import Token
+from ..models import Invoice, Payment
+from ..money import Money, format_minor, to_minor
+from ..serializers import InvoiceDetailSerializer
+
+User = get_user_model()
+
+
+class MoneyTest(TestCase):
+    def test_exact_conversion(self):
+        """Test that major units convert to minor units exactly, per currency"""
+        self.assertEqual(to_minor(Decimal('12.34'), 'CAD'), 1234)
+        self.assertEqual(to_minor('1500', 'JPY'), 1500)
+        self.assertEqual(to_minor(Decimal('1.234'), 'KWD'), 1234)
+        with self.assertRaises(ValueError):
+            to_minor(Decimal('12.345'), 'CAD')
+        with self.assertRaises(TypeError):
+            to_minor(12.34, 'CAD')
+
+    def test_format(self):
+        """Test formatting minor units as major-unit strings"""
+        self.assertEqual(format_minor(1234), '12.34')
+        self.assertEqual(format_minor(5), '0.05')
+        self.assertEqual(format_minor(-1205), '-12.05')
+        self.assertEqual(format_minor(1500, 0), '1500')
+        self.assertEqual(str(Money(1234, 'KWD')), '1.234')
+
+    def test_arithmetic_and_comparisons(self):
+        """Test that Money works with Money, Decimal major units and int minor units"""
+        total = Money(10000, 'CAD')
+        self.assertEqual(total - Decimal('25.50'), Money(7450, 'CAD'))
+        self.assertEqual(total + Money(1, 'CAD'), Decimal('100.01'))
+        self.assertEqual(Decimal('0.00') + total, total)
+        self.assertEqual(sum([total, total]), Decimal('200.00'))
+        self.assertTrue(total > Decimal('99.99'))
+        self.assertTrue(total >= 10000)
+        self.assertTrue(Decimal('100.001') > total)
+        self.assertEqual(hash(total), hash(Decimal('100.00')))
+        self.assertEqual(f'{total:.2f}', '100.00')
+        with self.assertRaises(ValueError):
+            total + Money(100, 'USD')
+
+    def test_immutable(self):
+        """Test that Money can't be changed in place"""
+        amount = Money(1234, 'CAD')
+        with self.assertRaises(AttributeError):
+            amount.minor = 1
+        self.assertEqual(pickle.loads(pickle.dumps(amount)), amount)
+
+
+class MoneyFieldTest(TestCase):
+    def setUp(self):
+        """Set up invoice participants"""
+        self.owner = User.objects.create_user(email='owner@test.com', password='testpass123', first_name='Business',
+                                              last_name='Owner', role='business_owner')
+        self.customer = User.objects.create_user(email='customer@test.com', password='testpass123',
+                                                 first_name='John', last_name='Doe', role='customer')
+
+    def create_invoice(self, total_amount, currency='CAD'):
+        return Invoice.objects.create(owner=self.owner, customer=self.customer, total_amount=total_amount,
+                                      currency=currency, due_date=date.today() + timedelta(days=30))
+
+    def test_stored_as_minor_units(self):
+        """Test that amounts are stored as integers and read back as Money"""
+        invoice = self.create_invoice(Decimal('1500'), currency='JPY')
+        Payment.objects.create(invoice=invoice, amount=Decimal('250'), currency='JPY')
+        self.assertEqual(Invoice.objects.values_list('total_amount', flat=True).get(pk=invoice.pk), 1500)
+
+        invoice.refresh_from_db()
+        self.assertEqual(invoice.total_amount, Money(1500, 'JPY'))
+        self.assertEqual(invoice.payments.get().amount_cents, 250)
+        self.assertEqual(InvoiceDetailSerializer(invoice).data['total_amount'], '1500')
+
+    def test_lookups_and_aggregates(self):
+        """Test that filters and sums run on the integer column"""
+        invoice = self.create_invoice(Decimal('100.00'))
+        invoice.amount_paid += Decimal('25.50')
+        invoice.save()
+        self.create_invoice(Decimal('50.00'))
+
+        self.assertEqual(Invoice.objects.filter(total_amount__gt=Decimal('75')).get(), invoice)
+        self.assertEqual(Invoice.objects.with_balance().get(pk=invoice.pk).remaining_balance, 7450)
+
+        token = Token.objects.create(user=self.owner)
+        response = self.client.get('/api/invoices/total_amount/', HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(response.data, {'total_amount': Decimal('150.00'), 'total_paid': Decimal('25.50')})
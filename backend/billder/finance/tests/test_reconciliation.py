@@ -0,0 +1,100 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from decimal import Decimal
+from datetime import date, timedelta
+from benchmarks.fake_stripe import sign_payload
+from ..models import Invoice, Payment
+from ..reconciliation import OPEN_INDEX, OPEN_STATUSES, reconcile_payments, stale_payments
+from .test_stripe_service import WEBHOOK_SECRET, FakeStripeTestCase
+
+User = get_user_model()
+
+
+class ReconciliationTest(FakeStripeTestCase):
+    def setUp(self):
+        """Set up pending payments whose intents succeeded, failed, were canceled or are still open"""
+        super().setUp()
+        self.stripe.events.clear()
+        owner = User.objects.create_user(email='owner@test.com', password='testpass123', first_name='Business',
+                                         last_name='Owner', role='business_owner')
+        customer = User.objects.create_user(email='customer@test.com', password='testpass123', first_name='John',
+                                            last_name='Doe', role='customer')
+        self.invoice = Invoice.objects.create(owner=owner, customer=customer, total_amount=Decimal('100.00'),
+                                              due_date=date.today() + timedelta(days=30))
+        self.payments = {}
+        for outcome in ('succeeded', 'failed', 'canceled', 'open'):
+            created = self.service.create_payment_intent(Decimal('25.00'), 'CAD', {})
+            self.payments[outcome] = Payment.objects.create(invoice=self.invoice, amount=Decimal('25.00'),
+                                                            external_payment_id=created['payment_intent_id'])
+        self.service.confirm_payment(self.payments['succeeded'].external_payment_id, 'pm_card_visa')
+        self.service.confirm_payment(self.payments['failed'].external_payment_id, 'pm_card_chargeDeclined')
+        self.service.cancel_payment(self.payments['canceled'].external_payment_id)
+
+    def reconcile(self, **kwargs):
+        return reconcile_payments(stale_after=timedelta(0), workers=2, batch_size=3, backoff=0.001, **kwargs)
+
+    def test_applies_provider_statuses(self):
+        """Test that stale payments take their intent's status and succeeded ones credit the invoice"""
+        stats = self.reconcile()
+        self.assertEqual((stats.stale, stats.checked, stats.changed, stats.unchanged, stats.errors), (4, 4, 3, 1, 0))
+        self.assertEqual(stats.backlog, 0)
+
+        statuses = {outcome: Payment.objects.get(pk=payment.pk).status for outcome, payment in self.payments.items()}
+        self.assertEqual(statuses, {'succeeded': 'succeeded', 'failed': 'failed', 'canceled': 'canceled',
+                                    'open': 'pending'})
+        succeeded = Payment.objects.get(pk=self.payments['succeeded'].pk)
+        self.assertEqual(succeeded.external_charge_id, self.stripe.intents[succeeded.external_payment_id]['latest_charge'])
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.amount_paid, Decimal('25.00'))
+
+        # The open payment was pushed to the back of the queue
+        self.assertFalse(stale_payments(timezone.now() - timedelta(minutes=1)).exists())
+
+    def test_late_webhook_does_not_credit_again(self):
+        """Test that a webhook arriving after reconciliation leaves the invoice balance alone"""
+        self.reconcile()
+        payload = json.dumps(self.stripe.events[0]).encode()
+        response = self.client.post('/api/finance/webhooks/stripe/', payload, content_type='application/json',
+                                    HTTP_STRIPE_SIGNATURE=sign_payload(payload, WEBHOOK_SECRET))
+        self.assertEqual(response.status_code, 200)
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.amount_paid, Decimal('25.00'))
+
+    def test_rate_limits_are_retried(self):
+        """Test that rate limited fetches back off and retry, and exhausted ones leave payments open"""
+        self.addCleanup(setattr, self.stripe, 'errors', self.stripe.errors)
+        self.stripe.errors = ['rate_limit']
+        self.stripe.error_rate = 0.5
+        stats = self.reconcile(max_retries=30)
+        self.assertGreater(stats.rate_limited, 0)
+        self.assertEqual((stats.changed, stats.errors), (3, 0))
+
+        Payment.objects.filter(pk=self.payments['open'].pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        self.stripe.error_rate = 1
+        stats = self.reconcile(max_retries=2)
+        self.assertEqual((stats.checked, stats.errors, stats.rate_limited), (1, 1, 3))
+
+    def test_stale_query_uses_partial_index(self):
+        """Test that stale payments are selected through the partial index on open payments"""
+        self.assertIn('payment_open_updated_idx', stale_payments(timezone.now()).explain())
+
+    def test_open_condition_matches_index_and_survives_joins(self):
+        """Test that the open condition is the index's, and stays on payments when invoices are joined"""
+        self.assertEqual(dict(OPEN_INDEX.condition.children)['status__in'], OPEN_STATUSES)
+        Invoice.objects.filter(pk=self.payments['open'].invoice_id).update(status=Invoice.Status.PAID)
+
+        joined = stale_payments(timezone.now()).filter(invoice__status=Invoice.Status.PAID)
+        self.assertIn('"finance_payment"."status" IN', str(joined.query))
+        self.assertIn(self.payments['open'], joined)
+
+    def test_command_reports_metrics(self):
+        """Test the reconcile_payments command's throughput and lag report"""
+        out = StringIO()
+        call_command('reconcile_payments', '--stale-minutes', '0', stdout=out)
+        self.assertIn('Checked:      4 of 4 stale', out.getvalue())
+        self.assertIn('Changed:      3 (1 canceled, 1 failed, 1 succeeded)', out.getvalue())
+        self.assertIn('0 still stale', out.getvalue())
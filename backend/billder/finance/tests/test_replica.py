@@ -0,0 +1,164 @@
+import os
+import shutil
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from billder.db_routers import PIN_COOKIE, PIN_HEADER, REPLICA_ALIAS
+from ..models import Invoice
+from ..public_links import make_public_slug
+
+User = get_user_model()
+
+
+class ReplicaRoutingTest(APITestCase):
+    """Reads from marked views hit a separate SQLite file acting as replica"""
+
+    @classmethod
+    def setUpClass(cls):
+        # The alias only exists for this class, so it can't be declared up
+        # front where the runner's system checks would look for it
+        cls.databases = {'default', REPLICA_ALIAS}
+        cls.replica_dir = tempfile.mkdtemp()
+        connections.settings[REPLICA_ALIAS] = dict(
+            connections.settings['default'],
+            NAME=os.path.join(cls.replica_dir, 'replica.sqlite3'),
+            TEST={'NAME': None, 'MIRROR': None},
+        )
+        call_command('migrate', database=REPLICA_ALIAS, verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA_ALIAS].close()
+        del connections[REPLICA_ALIAS]
+        del connections.settings[REPLICA_ALIAS]
+        shutil.rmtree(cls.replica_dir)
+
+    def setUp(self):
+        """Set up diverging primary and replica data"""
+        cache.clear()
+        self.owner = User.objects.create_user(
+            email='owner@test.com',
+            password='testpass123',
+            first_name='Business',
+            last_name='Owner',
+            role='business_owner'
+        )
+        self.customer = User.objects.create_user(
+            email='customer@test.com',
+            password='testpass123',
+            first_name='John',
+            last_name='Doe',
+            role='customer'
+        )
+        self.primary_invoice = Invoice.objects.create(
+            owner=self.owner,
+            customer=self.customer,
+            total_amount=Decimal('100.00'),
+            due_date=date.today() + timedelta(days=30)
+        )
+
+        # The replica has the same users but a different invoice
+        for user in (self.owner, self.customer):
+            user.save(using=REPLICA_ALIAS)
+        self.replica_invoice = Invoice(
+            reference='INV-REPLICA',
+            public_slug=make_public_slug(),
+            owner=self.owner,
+            customer=self.customer,
+            total_amount=Decimal('42.00'),
+            due_date=date.today() + timedelta(days=30)
+        )
+        self.replica_invoice.save(using=REPLICA_ALIAS)
+
+        # Tokens only exist on the primary: authentication must not use the replica
+        token = Token.objects.create(user=self.owner)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def test_list_reads_from_replica(self):
+        """Test that the invoice list is served from the replica"""
+        response = self.client.get('/api/invoices/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([invoice['id'] for invoice in response.data], [str(self.replica_invoice.id)])
+
+    def test_stats_read_from_replica(self):
+        """Test that total_amount aggregates replica data"""
+        response = self.client.get('/api/invoices/total_amount/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_amount'], Decimal('42.00'))
+
+    def test_public_invoice_reads_from_replica(self):
+        """Test that public invoices are looked up on the replica"""
+        self.client.credentials()
+        response = self.client.get(f'/api/public/invoice/{self.replica_invoice.public_slug}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_reads_from_primary(self):
+        """Test that unmarked views keep reading from the primary"""
+        response = self.client.get(f'/api/invoices/{self.primary_invoice.id}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_write_pins_user_to_primary(self):
+        """Test that a user's reads go to the primary right after they write"""
+        response = self.client.post('/api/invoices/', {
+            'customer_email': self.customer.email,
+            'total_amount': '150.00',
+            'currency': 'CAD',
+            'due_date': (date.today() + timedelta(days=30)).isoformat()
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.get('/api/invoices/')
+        self.assertEqual(len(response.data), 2)
+        self.assertNotIn(str(self.replica_invoice.id), [invoice['id'] for invoice in response.data])
+
+    def create_invoice(self):
+        return self.client.post('/api/invoices/', {
+            'customer_email': self.customer.email,
+            'total_amount': '150.00',
+            'currency': 'CAD',
+            'due_date': (date.today() + timedelta(days=30)).isoformat()
+        })
+
+    def test_pin_cookie_pins_without_writers_cache(self):
+        """Test that the signed pin cookie routes the next read to the primary on a worker with its own cache"""
+        response = self.create_invoice()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        # The frontend is cross-site: a Lax cookie would never come back from its fetches
+        self.assertEqual(response.cookies[PIN_COOKIE]['samesite'], 'None')
+        self.assertTrue(response.cookies[PIN_COOKIE]['secure'])
+
+        # The read is handled by a worker that never saw the writer's cache
+        cache.clear()
+        response = self.client.get('/api/invoices/')
+        self.assertEqual(len(response.data), 2)
+        self.assertNotIn(str(self.replica_invoice.id), [invoice['id'] for invoice in response.data])
+
+        # Without the cookie, the same read goes to the replica
+        del self.client.cookies[PIN_COOKIE]
+        response = self.client.get('/api/invoices/')
+        self.assertEqual([invoice['id'] for invoice in response.data], [str(self.replica_invoice.id)])
+
+    def test_pin_header_pins_without_cookie(self):
+        """Test that a client echoing the X-Primary-Pin response header reads from the primary"""
+        response = self.create_invoice()
+        pin = response[PIN_HEADER]
+        del self.client.cookies[PIN_COOKIE]
+        cache.clear()
+
+        response = self.client.get('/api/invoices/', headers={PIN_HEADER: pin})
+        self.assertEqual(len(response.data), 2)
+
+        # A tampered pin is ignored
+        response = self.client.get('/api/invoices/', headers={PIN_HEADER: pin + 'x'})
+        self.assertEqual([invoice['id'] for invoice in response.data], [str(self.replica_invoice.id)])
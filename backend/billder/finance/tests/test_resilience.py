@@ -0,0 +1,102 @@
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from decimal import Decimal
+from datetime import date, timedelta
+from rest_framework.authtoken.models import Token
+from ..models import Invoice
+from ..services.resilience import get_guard
+from .test_stripe_service import FakeStripeTestCase
+
+User = get_user_model()
+
+
+class ProviderChaosTest(FakeStripeTestCase):
+    def setUp(self):
+        """Set up tight breaker settings and restore the fake's latency afterwards"""
+        settings = self.settings(STRIPE_TIMEOUT=0.2, PAYMENT_PROVIDER_FAILURE_THRESHOLD=3,
+                                 PAYMENT_PROVIDER_RESET_TIMEOUT=0.5, PAYMENT_PROVIDER_SLOW_CALL=1,
+                                 PAYMENT_PROVIDER_MAX_CONCURRENCY=2, PAYMENT_PROVIDER_QUEUE_TIMEOUT=0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        super().setUp()
+        self.addCleanup(setattr, self.stripe, 'latency_ms', self.stripe.latency_ms)
+
+    def requests_served(self):
+        # Reading the Request-Id counter takes a number too
+        return next(self.stripe.requests)
+
+    def test_breaker_opens_on_slow_provider_and_recovers(self):
+        """Test that timeouts open the circuit, calls then fail fast, and a trial call closes it"""
+        self.stripe.latency_ms = 400
+        for _ in range(3):
+            result = self.service.create_payment_intent(Decimal('10.00'), 'CAD', {})
+            self.assertEqual(result['error_type'], 'stripe_error')
+        self.assertEqual(get_guard('stripe').metrics()['state'], 'open')
+
+        served = self.requests_served()
+        started = time.monotonic()
+        result = self.service.create_payment_intent(Decimal('10.00'), 'CAD', {})
+        self.assertEqual(result['error_type'], 'provider_unavailable')
+        self.assertLess(time.monotonic() - started, 0.1)
+        self.assertEqual(self.requests_served(), served + 1)
+
+        self.stripe.latency_ms = 0
+        time.sleep(0.5)
+        self.assertTrue(self.service.create_payment_intent(Decimal('10.00'), 'CAD', {})['success'])
+        metrics = get_guard('stripe').metrics()
+        self.assertEqual((metrics['state'], metrics['times_opened'], metrics['short_circuited']), ('closed', 1, 1))
+
+    def test_declines_do_not_open_the_circuit(self):
+        """Test that card errors count as a healthy provider"""
+        for _ in range(4):
+            created = self.service.create_payment_intent(Decimal('10.00'), 'CAD', {})
+            result = self.service.confirm_payment(created['payment_intent_id'], 'pm_card_chargeDeclined')
+            self.assertEqual(result['error_type'], 'card_error')
+        self.assertEqual(get_guard('stripe').metrics()['state'], 'closed')
+
+    def test_bulkhead_caps_in_flight_calls(self):
+        """Test that calls beyond the concurrency limit are rejected instead of queueing"""
+        self.stripe.latency_ms = 150
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(
+                self.service.create_payment_intent(Decimal('10.00'), 'CAD', {})))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        outcomes = sorted('ok' if result['success'] else result['error_type'] for result in results)
+        self.assertEqual(outcomes, ['ok', 'ok', 'provider_unavailable', 'provider_unavailable',
+                                    'provider_unavailable'])
+        metrics = get_guard('stripe').metrics()
+        self.assertEqual((metrics['in_flight'], metrics['rejected'], metrics['state']), (0, 3, 'closed'))
+
+    def test_api_reports_open_circuit(self):
+        """Test that the payment API answers 503 while the circuit is open, and metrics show it"""
+        owner = User.objects.create_user(email='owner@test.com', password='testpass123', first_name='Business',
+                                         last_name='Owner', role='business_owner')
+        customer = User.objects.create_user(email='customer@test.com', password='testpass123', first_name='John',
+                                            last_name='Doe', role='customer')
+        invoice = Invoice.objects.create(owner=owner, customer=customer, total_amount=Decimal('100.00'),
+                                         due_date=date.today() + timedelta(days=30))
+        self.addCleanup(setattr, self.stripe, 'errors', self.stripe.errors)
+        self.stripe.errors = ['api_error']
+        self.stripe.error_rate = 1
+        token = Token.objects.create(user=customer)
+        statuses = [
+            self.client.post('/api/payments/create_payment/', {'invoice_id': invoice.pk, 'amount': '10.00'},
+                             HTTP_AUTHORIZATION=f'Token {token.key}').status_code
+            for _ in range(4)
+        ]
+        self.assertEqual(statuses, [400, 400, 400, 503])
+
+        response = self.client.get('/api/finance/metrics/', HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(response.status_code, 403)
+        admin = User.objects.create_superuser(email='admin@test.com', password='testpass123')
+        response = self.client.get('/api/finance/metrics/',
+                                   HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=admin).key}')
+        self.assertEqual(response.data['payment_providers']['stripe']['state'], 'open')
@@ -0,0 +1,140 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+from rest_framework import status
+from decimal import Decimal
+from datetime import date, timedelta
+from ..models import Invoice, Payment, InvoiceSearchDocument
+from ..search import get_search_backend, rebuild_documents
+
+User = get_user_model()
+
+
+class SearchTestMixin:
+    def setUp(self):
+        """Set up invoices for two customers and a payment"""
+        self.owner = User.objects.create_user(
+            email='owner@test.com',
+            password='testpass123',
+            first_name='Business',
+            last_name='Owner',
+            role='business_owner'
+        )
+        self.john = User.objects.create_user(
+            email='customer@test.com',
+            password='testpass123',
+            first_name='John',
+            last_name='Doe',
+            role='customer'
+        )
+        self.jane = User.objects.create_user(
+            email='jane@example.org',
+            password='testpass123',
+            first_name='Jane',
+            last_name='Smith',
+            role='customer'
+        )
+        self.john_invoice = Invoice.objects.create(
+            owner=self.owner,
+            customer=self.john,
+            reference='INV-ALPHA-1',
+            total_amount=Decimal('100.00'),
+            due_date=date.today() + timedelta(days=30)
+        )
+        self.jane_invoice = Invoice.objects.create(
+            owner=self.owner,
+            customer=self.jane,
+            reference='INV-BETA-2',
+            total_amount=Decimal('200.00'),
+            due_date=date.today() + timedelta(days=30)
+        )
+        self.payment = Payment.objects.create(
+            invoice=self.john_invoice,
+            amount=Decimal('42.50'),
+            description='Deposit for kitchen renovation'
+        )
+
+    def search(self, model, *terms):
+        return set(get_search_backend().filter(model.objects.all(), list(terms)))
+
+
+class SearchBackendTest(SearchTestMixin, TestCase):
+    def test_search_by_reference_name_and_email(self):
+        """Test that every indexed field is searchable, case-insensitively"""
+        self.assertEqual(self.search(Invoice, 'alpha'), {self.john_invoice})
+        self.assertEqual(self.search(Invoice, 'smith'), {self.jane_invoice})
+        self.assertEqual(self.search(Invoice, 'example.org'), {self.jane_invoice})
+        self.assertEqual(self.search(Invoice, 'inv-'), {self.john_invoice, self.jane_invoice})
+
+    def test_all_terms_must_match(self):
+        """Test that multiple terms are ANDed like SearchFilter"""
+        self.assertEqual(self.search(Invoice, 'inv', 'john'), {self.john_invoice})
+        self.assertEqual(self.search(Invoice, 'john', 'smith'), set())
+
+    def test_short_terms(self):
+        """Test that terms shorter than a trigram still match"""
+        self.assertEqual(self.search(Invoice, 'ja'), {self.jane_invoice})
+        self.assertEqual(self.search(Invoice, '2'), {self.jane_invoice})
+
+    def test_uses_full_text_index(self):
+        """Test that trigram-length terms are matched through the FTS5 table"""
+        with CaptureQueriesContext(connection) as queries:
+            list(get_search_backend().filter(Invoice.objects.all(), ['smith']))
+        self.assertIn('MATCH', queries[0]['sql'])
+        self.assertNotIn('users_user', queries[0]['sql'])
+
+    def test_payment_search(self):
+        """Test that payments are searchable by amount, description and invoice reference"""
+        self.assertEqual(self.search(Payment, '42.5'), {self.payment})
+        self.assertEqual(self.search(Payment, 'kitchen'), {self.payment})
+        self.assertEqual(self.search(Payment, 'alpha'), {self.payment})
+
+    def test_customer_rename_updates_invoices(self):
+        """Test that renaming a customer refreshes their invoice documents"""
+        self.john.last_name = 'Johnson'
+        self.john.save()
+        self.assertEqual(self.search(Invoice, 'johnson'), {self.john_invoice})
+        self.assertEqual(self.search(Invoice, 'doe'), set())
+
+    def test_reference_change_updates_payments(self):
+        """Test that payment documents follow their invoice's reference"""
+        self.john_invoice.reference = 'INV-GAMMA-3'
+        self.john_invoice.save()
+        self.assertEqual(self.search(Payment, 'gamma'), {self.payment})
+        self.assertEqual(self.search(Payment, 'alpha'), set())
+
+    def test_delete_removes_document(self):
+        """Test that deleted invoices drop out of the index"""
+        self.jane_invoice.delete()
+        self.assertEqual(self.search(Invoice, 'smith'), set())
+
+    def test_rebuild_documents(self):
+        """Test that rebuilding indexes rows created without signals"""
+        InvoiceSearchDocument.objects.all().delete()
+        self.assertEqual(self.search(Invoice, 'smith'), set())
+        rebuild_documents(Invoice, Payment)
+        self.assertEqual(self.search(Invoice, 'smith'), {self.jane_invoice})
+
+
+class SearchViewTest(SearchTestMixin, APITestCase):
+    def test_invoice_search(self):
+        """Test searching the invoice list"""
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.get('/api/invoices/', {'search': 'Smith'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([invoice['id'] for invoice in response.data], [str(self.jane_invoice.id)])
+
+    def test_payment_search(self):
+        """Test searching the payment list"""
+        Payment.objects.create(
+            invoice=self.jane_invoice,
+            amount=Decimal('80.00'),
+            description='Balance for bathroom tiles'
+        )
+        self.client.force_authenticate(user=self.owner)
+        self.assertEqual(len(self.client.get('/api/payments/').data), 2)
+        response = self.client.get('/api/payments/', {'search': 'renovation'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([payment['id'] for payment in response.data], [str(self.payment.id)])
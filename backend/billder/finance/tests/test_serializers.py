@@ -0,0 +1,127 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.parsers import JSONParser
+from billder.renderers import FastJSONRenderer, FastJSONParser
+from io import BytesIO
+from decimal import Decimal
+from datetime import date, timedelta
+from ..models import Invoice, Payment
+from ..serializers import InvoiceListSerializer, PaymentSerializer
+from ..fast_serializers import FastInvoiceListSerializer, FastPaymentSerializer
+
+User = get_user_model()
+
+
+class FastSerializerTest(TestCase):
+    def setUp(self):
+        """Set up invoices and payments covering nullable and computed fields"""
+        self.owner = User.objects.create_user(
+            email='owner@test.com',
+            password='testpass123',
+            first_name='Business',
+            last_name='Owner',
+            role='business_owner'
+        )
+        self.customer = User.objects.create_user(
+            email='customer@test.com',
+            password='testpass123',
+            first_name='John',
+            last_name='Doe',
+            role='customer'
+        )
+        self.overdue = Invoice.objects.create(
+            owner=self.owner,
+            customer=self.customer,
+            total_amount=Decimal('100.00'),
+            amount_paid=Decimal('25.50'),
+            due_date=date.today() - timedelta(days=3)
+        )
+        self.paid = Invoice.objects.create(
+            owner=self.owner,
+            customer=self.customer,
+            total_amount=Decimal('1234.56'),
+            amount_paid=Decimal('1234.56'),
+            status=Invoice.Status.PAID,
+            due_date=date.today() - timedelta(days=3)
+        )
+        Payment.objects.create(
+            invoice=self.overdue,
+            amount=Decimal('25.50'),
+            status=Payment.Status.SUCCEEDED,
+            external_payment_id='pi_123',
+            processed_at=timezone.now()
+        )
+        Payment.objects.create(
+            invoice=self.paid,
+            amount=Decimal('0.07'),
+            status=Payment.Status.CANCELED
+        )
+
+    def assertSameJSON(self, fast_data, drf_data):
+        self.assertEqual(fast_data, drf_data)
+        renderer = JSONRenderer()
+        self.assertEqual(renderer.render(fast_data), renderer.render(drf_data))
+
+    def test_invoice_list_matches_serializer(self):
+        """Test that fast invoice rows match InvoiceListSerializer output"""
+        queryset = Invoice.objects.select_related('customer', 'owner').order_by('created_at')
+        self.assertSameJSON(
+            FastInvoiceListSerializer(queryset).data,
+            InvoiceListSerializer(queryset, many=True).data
+        )
+
+    def test_invoice_overdue_flag(self):
+        """Test that the overdue flag is computed by the database"""
+        rows = {row['id']: row for row in FastInvoiceListSerializer(Invoice.objects.all()).data}
+        self.assertTrue(rows[str(self.overdue.id)]['is_overdue'])
+        self.assertFalse(rows[str(self.paid.id)]['is_overdue'])
+        self.assertEqual(rows[str(self.overdue.id)]['remaining_balance'], Decimal('74.50'))
+
+    def test_payment_list_matches_serializer(self):
+        """Test that fast payment rows match PaymentSerializer output"""
+        queryset = Payment.objects.select_related('invoice', 'invoice__customer')
+        self.assertSameJSON(
+            FastPaymentSerializer(queryset).data,
+            PaymentSerializer(queryset, many=True).data
+        )
+
+    def test_single_query(self):
+        """Test that a fast list costs one query regardless of row count"""
+        with self.assertNumQueries(1):
+            FastPaymentSerializer(Payment.objects.all()).data
+
+
+class FastJSONRendererTest(TestCase):
+    def setUp(self):
+        """Set up a payload with the value types the API renders"""
+        self.data = {
+            'amount': Decimal('1234.56'),
+            'zero': Decimal('0.00'),
+            'created_at': timezone.now(),
+            'due_date': date.today(),
+            'id': Invoice().id,
+            'description': 'Caf\u00e9 \u2028 line',
+            'nested': [{'count': 3, 'ok': True, 'missing': None}],
+        }
+
+    def test_matches_json_renderer(self):
+        """Test that the fast renderer emits the same bytes as DRF's JSONRenderer"""
+        self.assertEqual(FastJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+
+    def test_indent_falls_back(self):
+        """Test that pretty printed output is still supported"""
+        rendered = FastJSONRenderer().render(self.data, 'application/json; indent=4')
+        self.assertEqual(rendered, JSONRenderer().render(self.data, 'application/json; indent=4'))
+
+    def test_parser_matches_json_parser(self):
+        """Test that the fast parser reads the same data as DRF's JSONParser"""
+        body = JSONRenderer().render(self.data)
+        self.assertEqual(FastJSONParser().parse(BytesIO(body)), JSONParser().parse(BytesIO(body)))
+
+    def test_parser_rejects_invalid_json(self):
+        """Test that malformed bodies raise a parse error"""
+        from rest_framework.exceptions import ParseError
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(BytesIO(b'{"amount": NaN}'))
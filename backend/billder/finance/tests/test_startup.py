@@ -0,0 +1,51 @@
+import json
+import os
+import subprocess
+import sys
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from billder.management.commands.startup_report import parse_importtime
+
+
+class StartupTest(SimpleTestCase):
+    def test_stripe_is_imported_on_first_use(self):
+        """Test that setup and the URLconf leave the Stripe SDK unimported until it is used"""
+        script = (
+            'import sys, django; django.setup()\n'
+            'from django.urls import get_resolver; get_resolver().url_patterns\n'
+            'before = "stripe" in sys.modules\n'
+            'from finance.services.stripe_service import provider_failures; provider_failures()\n'
+            'print(before, "stripe" in sys.modules)\n'
+        )
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        process = subprocess.run([sys.executable, '-c', script], cwd=settings.BASE_DIR, env=env,
+                                 capture_output=True, text=True, check=True)
+        self.assertEqual(process.stdout.split(), ['False', 'True'])
+
+    def test_parse_importtime(self):
+        """Test that imports are attributed to the phase they ran in"""
+        stderr = (
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:        12 |         12 | _io\n'
+            'phase: setup\n'
+            'import time:       150 |        400 |   django.db\n'
+            'phase: urlconf\n'
+            'import time:       900 |       1200 | finance.views\n'
+        )
+        self.assertEqual(parse_importtime(stderr), {
+            'django.db': ('setup', 150, 400),
+            'finance.views': ('urlconf', 900, 1200),
+        })
+
+    def test_startup_report(self):
+        """Test that the report times both phases and lists packages"""
+        out = StringIO()
+        call_command('startup_report', runs=1, top=500, json=True, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(set(report['phases']), {'setup', 'urlconf'})
+        packages = {row['package'] for row in report['packages']}
+        self.assertIn('django', packages)
+        self.assertNotIn('stripe', packages)
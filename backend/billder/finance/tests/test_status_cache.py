@@ -0,0 +1,105 @@
+import json
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
+from decimal import Decimal
+from datetime import date, timedelta
+from rest_framework.authtoken.models import Token
+from benchmarks.fake_stripe import sign_payload
+from ..models import Invoice, Payment
+from ..services.stripe_service import StripePaymentService
+from ..status_cache import get_payment_status, payment_status_key, write_through
+from .test_stripe_service import WEBHOOK_SECRET, FakeStripeTestCase
+
+User = get_user_model()
+
+
+class PaymentStatusCacheTest(FakeStripeTestCase):
+    def setUp(self):
+        """Set up a payment intent, an empty cache and a count of provider lookups"""
+        super().setUp()
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.intent_id = self.service.create_payment_intent(Decimal('40.00'), 'CAD', {})['payment_intent_id']
+        lookups = mock.patch.object(StripePaymentService, 'get_payment_status', autospec=True,
+                                    side_effect=StripePaymentService.get_payment_status)
+        self.lookups = lookups.start()
+        self.addCleanup(lookups.stop)
+
+    def test_concurrent_lookups_are_coalesced(self):
+        """Test that concurrent callers for one intent share a single provider request"""
+        self.addCleanup(setattr, self.stripe, 'latency_ms', self.stripe.latency_ms)
+        self.stripe.latency_ms = 200
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(get_payment_status(self.intent_id)))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.lookups.call_count, 1)
+        self.assertEqual([result['status'] for result in results], ['requires_payment_method'] * 8)
+
+    def test_results_are_cached(self):
+        """Test that successful lookups are reused until they expire and failures aren't cached"""
+        get_payment_status(self.intent_id)
+        get_payment_status(self.intent_id)
+        self.assertEqual(self.lookups.call_count, 1)
+
+        for _ in range(2):
+            self.assertEqual(get_payment_status('pi_missing')['error_type'], 'stripe_error')
+        self.assertEqual(self.lookups.call_count, 3)
+
+        with self.settings(PAYMENT_STATUS_CACHE_TIMEOUT=0):
+            cache.clear()
+            get_payment_status(self.intent_id)
+            get_payment_status(self.intent_id)
+        self.assertEqual(self.lookups.call_count, 5)
+
+    def test_webhooks_write_through(self):
+        """Test that a webhook replaces the cached status without a lookup, and an older event doesn't"""
+        self.assertEqual(get_payment_status(self.intent_id)['status'], 'requires_payment_method')
+        owner = User.objects.create_user(email='owner@test.com', password='testpass123', first_name='Business',
+                                         last_name='Owner', role='business_owner')
+        customer = User.objects.create_user(email='customer@test.com', password='testpass123', first_name='John',
+                                            last_name='Doe', role='customer')
+        invoice = Invoice.objects.create(owner=owner, customer=customer, total_amount=Decimal('100.00'),
+                                         due_date=date.today() + timedelta(days=30))
+        Payment.objects.create(invoice=invoice, amount=Decimal('40.00'), external_payment_id=self.intent_id)
+        self.service.confirm_payment(self.intent_id, 'pm_card_visa')
+
+        payload = json.dumps(self.stripe.events[-1]).encode()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/finance/webhooks/stripe/', payload, content_type='application/json',
+                                        HTTP_STRIPE_SIGNATURE=sign_payload(payload, WEBHOOK_SECRET))
+        self.assertEqual(response.status_code, 200)
+        result = get_payment_status(self.intent_id)
+        self.assertEqual((result['status'], result['amount']), ('succeeded', Decimal('40.00')))
+        self.assertEqual(self.lookups.call_count, 1)
+
+        token = Token.objects.create(user=owner)
+        response = self.client.get(f'/api/payments/{invoice.payments.get().pk}/status/',
+                                   HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['status'], response.data['provider_status']), ('succeeded', 'succeeded'))
+
+        stale = dict(self.stripe.events[-1], id='evt_stale', created=self.stripe.events[-1]['created'] - 60)
+        stale['data'] = {'object': dict(stale['data']['object'], status='requires_payment_method')}
+        payload = json.dumps(stale).encode()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/finance/webhooks/stripe/', payload, content_type='application/json',
+                             HTTP_STRIPE_SIGNATURE=sign_payload(payload, WEBHOOK_SECRET))
+        self.assertEqual(get_payment_status(self.intent_id)['status'], 'succeeded')
+
+    def test_old_events_are_not_written_through(self):
+        """Test that an event older than the cache timeout, e.g. a replay, doesn't cache its stale status"""
+        result = {'success': True, 'payment_intent_id': self.intent_id, 'status': 'requires_payment_method'}
+        with self.settings(PAYMENT_STATUS_CACHE_TIMEOUT=30):
+            write_through(result, time.time() - 3600)
+            self.assertIsNone(cache.get(payment_status_key('stripe', self.intent_id)))
+
+            write_through(result, time.time() - 5)
+            self.assertEqual(cache.get(payment_status_key('stripe', self.intent_id))['result'], result)
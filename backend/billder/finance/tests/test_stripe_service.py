@@ -0,0 +1,178 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import stripe
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from decimal import Decimal
+from datetime import date, timedelta
+from rest_framework.authtoken.models import Token
+from benchmarks.fake_stripe import FakeStripe, WebhookEmitter, sign_payload, start
+from ..models import Invoice, Payment
+from ..services import get_payment_service
+from ..services.resilience import reset_guards
+
+User = get_user_model()
+
+WEBHOOK_SECRET = 'whsec_test'
+
+
+class FakeStripeTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.stripe, cls.server = start(FakeStripe())
+        cls.addClassCleanup(cls.server.shutdown)
+
+    def setUp(self):
+        """Point the Stripe service at the fake, without client retries or an open circuit"""
+        settings = override_settings(STRIPE_SECRET_KEY='sk_test_fake', STRIPE_API_BASE=self.server.url,
+                                     STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        retries = mock.patch.object(stripe, 'max_network_retries', 0)
+        retries.start()
+        self.addCleanup(retries.stop)
+        self.addCleanup(setattr, stripe, 'api_base', stripe.api_base)
+        self.stripe.error_rate = 0
+        # Rolled back users' ids are reused, and with them provider idempotency keys
+        self.stripe.idempotent.clear()
+        reset_guards()
+        self.addCleanup(reset_guards)
+        self.service = get_payment_service('stripe')
+
+
+class StripeServiceTest(FakeStripeTestCase):
+    def test_checkout_and_refund(self):
+        """Test creating, confirming and refunding a payment intent"""
+        created = self.service.create_payment_intent(Decimal('12.34'), 'CAD', {'invoice_id': 'inv_1'})
+        self.assertTrue(created['success'])
+        intent = self.stripe.intents[created['payment_intent_id']]
+        self.assertEqual(intent['amount'], 1234)
+        self.assertEqual(intent['metadata'], {'invoice_id': 'inv_1'})
+
+        confirmed = self.service.confirm_payment(created['payment_intent_id'], 'pm_card_visa')
+        self.assertEqual(confirmed['status'], 'succeeded')
+
+        refund = self.service.create_refund(created['payment_intent_id'], Decimal('5.00'))
+        self.assertTrue(refund['success'])
+        self.assertEqual(refund['amount'], 5.0)
+        self.assertEqual(refund['charge_id'], intent['latest_charge'])
+
+    def test_declined_card(self):
+        """Test that a declined card maps to a card error"""
+        created = self.service.create_payment_intent(Decimal('10.00'), 'CAD', {})
+        result = self.service.confirm_payment(created['payment_intent_id'], 'pm_card_chargeDeclined')
+        self.assertFalse(result['success'])
+        self.assertEqual(result['error_type'], 'card_error')
+
+    def test_cancel(self):
+        """Test canceling a payment intent"""
+        created = self.service.create_payment_intent(Decimal('10.00'), 'CAD', {})
+        result = self.service.cancel_payment(created['payment_intent_id'])
+        self.assertEqual(result['status'], 'canceled')
+        self.assertEqual(self.stripe.events[-1]['type'], 'payment_intent.canceled')
+
+    def test_injected_errors(self):
+        """Test that injected provider errors surface as Stripe errors"""
+        self.stripe.error_rate = 1
+        result = self.service.create_payment_intent(Decimal('10.00'), 'CAD', {})
+        self.assertFalse(result['success'])
+        self.assertEqual(result['error_type'], 'stripe_error')
+
+
+class FakeStripeWebhookTest(FakeStripeTestCase):
+    def setUp(self):
+        """Set up a pending payment backed by a fake payment intent"""
+        super().setUp()
+        owner = User.objects.create_user(email='owner@test.com', password='testpass123', first_name='Business',
+                                         last_name='Owner', role='business_owner')
+        self.customer = User.objects.create_user(email='customer@test.com', password='testpass123',
+                                                 first_name='John', last_name='Doe', role='customer')
+        self.invoice = Invoice.objects.create(owner=owner, customer=self.customer, total_amount=Decimal('100.00'),
+                                              due_date=date.today() + timedelta(days=30))
+        created = self.service.create_payment_intent(Decimal('40.00'), 'CAD', {})
+        self.intent_id = created['payment_intent_id']
+        self.payment = Payment.objects.create(invoice=self.invoice, amount=Decimal('40.00'),
+                                              external_payment_id=self.intent_id)
+
+    def test_events_are_accepted_by_webhook(self):
+        """Test that the fake's signed events are processed by stripe_webhook"""
+        self.service.confirm_payment(self.intent_id, 'pm_card_visa')
+        event = self.stripe.events[-1]
+        self.assertEqual(event['type'], 'payment_intent.succeeded')
+
+        payload = json.dumps(event).encode()
+        response = self.client.post('/api/finance/webhooks/stripe/', payload, content_type='application/json',
+                                    HTTP_STRIPE_SIGNATURE=sign_payload(payload, WEBHOOK_SECRET))
+        self.assertEqual(response.status_code, 200)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.Status.SUCCEEDED)
+        self.assertEqual(self.payment.external_charge_id, event['data']['object']['latest_charge'])
+
+    def test_confirmed_payment_is_credited_once(self):
+        """Test that a payment confirmed through the API credits the invoice, and its webhook doesn't again"""
+        token = Token.objects.create(user=self.customer)
+        response = self.client.post('/api/payments/confirm_payment/',
+                                    {'payment_intent_id': self.intent_id, 'payment_method_id': 'pm_card_visa'},
+                                    HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(response.status_code, 200)
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.amount_paid, Decimal('40.00'))
+
+        payload = json.dumps(self.stripe.events[-1]).encode()
+        response = self.client.post('/api/finance/webhooks/stripe/', payload, content_type='application/json',
+                                    HTTP_STRIPE_SIGNATURE=sign_payload(payload, WEBHOOK_SECRET))
+        self.assertEqual(response.status_code, 200)
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.amount_paid, Decimal('40.00'))
+
+    def test_forged_signature_is_rejected(self):
+        """Test that events signed with another secret are rejected"""
+        self.service.confirm_payment(self.intent_id, 'pm_card_visa')
+        payload = json.dumps(self.stripe.events[-1]).encode()
+        response = self.client.post('/api/finance/webhooks/stripe/', payload, content_type='application/json',
+                                    HTTP_STRIPE_SIGNATURE=sign_payload(payload, 'whsec_other'))
+        self.assertEqual(response.status_code, 400)
+
+
+class WebhookEmitterTest(TestCase):
+    def setUp(self):
+        """Start an endpoint that records deliveries and fails the first one"""
+        self.received = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(handler):
+                payload = handler.rfile.read(int(handler.headers['Content-Length']))
+                self.received.append((payload, handler.headers['Stripe-Signature']))
+                handler.send_response(500 if len(self.received) == 1 else 200)
+                handler.send_header('Content-Length', '0')
+                handler.end_headers()
+
+            def log_message(handler, format, *args):
+                pass
+
+        endpoint = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=endpoint.serve_forever, daemon=True).start()
+        self.addCleanup(endpoint.server_close)
+        self.addCleanup(endpoint.shutdown)
+        self.url = f'http://127.0.0.1:{endpoint.server_address[1]}/webhooks/'
+
+    def test_delivers_signed_events_with_retries(self):
+        """Test that events are signed, paced and retried until delivered"""
+        stripe_state = FakeStripe()
+        emitter = WebhookEmitter(self.url, WEBHOOK_SECRET, rate=100, backoff=0.01).start()
+        self.addCleanup(emitter.stop)
+        stripe_state.subscribe(emitter.enqueue)
+        for n in range(3):
+            stripe_state.add_intent(f'pi_{n}', 100)
+            stripe_state.cancel_intent(f'pi_{n}')
+
+        self.assertTrue(emitter.wait(timeout=10))
+        self.assertEqual((emitter.delivered, emitter.failed), (3, 0))
+        self.assertEqual(len(self.received), 4)
+        for payload, signature in self.received:
+            event = stripe.Webhook.construct_event(payload, signature, WEBHOOK_SECRET)
+            self.assertEqual(event['type'], 'payment_intent.canceled')
@@ -0,0 +1,110 @@
+import os
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APITestCase
+from billder.caching import cache_config
+from billder.checks import check_throttling
+from billder.ratelimits import throttle_settings
+from billder.throttling import CacheBuckets, LocalBuckets, reset_buckets
+
+RATES = {'public_invoice': '3/min', 'login': '3/min', 'register': None}
+
+
+@override_settings(THROTTLE_RATES=RATES)
+class TokenBucketThrottleTest(APITestCase):
+    def setUp(self):
+        """Start every test with full buckets"""
+        reset_buckets()
+        self.addCleanup(reset_buckets)
+
+    def login(self, **extra):
+        return self.client.post('/api/users/login/', {'email': 'nobody@test.com', 'password': 'wrong'}, **extra)
+
+    def test_login_is_throttled_before_any_query(self):
+        """Test that an empty bucket answers 429 with Retry-After, without a token lookup or query"""
+        self.assertEqual([self.login().status_code for _ in range(3)], [401, 401, 401])
+        with self.assertNumQueries(0):
+            response = self.login(HTTP_AUTHORIZATION='Token forged')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.json()['code'], 'THROTTLED')
+        self.assertAlmostEqual(int(response['Retry-After']), 20, delta=1)
+
+    def test_buckets_are_per_ip_and_route(self):
+        """Test that another IP, or another route from the same IP, has its own bucket"""
+        for _ in range(3):
+            self.login()
+        self.assertEqual(self.login().status_code, 429)
+        self.assertEqual(self.login(REMOTE_ADDR='10.0.0.2').status_code, 401)
+        self.assertEqual(self.client.get('/api/public/invoice/missing/').status_code, 404)
+
+    @override_settings(THROTTLE_BACKEND='cache')
+    def test_shared_cache_backend(self):
+        """Test that the cache backend enforces the same limit"""
+        cache.clear()
+        self.addCleanup(cache.clear)
+        statuses = [self.client.get('/api/public/invoice/missing/').status_code for _ in range(4)]
+        self.assertEqual(statuses, [404, 404, 404, 429])
+
+    def test_disabled_scope(self):
+        """Test that a scope whose rate is None is not limited"""
+        data = {'email': 'bad'}
+        self.assertTrue(all(self.client.post('/api/users/register/', data).status_code == 400 for _ in range(5)))
+
+
+class BucketTest(TestCase):
+    def test_local_bucket_refills(self):
+        """Test that tokens come back at the configured rate, up to the bucket size"""
+        buckets = LocalBuckets(max_keys=10)
+        with mock.patch('billder.throttling.time.monotonic', return_value=100.0) as clock:
+            self.assertEqual([buckets.take('k', 1, 2) for _ in range(3)], [0, 0, 1.0])
+            clock.return_value = 101.0
+            self.assertEqual([buckets.take('k', 1, 2) for _ in range(2)], [0, 1.0])
+            clock.return_value = 110.0
+            self.assertEqual([buckets.take('k', 1, 2) for _ in range(3)], [0, 0, 1.0])
+
+    def test_local_buckets_are_bounded(self):
+        """Test that the least recently used buckets are dropped past max_keys"""
+        buckets = LocalBuckets(max_keys=2)
+        for key in ('a', 'b', 'a', 'c'):
+            buckets.take(key, 1, 10)
+        self.assertEqual(list(buckets.tats), ['a', 'c'])
+
+    def test_cache_bucket_refills(self):
+        """Test that the cache backend refills like the local one, and denials don't use up tokens"""
+        cache.clear()
+        self.addCleanup(cache.clear)
+        buckets = CacheBuckets('default')
+        with mock.patch('billder.throttling.time.time', return_value=100.0) as clock:
+            self.assertEqual([buckets.take('k', 1, 2) for _ in range(4)], [0, 0, 1.0, 1.0])
+            clock.return_value = 101.0
+            self.assertEqual([buckets.take('k', 1, 2) for _ in range(2)], [0, 1.0])
+
+    @override_settings(THROTTLE_BACKEND='redis', THROTTLE_RATES={'login': '10/fortnight', 'register': '5'})
+    def test_checks(self):
+        """Test that unknown backends and malformed rates are reported"""
+        self.assertEqual([error.id for error in check_throttling(None)],
+                         ['billder.E003', 'billder.E004', 'billder.E004'])
+
+    def test_cache_backend_without_atomic_incr_warns(self):
+        """Test that cache buckets in a per-process, database or file cache are reported, and Redis is not"""
+        for url in ('locmem://', 'db://billder_cache', 'file:///tmp/billder-cache'):
+            with override_settings(THROTTLE_BACKEND='cache', THROTTLE_CACHE='default',
+                                   CACHES={'default': cache_config(url)}):
+                self.assertEqual([error.id for error in check_throttling(None)], ['billder.W001'], url)
+        with override_settings(THROTTLE_BACKEND='cache', THROTTLE_CACHE='default',
+                               CACHES={'default': cache_config('redis://cache.internal:6379/0')}):
+            self.assertEqual(check_throttling(None), [])
+
+    def test_backend_defaults_to_atomic_cache(self):
+        """Test that buckets go to Redis or Memcached, and stay in the process for any other cache"""
+        with mock.patch.dict(os.environ, {'THROTTLE_LOGIN_RATE': 'off'}, clear=True):
+            rates, backend, alias, _ = throttle_settings({'default': cache_config('redis://cache.internal:6379/0')})
+            self.assertEqual((backend, alias), ('cache', 'default'))
+            self.assertEqual(rates, {'public_invoice': '120/min', 'login': None, 'register': '10/hour'})
+            self.assertEqual(throttle_settings({'default': cache_config('memcached://cache.internal')})[1], 'cache')
+            for url in ('locmem://', 'db://billder_cache', 'file:///tmp/billder-cache'):
+                self.assertEqual(throttle_settings({'default': cache_config(url)})[1], 'local', url)
+        with mock.patch.dict(os.environ, {'THROTTLE_BACKEND': 'local'}, clear=True):
+            self.assertEqual(throttle_settings({'default': cache_config('redis://cache.internal')})[1], 'local')
@@ -7,7 +7,13 @@ from rest_framework import status
 from rest_framework.authtoken.models import Token
 from decimal import Decimal
 from datetime import date, timedelta
-from ..models import Invoice, Payment
+from importlib import import_module
+from django.apps import apps as django_apps
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from billder.checks import check_public_slug_secret
+from ..models import Invoice, Payment, overdue_q
+from ..public_links import make_public_slug
 
 User = get_user_model()
 
@@ -144,6 +150,81 @@ class InvoiceViewSetTest(APITestCase):
         self.assertEqual(len(response.data), 1)
         self.assertEqual(response.data[0]['status'], 'paid')
 
+    def test_invoice_filtering_by_overdue(self):
+        """Test filtering invoices that are past due and not paid"""
+        self.invoice1.due_date = date.today() - timedelta(days=1)
+        self.invoice1.save()
+        self.invoice2.due_date = date.today() - timedelta(days=1)
+        self.invoice2.status = Invoice.Status.PAID
+        self.invoice2.save()
+        
+        token = Token.objects.create(user=self.owner)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        
+        response = self.client.get('/api/invoices/?overdue=true')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([invoice['id'] for invoice in response.data], [str(self.invoice1.id)])
+        self.assertTrue(response.data[0]['is_overdue'])
+
+    def test_overdue_filter_uses_owner_due_date_index(self):
+        """Test that ?overdue= filters on the columns, which the (owner, due_date, status) index serves"""
+        queryset = Invoice.objects.filter(owner=self.owner).with_balance().filter(overdue_q())
+        self.assertIn('finance_inv_owner_i_030669_idx', queryset.explain())
+
+        self.invoice1.due_date = date.today() - timedelta(days=1)
+        self.invoice1.save()
+        token = Token.objects.create(user=self.owner)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        response = self.client.get('/api/invoices/?overdue=false')
+        self.assertEqual([invoice['id'] for invoice in response.data], [str(self.invoice2.id)])
+        self.assertFalse(response.data[0]['is_overdue'])
+
+    def test_invoice_filtering_by_min_balance(self):
+        """Test filtering invoices by outstanding balance"""
+        self.invoice2.amount_paid = Decimal('150.00')
+        self.invoice2.save()
+        
+        token = Token.objects.create(user=self.owner)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        
+        response = self.client.get('/api/invoices/?min_balance=75')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([invoice['id'] for invoice in response.data], [str(self.invoice1.id)])
+
+    def test_min_balance_uses_each_invoice_currency(self):
+        """Test that min_balance is compared in each invoice's own minor units, and rejects bad input"""
+        yen_invoice = Invoice.objects.create(owner=self.owner, customer=self.customer, currency='JPY',
+                                             total_amount=Decimal('1000'), due_date=date.today())
+        token = Token.objects.create(user=self.owner)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        response = self.client.get('/api/invoices/', {'min_balance': '500', 'currency': 'JPY'})
+        self.assertEqual([invoice['id'] for invoice in response.data], [str(yen_invoice.id)])
+        # Finer than a yen rounds up to one
+        response = self.client.get('/api/invoices/', {'min_balance': '999.5', 'currency': 'JPY'})
+        self.assertEqual([invoice['id'] for invoice in response.data], [str(yen_invoice.id)])
+        response = self.client.get('/api/invoices/', {'min_balance': '0.001'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 3)
+
+        for value in ('abc', 'NaN', 'Infinity'):
+            response = self.client.get('/api/invoices/', {'min_balance': value})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, value)
+        self.assertIn('min_balance', response.data['details'])
+
+    def test_invoice_ordering_by_remaining_balance(self):
+        """Test sorting invoices by outstanding balance"""
+        self.invoice2.amount_paid = Decimal('150.00')
+        self.invoice2.save()
+        
+        token = Token.objects.create(user=self.owner)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        
+        response = self.client.get('/api/invoices/?ordering=remaining_balance')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        balances = [invoice['remaining_balance'] for invoice in response.data]
+        self.assertEqual(balances, [Decimal('50.00'), Decimal('100.00')])
+
     def test_total_amount_endpoint(self):
         """Test total amount calculation endpoint"""
         token = Token.objects.create(user=self.owner)
@@ -310,3 +391,42 @@ class PublicInvoiceViewTest(APITestCase):
         """Test accessing non-existent public invoice"""
         response = self.client.get('/api/public/invoice/non-existent-slug/')
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_forged_slug_is_rejected_without_queries(self):
+        """Test that slugs with a wrong signature, or of no known form, are rejected without touching the DB"""
+        forged = self.invoice.public_slug[:-1] + ('0' if self.invoice.public_slug[-1] != '0' else '1')
+        for slug in (forged, 'non-existent-slug', 'invoice-1a2b3c4d5e'):
+            with self.assertNumQueries(0):
+                response = self.client.get(f'/api/public/invoice/{slug}/')
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        # A guess of the legacy form costs one indexed lookup
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/public/invoice/invoice-5e6f7a8b/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_legacy_slugs_keep_working(self):
+        """Test that migrated invoices are still served under their unsigned slug"""
+        Invoice.objects.filter(pk=self.invoice.pk).update(public_slug='invoice-1a2b3c4d')
+        migration = import_module('finance.migrations.0014_signed_public_slugs')
+        migration.sign_public_slugs(django_apps, connection.schema_editor())
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.legacy_public_slug, 'invoice-1a2b3c4d')
+        self.assertEqual(len(self.invoice.public_slug), 41)
+
+        for slug in ('invoice-1a2b3c4d', self.invoice.public_slug):
+            response = self.client.get(f'/api/public/invoice/{slug}/')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            # The second is served from the cache entry the first stored
+            self.assertEqual(response.json()['invoice']['id'], str(self.invoice.id))
+        with self.settings(PUBLIC_SLUG_ACCEPT_LEGACY=False):
+            response = self.client.get('/api/public/invoice/invoice-1a2b3c4d/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_slug_secret_is_required(self):
+        """Test that links are never signed with SECRET_KEY in place of a missing PUBLIC_SLUG_SECRET"""
+        self.assertEqual(check_public_slug_secret(None), [])
+        with self.settings(PUBLIC_SLUG_SECRET=None):
+            self.assertEqual([error.id for error in check_public_slug_secret(None)], ['billder.E006'])
+            with self.assertRaises(ImproperlyConfigured):
+                make_public_slug()
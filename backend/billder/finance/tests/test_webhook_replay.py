@@ -0,0 +1,122 @@
+import json
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from decimal import Decimal
+from datetime import date, timedelta
+from benchmarks.fake_stripe import sign_payload
+from ..models import Invoice, Payment, ProcessedWebhookEvent, WebhookWatermark
+from ..webhook_replay import get_watermark, replay_events
+from ..webhook_views import process_event
+from .test_stripe_service import WEBHOOK_SECRET, FakeStripeTestCase
+
+User = get_user_model()
+
+
+class WebhookReplayTest(FakeStripeTestCase):
+    def setUp(self):
+        """Set up pending payments whose events were never delivered, spread over two hours"""
+        super().setUp()
+        self.stripe.events.clear()
+        owner = User.objects.create_user(email='owner@test.com', password='testpass123', first_name='Business',
+                                         last_name='Owner', role='business_owner')
+        customer = User.objects.create_user(email='customer@test.com', password='testpass123', first_name='John',
+                                            last_name='Doe', role='customer')
+        self.invoice = Invoice.objects.create(owner=owner, customer=customer, total_amount=Decimal('100.00'),
+                                              due_date=date.today() + timedelta(days=30))
+        self.payments = []
+        for _ in range(4):
+            created = self.service.create_payment_intent(Decimal('10.00'), 'CAD', {})
+            self.payments.append(Payment.objects.create(invoice=self.invoice, amount=Decimal('10.00'),
+                                                        external_payment_id=created['payment_intent_id']))
+        for payment in self.payments[:3]:
+            self.service.confirm_payment(payment.external_payment_id, 'pm_card_visa')
+        self.service.cancel_payment(self.payments[3].external_payment_id)
+        for age, event in zip((110, 70, 40, 10), self.stripe.events):
+            event['created'] -= age * 60
+
+    def replay(self, **kwargs):
+        kwargs.setdefault('since', timezone.now() - timedelta(hours=3))
+        return replay_events(slice_length=timedelta(minutes=15), page_size=1, batch_size=2, **kwargs)
+
+    def test_replay_applies_missed_events(self):
+        """Test that missed events are listed in time slices and applied in order"""
+        stats = self.replay()
+        self.assertEqual((stats.events, stats.applied, stats.skipped, stats.failed), (4, 4, 0, 0))
+        self.assertGreaterEqual(stats.pages, 4)
+
+        statuses = [Payment.objects.get(pk=payment.pk).status for payment in self.payments]
+        self.assertEqual(statuses, ['succeeded', 'succeeded', 'succeeded', 'canceled'])
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.amount_paid, Decimal('30.00'))
+        self.assertEqual(get_watermark(), stats.watermark)
+        self.assertEqual(ProcessedWebhookEvent.objects.count(), 4)
+
+    def test_replay_skips_processed_events(self):
+        """Test that events delivered live or replayed before are applied once"""
+        payload = json.dumps(self.stripe.events[0]).encode()
+        response = self.client.post('/api/finance/webhooks/stripe/', payload, content_type='application/json',
+                                    HTTP_STRIPE_SIGNATURE=sign_payload(payload, WEBHOOK_SECRET))
+        self.assertEqual(response.status_code, 200)
+
+        stats = self.replay()
+        self.assertEqual((stats.applied, stats.skipped), (3, 1))
+        stats = self.replay()
+        self.assertEqual((stats.applied, stats.skipped), (0, 4))
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.amount_paid, Decimal('30.00'))
+
+    def test_duplicate_delivery_is_ignored(self):
+        """Test that a redelivered webhook doesn't count a payment twice"""
+        payload = json.dumps(self.stripe.events[0]).encode()
+        for _ in range(2):
+            response = self.client.post('/api/finance/webhooks/stripe/', payload, content_type='application/json',
+                                        HTTP_STRIPE_SIGNATURE=sign_payload(payload, WEBHOOK_SECRET))
+            self.assertEqual(response.status_code, 200)
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.amount_paid, Decimal('10.00'))
+
+    def test_out_of_order_events_credit_once(self):
+        """Test that a replayed older failure can't reopen a settled payment for a second credit"""
+        payment = self.payments[0]
+        succeeded = self.stripe.events[0]
+        failed = dict(succeeded, id='evt_missed_failure', type='payment_intent.payment_failed',
+                      created=succeeded['created'] - 60)
+        self.assertTrue(payment.mark_succeeded())  # confirmed through the API
+
+        self.assertTrue(process_event(failed))
+        self.assertTrue(process_event(succeeded))
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, Payment.Status.SUCCEEDED)
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.amount_paid, Decimal('10.00'))
+
+        Payment.objects.filter(pk=payment.pk).update(status=Payment.Status.REFUNDED)
+        self.assertFalse(payment.mark_succeeded())
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.amount_paid, Decimal('10.00'))
+
+    def test_failed_listing_holds_watermark(self):
+        """Test that the watermark stops at the first slice that couldn't be listed"""
+        since = timezone.now() - timedelta(hours=3)
+        self.stripe.error_rate = 1
+        stats = self.replay(since=since)
+        self.assertGreater(stats.failed, 0)
+        self.assertEqual(stats.applied, 0)
+        self.assertEqual(int(get_watermark().timestamp()), int(since.timestamp()))
+
+    def test_command_resumes_from_watermark(self):
+        """Test the replay_webhooks command, first with --since and then from the watermark"""
+        with self.assertRaises(CommandError):
+            call_command('replay_webhooks', stdout=StringIO())
+
+        out = StringIO()
+        call_command('replay_webhooks', '--since', '3h', '--slice-minutes', '30', stdout=out)
+        self.assertIn('Applied:   4', out.getvalue())
+        self.assertEqual(WebhookWatermark.objects.count(), 1)
+
+        out = StringIO()
+        call_command('replay_webhooks', stdout=out)
+        self.assertIn('Events:    0', out.getvalue())
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import InvoiceViewSet, PaymentViewSet, PublicInvoiceView
+from .views import InvoiceViewSet, PaymentViewSet, ProviderMetricsView, PublicInvoiceView
 from .webhook_views import stripe_webhook
 
 router = DefaultRouter()
@@ -10,5 +10,6 @@ router.register(r'payments', PaymentViewSet)
 urlpatterns = [
     path('', include(router.urls)),
     path('finance/webhooks/stripe/', stripe_webhook, name='stripe_webhook'),
+    path('finance/metrics/', ProviderMetricsView.as_view(), name='provider_metrics'),
     path('public/invoice/<str:public_slug>/', PublicInvoiceView.as_view(), name='public_invoice'),
 ]
\ No newline at end of file
@@ -1,12 +1,26 @@
 from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from django.db.models import Sum, F
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from .models import Invoice, Payment
+from decimal import Decimal, InvalidOperation
+from billder.db_routers import read_from_replica
+from billder.throttling import TokenBucketThrottle
+from . import autocomplete
+from .cache import get_public_invoice, set_public_invoice
+from .models import Invoice, Payment, overdue_q
+from .public_links import canonical_slug
+from .money import to_major
+from .search import DocumentSearchFilter
+from .idempotency import idempotent
+from .services.resilience import guard_metrics
+from .status_cache import get_payment_status
+from .fast_serializers import FastInvoiceListSerializer, FastPaymentSerializer
 from .serializers import (
     InvoiceListSerializer, 
     InvoiceDetailSerializer,
@@ -22,6 +36,14 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+
+def failure_status(result):
+    """503 when the provider is unavailable (circuit open or too busy), otherwise 400"""
+    if result.get('error_type') == 'provider_unavailable':
+        return status.HTTP_503_SERVICE_UNAVAILABLE
+    return status.HTTP_400_BAD_REQUEST
+
+
 class InvoiceViewSet(viewsets.ModelViewSet):
     """
     ViewSet for managing invoices.
@@ -32,9 +54,9 @@ class InvoiceViewSet(viewsets.ModelViewSet):
     """
     queryset = Invoice.objects.none()  # Empty queryset by default
     serializer_class = InvoiceListSerializer
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DocumentSearchFilter, filters.OrderingFilter]
     search_fields = ['reference', 'customer__first_name', 'customer__last_name', 'customer__email']
-    ordering_fields = ['created_at', 'due_date', 'total_amount', 'reference']
+    ordering_fields = ['created_at', 'due_date', 'total_amount', 'reference', 'remaining_balance']
     ordering = ['-created_at']
     permission_classes = [IsAuthenticated]
 
@@ -58,6 +80,9 @@ class InvoiceViewSet(viewsets.ModelViewSet):
                 # Fallback: filter by owner (old behavior)
                 queryset = Invoice.objects.filter(owner=user).select_related('customer', 'owner')
             
+            # Balance and overdue flag computed in SQL so they can be filtered and sorted on
+            queryset = queryset.with_balance()
+            
             # Manual filtering for status and currency
             status = self.request.query_params.get('status', None)
             if status:
@@ -71,7 +96,27 @@ class InvoiceViewSet(viewsets.ModelViewSet):
                     raise ValueError("Currency must be a 3-letter code (e.g., 'CAD', 'USD')")
                 queryset = queryset.filter(currency=currency.upper())
                 
+            overdue = self.request.query_params.get('overdue', None)
+            if overdue:
+                if overdue.lower() not in ('true', 'false'):
+                    raise ValueError("overdue must be 'true' or 'false'")
+                # The condition itself, so the (owner, due_date, status) index serves it
+                queryset = queryset.filter(overdue_q() if overdue.lower() == 'true' else ~overdue_q())
+                
+            min_balance = self.request.query_params.get('min_balance', None)
+            if min_balance:
+                try:
+                    amount = Decimal(min_balance)
+                except InvalidOperation:
+                    amount = None
+                if amount is None or not amount.is_finite():
+                    raise ValidationError({'min_balance': f"Invalid min_balance '{min_balance}'"})
+                # Compared in each invoice's own currency
+                queryset = queryset.owing_at_least(amount)
+                
             return queryset
+        except ValidationError:
+            raise
         except Exception as e:
             logger.error(f"Error filtering invoices: {str(e)}")
             return Invoice.objects.none()
@@ -113,12 +158,21 @@ class InvoiceViewSet(viewsets.ModelViewSet):
                 'code': 'INVOICE_CREATION_FAILED'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @read_from_replica
+    def list(self, request, *args, **kwargs):
+        """List invoices visible to the current user"""
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(FastInvoiceListSerializer(queryset).data)
+
     @action(detail=False, methods=['get'])
+    @read_from_replica
     def total_amount(self, request):
         """Get total amount of all invoices for the business owner"""
-        user_invoices = Invoice.objects.filter(owner=request.user)
-        total = user_invoices.aggregate(Sum('total_amount'))['total_amount__sum'] or 0
-        total_paid = user_invoices.aggregate(Sum('amount_paid'))['amount_paid__sum'] or 0
+        # Integer sums per currency, each converted to major units exactly
+        sums = list(Invoice.objects.filter(owner=request.user).order_by().values('currency').annotate(
+            total=Sum('total_amount'), paid=Sum('amount_paid')))
+        total = sum((to_major(row['total'], row['currency']) for row in sums), Decimal('0.00'))
+        total_paid = sum((to_major(row['paid'], row['currency']) for row in sums), Decimal('0.00'))
         
         return Response({
             'total_amount': total,
@@ -126,6 +180,7 @@ class InvoiceViewSet(viewsets.ModelViewSet):
         })
 
     @action(detail=False, methods=['get'])
+    @read_from_replica
     def customer_stats(self, request):
         """Get customer statistics for the business owner"""
         user_invoices = Invoice.objects.filter(owner=request.user)
@@ -139,13 +194,31 @@ class InvoiceViewSet(viewsets.ModelViewSet):
             'customers_with_balance': customers_with_balance
         })
 
+    @action(detail=False, methods=['get'])
+    @read_from_replica
+    def customers(self, request):
+        """Autocomplete the business owner's past customers by email or name prefix"""
+        query = request.query_params.get('q', '').strip()
+        try:
+            limit = min(int(request.query_params.get('limit', autocomplete.DEFAULT_LIMIT)), autocomplete.MAX_LIMIT)
+        except ValueError:
+            return Response({
+                'error': 'Invalid limit',
+                'message': 'limit must be a whole number.',
+                'code': 'INVALID_LIMIT'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        if not query:
+            return Response([])
+        return Response(autocomplete.get_index(request.user.pk).search(query, limit))
+
 
 class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
     """Payment management for customers and business owners"""
     queryset = Payment.objects.none()  # Empty queryset by default
     serializer_class = PaymentSerializer
     permission_classes = []
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DocumentSearchFilter, filters.OrderingFilter]
     search_fields = ['invoice__reference', 'amount', 'description']
     ordering_fields = ['created_at', 'amount', 'status']
     ordering = ['-created_at']
@@ -180,11 +253,11 @@ class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
             
         return queryset
 
+    @read_from_replica
     def list(self, request):
         """List all payments for the current user"""
-        payments = self.get_queryset()
-        serializer = self.get_serializer(payments, many=True)
-        return Response(serializer.data)
+        payments = self.filter_queryset(self.get_queryset())
+        return Response(FastPaymentSerializer(payments).data)
 
     def retrieve(self, request, pk=None):
         """Get specific payment details"""
@@ -193,6 +266,7 @@ class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
         return Response(serializer.data)
 
     @action(detail=False, methods=['post'])
+    @idempotent
     def create_payment(self, request):
         """Create payment intent for invoice"""
         serializer = PaymentCreateSerializer(data=request.data, context={'request': request})
@@ -222,20 +296,27 @@ class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
                 'description': description
             }
             
-            result = payment_service.create_payment_intent(amount, currency, metadata)
+            result = payment_service.create_payment_intent(
+                amount, currency, metadata,
+                idempotency_key=getattr(request, 'provider_idempotency_key', None),
+            )
             
             if result.get('success'):
-                # Create payment record
-                payment = Payment.objects.create(
-                    invoice=invoice,
-                    amount=amount,
-                    currency=currency,
-                    payment_method=payment_method,
+                # Create payment record; a retry that took over an abandoned
+                # Idempotency-Key gets the same intent back from Stripe, and
+                # the payment the killed request may already have saved
+                payment, _ = Payment.objects.get_or_create(
                     payment_provider=Payment.PaymentProvider.STRIPE,
-                    description=description,
-                    status=Payment.Status.PENDING,
                     external_payment_id=result.get('payment_intent_id'),
-                    client_secret=result.get('client_secret')
+                    defaults={
+                        'invoice': invoice,
+                        'amount': amount,
+                        'currency': currency,
+                        'payment_method': payment_method,
+                        'description': description,
+                        'status': Payment.Status.PENDING,
+                        'client_secret': result.get('client_secret'),
+                    },
                 )
                 
                 payment_serializer = PaymentSerializer(payment)
@@ -251,7 +332,7 @@ class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
                     'success': False,
                     'error': result.get('error'),
                     'error_type': result.get('error_type')
-                }, status=status.HTTP_400_BAD_REQUEST)
+                }, status=failure_status(result))
                 
         except Exception as e:
             logger.error(f"Error creating payment: {e}")
@@ -261,6 +342,7 @@ class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     @action(detail=False, methods=['post'])
+    @idempotent
     def confirm_payment(self, request):
         """Confirm payment with Stripe"""
         serializer = PaymentConfirmSerializer(data=request.data)
@@ -311,18 +393,19 @@ class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
             payment_method_id = serializer.validated_data.get('payment_method_id')
             logger.info(f"Confirming payment with method ID: {payment_method_id}")
             
-            result = payment_service.confirm_payment(payment_intent_id, payment_method_id)
+            result = payment_service.confirm_payment(
+                payment_intent_id, payment_method_id,
+                idempotency_key=getattr(request, 'provider_idempotency_key', None),
+            )
             logger.info(f"Stripe confirmation result: {result}")
             
             if result.get('success'):
                 # Update payment status based on Stripe response
                 if result.get('status') == 'succeeded':
-                    payment.status = Payment.Status.SUCCEEDED
-                    payment.processed_at = timezone.now()
+                    payment.mark_succeeded()
                 else:
                     payment.status = Payment.Status.PROCESSING
-                
-                payment.save()
+                    payment.save()
                 logger.info(f"Payment updated: {payment.id}, status: {payment.status}")
                 
                 payment_serializer = PaymentSerializer(payment)
@@ -340,7 +423,7 @@ class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
                     'success': False,
                     'error': error_msg,
                     'error_type': error_type
-                }, status=status.HTTP_400_BAD_REQUEST)
+                }, status=failure_status(result))
                 
         except Exception as e:
             logger.error(f"Error confirming payment: {e}")
@@ -359,10 +442,15 @@ class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
                 invoice__owner=request.user
             )
             
-            # TODO: Get latest status from Stripe
-            # For now, return current status
             serializer = PaymentStatusSerializer(payment)
-            return Response(serializer.data)
+            data = serializer.data
+            # The provider's view, which may be ahead of ours until its webhook arrives
+            data['provider_status'] = None
+            if payment.external_payment_id:
+                result = get_payment_status(payment.external_payment_id, payment.payment_provider)
+                if result.get('success'):
+                    data['provider_status'] = result['status']
+            return Response(data)
             
         except Exception as e:
             logger.error(f"Error getting payment status: {e}")
@@ -371,6 +459,7 @@ class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     @action(detail=True, methods=['post'])
+    @idempotent
     def cancel(self, request, pk=None):
         """Cancel payment"""
         try:
@@ -398,6 +487,7 @@ class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     @action(detail=False, methods=['post'])
+    @idempotent
     def create_refund(self, request):
         """Create refund for a payment"""
         serializer = RefundCreateSerializer(data=request.data, context={'request': request})
@@ -417,7 +507,10 @@ class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
             payment_service = get_payment_service('stripe')
             
             # Create refund with Stripe
-            result = payment_service.create_refund(payment.external_payment_id, amount)
+            result = payment_service.create_refund(
+                payment.external_payment_id, amount,
+                idempotency_key=getattr(request, 'provider_idempotency_key', None),
+            )
             
             if result.get('success'):
                 # Update payment with refund details
@@ -453,7 +546,7 @@ class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
                     'success': False,
                     'error': result.get('error'),
                     'error_type': result.get('error_type')
-                }, status=status.HTTP_400_BAD_REQUEST)
+                }, status=failure_status(result))
                 
         except Payment.DoesNotExist:
             return Response({
@@ -468,6 +561,7 @@ class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     @action(detail=False, methods=['get'])
+    @read_from_replica
     def refunds(self, request):
         """List all refunds for the current user"""
         try:
@@ -512,9 +606,32 @@ class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
 class PublicInvoiceView(APIView):
     """Public view for invoices accessible without authentication"""
     permission_classes = [AllowAny]
+    # No authenticators: a forged Authorization header must not cost a token
+    # lookup before the throttle has run
+    authentication_classes = []
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'public_invoice'
     
+    @read_from_replica
     def get(self, request, public_slug):
         """Get invoice by public slug"""
+        # Forged and malformed slugs are turned away without a cache or DB hit
+        public_slug = canonical_slug(public_slug)
+        if public_slug is None:
+            return Response({
+                'success': False,
+                'error': 'Invoice not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        # Only plain JSON is cached; the browsable API and ?indent= render as usual
+        cacheable = request.accepted_media_type == 'application/json'
+        if cacheable:
+            cached = get_public_invoice(public_slug)
+            if cached:
+                response = HttpResponse(cached['content'], content_type='application/json')
+                response.precompressed = cached
+                return response
+
         try:
             invoice = get_object_or_404(
                 Invoice.objects.select_related('customer', 'owner'),
@@ -528,11 +645,14 @@ class PublicInvoiceView(APIView):
             invoice_serializer = InvoiceDetailSerializer(invoice)
             payment_serializer = PaymentSerializer(payments, many=True)
             
-            return Response({
+            response = Response({
                 'success': True,
                 'invoice': invoice_serializer.data,
                 'payments': payment_serializer.data
             })
+            if cacheable:
+                response.add_post_render_callback(self.cache_rendered(public_slug))
+            return response
             
         except Exception as e:
             logger.error(f"Error fetching public invoice: {e}")
@@ -541,4 +661,16 @@ class PublicInvoiceView(APIView):
                 'error': 'Invoice not found'
             }, status=status.HTTP_404_NOT_FOUND)
 
+    def cache_rendered(self, public_slug):
+        """Post-render callback storing the payload and its compressed variants"""
+        def callback(response):
+            response.precompressed = set_public_invoice(public_slug, response.content)
+        return callback
+
+
+class ProviderMetricsView(APIView):
+    """Circuit breaker and bulkhead state of this process's payment provider guards"""
+    permission_classes = [IsAdminUser]
 
+    def get(self, request):
+        return Response({'payment_providers': guard_metrics()})
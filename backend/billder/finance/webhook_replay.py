@@ -0,0 +1,154 @@
+"""
+Catch up on Stripe events the webhook endpoint missed.
+
+While ``stripe_webhook`` is down or timing out, Stripe retries deliveries
+on a schedule that stretches to hours, and payments sit in pending until
+then. ``replay_events`` lists the ``payment_intent.*`` events created in a
+time window through Stripe's Events API and applies them with the webhook's
+own code (``webhook_views.process_event``):
+
+- A single event list is a sequential cursor, so the window is cut into
+  time slices that ``workers`` threads page through concurrently. Slices
+  are applied oldest first as they arrive.
+- Events are applied in batches of ``batch_size``, one transaction per
+  batch. Events already in ``ProcessedWebhookEvent``, whether delivered
+  live or by an earlier replay, are skipped with one primary key lookup per
+  batch.
+- ``WebhookWatermark`` records how far the replay got. Without an explicit
+  ``since`` the next run starts there, minus ``overlap`` for events that
+  became visible late. A slice or event that fails holds the watermark
+  back so the next run retries it.
+
+Stripe keeps events for 30 days.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.utils import timezone
+from .models import Payment, ProcessedWebhookEvent, WebhookWatermark
+from .services import get_payment_service
+from .services.resilience import get_guard
+from .webhook_views import EVENT_HANDLERS, process_event
+
+logger = logging.getLogger(__name__)
+
+EVENT_RETENTION = timedelta(days=30)
+
+
+class ReplayError(Exception):
+    pass
+
+
+@dataclass
+class ReplayStats:
+    since: datetime = None
+    until: datetime = None
+    pages: int = 0
+    events: int = 0
+    applied: int = 0
+    skipped: int = 0
+    failed: int = 0
+    watermark: datetime = None
+
+
+def get_watermark(provider=Payment.PaymentProvider.STRIPE):
+    watermark = WebhookWatermark.objects.filter(provider=provider).first()
+    return watermark.replayed_until if watermark else None
+
+
+def time_slices(since, until, length):
+    """[start, end) epoch second ranges covering [since, until)"""
+    start, until = int(since.timestamp()), int(until.timestamp())
+    step = max(int(length.total_seconds()), 1)
+    while start < until:
+        yield start, min(start + step, until)
+        start += step
+
+
+def fetch_slice(service, start, end, page_size):
+    """Every handled event created in [start, end), oldest first, and the number of pages"""
+    events, pages, starting_after = [], 0, None
+    while True:
+        result = service.list_events(list(EVENT_HANDLERS), start, end, starting_after, page_size)
+        if not result['success']:
+            raise ReplayError(result['error'])
+        pages += 1
+        events.extend(result['events'])
+        if not result['has_more'] or not result['events']:
+            break
+        starting_after = result['events'][-1]['id']
+    # Pages are newest first; within a second, reversing keeps Stripe's order
+    events.reverse()
+    events.sort(key=lambda event: event['created'])
+    return events, pages
+
+
+def apply_events(events, batch_size, stats):
+    """Apply events in order; returns the creation time of the first one that failed, if any"""
+    first_failure = None
+    for offset in range(0, len(events), batch_size):
+        batch = events[offset:offset + batch_size]
+        processed = set(ProcessedWebhookEvent.objects.filter(
+            event_id__in=[event['id'] for event in batch]
+        ).values_list('event_id', flat=True))
+        with transaction.atomic():
+            for event in batch:
+                if event['id'] in processed:
+                    stats.skipped += 1
+                    continue
+                try:
+                    applied = process_event(event)
+                except Exception as e:
+                    logger.error(f"Error replaying event {event['id']}: {e}")
+                    stats.failed += 1
+                    if first_failure is None:
+                        first_failure = event['created']
+                    continue
+                if applied:
+                    stats.applied += 1
+                else:
+                    stats.skipped += 1
+    return first_failure
+
+
+def replay_events(since=None, until=None, workers=4, slice_length=timedelta(minutes=15), batch_size=500,
+                  page_size=100, overlap=timedelta(minutes=5), provider=Payment.PaymentProvider.STRIPE):
+    """Replay events created in [since, until) and advance the watermark; returns ReplayStats"""
+    until = until or timezone.now()
+    if since is None:
+        watermark = get_watermark(provider)
+        if watermark is None:
+            raise ReplayError('No watermark recorded yet; pass since')
+        since = watermark - overlap
+    if until - since > EVENT_RETENTION:
+        logger.warning(f"Stripe keeps events for {EVENT_RETENTION.days} days; older events can't be replayed")
+
+    stats = ReplayStats(since=since, until=until)
+    service = get_payment_service(provider)
+    get_guard(provider).bulkhead.ensure_capacity(workers)
+    slices = list(time_slices(since, until, slice_length))
+    replayed_until = int(until.timestamp())
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Applied in slice order while later slices are still being fetched
+        futures = [executor.submit(fetch_slice, service, start, end, page_size) for start, end in slices]
+        for (start, _), future in zip(slices, futures):
+            try:
+                events, count = future.result()
+            except ReplayError as e:
+                logger.error(f"Error listing events from {start}: {e}")
+                replayed_until = min(replayed_until, start)
+                stats.failed += 1
+                continue
+            stats.pages += count
+            stats.events += len(events)
+            first_failure = apply_events(events, batch_size, stats)
+            if first_failure is not None:
+                replayed_until = min(replayed_until, first_failure)
+
+    stats.watermark = datetime.fromtimestamp(replayed_until, tz=dt_timezone.utc)
+    WebhookWatermark.objects.update_or_create(provider=provider, defaults={'replayed_until': stats.watermark})
+    return stats
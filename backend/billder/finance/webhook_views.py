@@ -1,15 +1,19 @@
 """
 Simple Stripe Webhook Handler
 """
-import stripe
 import json
 import logging
 from django.http import HttpResponse, HttpResponseBadRequest
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
+from datetime import datetime, timezone as dt_timezone
+from functools import partial
 from django.conf import settings
+from django.db import IntegrityError, transaction
 from django.utils import timezone
-from .models import Payment, Invoice
+from .models import Payment, Invoice, ProcessedWebhookEvent
+from .services.stripe_service import intent_status, stripe
+from .status_cache import write_through
 
 logger = logging.getLogger(__name__)
 
@@ -37,51 +41,82 @@ def stripe_webhook(request):
     
     # Handle the event
     try:
-        if event['type'] == 'payment_intent.succeeded':
-            handle_payment_succeeded(event['data']['object'])
-        elif event['type'] == 'payment_intent.payment_failed':
-            handle_payment_failed(event['data']['object'])
-        elif event['type'] == 'payment_intent.canceled':
-            handle_payment_canceled(event['data']['object'])
-        else:
-            logger.info(f"Unhandled event type: {event['type']}")
-        
+        if not process_event(event):
+            logger.info(f"Duplicate event ignored: {event['id']}")
         return HttpResponse(status=200)
         
     except Exception as e:
         logger.error(f"Error processing webhook: {e}")
         return HttpResponseBadRequest("Webhook processing failed")
 
+
+def process_event(event):
+    """
+    Apply a verified Stripe event, once.
+
+    Shared by stripe_webhook and the replay command. Handled events are
+    recorded in ProcessedWebhookEvent in the same transaction as their
+    effects; returns False for events that were already applied. If a
+    handler fails, nothing is recorded and the event can be redelivered.
+    Once committed, the event's payment intent is written through to the
+    status cache (finance.status_cache).
+    """
+    handler = EVENT_HANDLERS.get(event['type'])
+    if handler is None:
+        logger.info(f"Unhandled event type: {event['type']}")
+        return True
+
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                ProcessedWebhookEvent.objects.create(
+                    event_id=event['id'],
+                    type=event['type'],
+                    created=datetime.fromtimestamp(event['created'], tz=dt_timezone.utc),
+                )
+        except IntegrityError:
+            # Already recorded, by an earlier delivery or a concurrent one
+            return False
+        handler(event['data']['object'])
+        transaction.on_commit(partial(cache_intent_status, event), robust=True)
+    return True
+
+
+def cache_intent_status(event):
+    """Every handled event carries a payment intent; pollers see it without a lookup"""
+    write_through(intent_status(event['data']['object']), event['created'])
+
+
+def set_status_if_open(payment, new_status):
+    """Move a pending or processing payment to `new_status`; False if it had already moved on"""
+    updated = Payment.objects.filter(
+        pk=payment.pk, status__in=[Payment.Status.PENDING, Payment.Status.PROCESSING],
+    ).update(status=new_status, updated_at=timezone.now())
+    if updated:
+        payment.status = new_status
+    return bool(updated)
+
+
 def handle_payment_succeeded(payment_intent):
     """Handle successful payment"""
     try:
         payment_intent_id = payment_intent['id']
         
         # Find payment in our database
-        payment = Payment.objects.get(external_payment_id=payment_intent_id)
-        
-        # Update payment status
-        payment.status = Payment.Status.SUCCEEDED
-        payment.processed_at = timezone.now()
-        payment.external_charge_id = payment_intent.get('latest_charge')
-        payment.save()
-        
-        # Update invoice amount_paid
-        invoice = payment.invoice
-        invoice.amount_paid += payment.amount
-        
-        # Check if invoice is fully paid
-        if invoice.amount_paid >= invoice.total_amount:
-            invoice.status = 'paid'
-        
-        invoice.save()
+        payment = Payment.objects.get(
+            payment_provider=Payment.PaymentProvider.STRIPE, external_payment_id=payment_intent_id
+        )
+        if not payment.mark_succeeded(payment_intent.get('latest_charge')):
+            logger.info(f"Payment already succeeded: {payment.id}")
+            return
         
-        logger.info(f"Payment succeeded: {payment.id} for invoice {invoice.reference}")
+        logger.info(f"Payment succeeded: {payment.id} for invoice {payment.invoice.reference}")
         
     except Payment.DoesNotExist:
         logger.error(f"Payment not found for intent: {payment_intent_id}")
     except Exception as e:
         logger.error(f"Error handling payment succeeded: {e}")
+        raise
 
 def handle_payment_failed(payment_intent):
     """Handle failed payment"""
@@ -89,11 +124,15 @@ def handle_payment_failed(payment_intent):
         payment_intent_id = payment_intent['id']
         
         # Find payment in our database
-        payment = Payment.objects.get(external_payment_id=payment_intent_id)
+        payment = Payment.objects.select_related('invoice').get(
+            payment_provider=Payment.PaymentProvider.STRIPE, external_payment_id=payment_intent_id
+        )
         
-        # Update payment status
-        payment.status = Payment.Status.FAILED
-        payment.save()
+        # Only an open payment can fail; a replayed older event must not move a
+        # settled one back
+        if not set_status_if_open(payment, Payment.Status.FAILED):
+            logger.info(f"Payment already settled, ignoring failed event: {payment.id} ({payment.status})")
+            return
         
         logger.info(f"Payment failed: {payment.id} for invoice {payment.invoice.reference}")
         
@@ -101,6 +140,7 @@ def handle_payment_failed(payment_intent):
         logger.error(f"Payment not found for intent: {payment_intent_id}")
     except Exception as e:
         logger.error(f"Error handling payment failed: {e}")
+        raise
 
 def handle_payment_canceled(payment_intent):
     """Handle canceled payment"""
@@ -108,11 +148,15 @@ def handle_payment_canceled(payment_intent):
         payment_intent_id = payment_intent['id']
         
         # Find payment in our database
-        payment = Payment.objects.get(external_payment_id=payment_intent_id)
+        payment = Payment.objects.select_related('invoice').get(
+            payment_provider=Payment.PaymentProvider.STRIPE, external_payment_id=payment_intent_id
+        )
         
-        # Update payment status
-        payment.status = Payment.Status.CANCELED
-        payment.save()
+        # Only an open payment can be canceled; a replayed older event must not
+        # move a settled one back
+        if not set_status_if_open(payment, Payment.Status.CANCELED):
+            logger.info(f"Payment already settled, ignoring canceled event: {payment.id} ({payment.status})")
+            return
         
         logger.info(f"Payment canceled: {payment.id} for invoice {payment.invoice.reference}")
         
@@ -120,3 +164,11 @@ def handle_payment_canceled(payment_intent):
         logger.error(f"Payment not found for intent: {payment_intent_id}")
     except Exception as e:
         logger.error(f"Error handling payment canceled: {e}")
+        raise
+
+
+EVENT_HANDLERS = {
+    'payment_intent.succeeded': handle_payment_succeeded,
+    'payment_intent.payment_failed': handle_payment_failed,
+    'payment_intent.canceled': handle_payment_canceled,
+}
@@ -0,0 +1,76 @@
+"""
+Gunicorn configuration for the Billder API.
+
+Gunicorn picks this file up from the working directory::
+
+    cd backend/billder && gunicorn
+
+``SERVER_PROFILE`` selects the worker model for the workload a process serves:
+
+- ``sync`` (default): one request per worker process. Suits the admin and
+  CPU-bound pages; workers = 2 * CPUs + 1.
+- ``threaded``: gthread workers. Requests waiting on Stripe or webhook I/O
+  overlap within a process; workers = CPUs + 1, ``WEB_THREADS`` each.
+
+Run one profile per deployment. ``WEB_CONCURRENCY`` overrides the worker
+count.
+
+There is no ASGI profile: every view is a synchronous DRF view, which under
+uvicorn workers runs in a thread behind the event loop, so it only adds a
+hop (it measured slower than ``sync`` in ``benchmarks.server_throughput``).
+Revisit once there are async views.
+"""
+import multiprocessing
+import os
+
+cpu_count = multiprocessing.cpu_count()
+
+PROFILES = {
+    'sync': {
+        'wsgi_app': 'billder.wsgi:application',
+        'worker_class': 'sync',
+        'workers': cpu_count * 2 + 1,
+        'threads': 1,
+    },
+    'threaded': {
+        'wsgi_app': 'billder.wsgi:application',
+        'worker_class': 'gthread',
+        'workers': cpu_count + 1,
+        'threads': int(os.environ.get('WEB_THREADS', '8')),
+    },
+}
+
+profile_name = os.environ.get('SERVER_PROFILE', 'sync')
+if profile_name not in PROFILES:
+    raise ValueError(f"Unknown SERVER_PROFILE '{profile_name}'. Valid options: {list(PROFILES)}")
+profile = PROFILES[profile_name]
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+wsgi_app = profile['wsgi_app']
+worker_class = profile['worker_class']
+workers = int(os.environ.get('WEB_CONCURRENCY', profile['workers']))
+threads = profile['threads']
+
+# Import Django once in the master; workers fork with it already loaded
+preload_app = True
+
+# Recycle workers periodically to cap slow memory growth; jitter avoids
+# every worker restarting at the same moment
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', '1000'))
+max_requests_jitter = int(os.environ.get('WEB_MAX_REQUESTS_JITTER', '100'))
+
+# Hung workers are killed after `timeout`; on SIGTERM in-flight requests get
+# `graceful_timeout` to finish before workers are stopped
+timeout = int(os.environ.get('WEB_TIMEOUT', '30'))
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.environ.get('WEB_KEEPALIVE', '5'))
+
+# Empty WEB_ACCESS_LOG disables per-request logging
+accesslog = os.environ.get('WEB_ACCESS_LOG', '-') or None
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    """Don't share database connections opened while preloading"""
+    from django.db import connections
+    connections.close_all()
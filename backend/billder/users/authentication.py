@@ -0,0 +1,34 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from .models import TokenClaimsUser
+from .tokens import CLAIM_FIELDS
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    Signed token authentication without a user lookup.
+
+    The user is rebuilt from the token claims written by
+    ``users.tokens.issue_signed_token``. Opaque DRF tokens sent with the same
+    ``Token`` header are left for ``TokenAuthentication`` to handle.
+    """
+
+    def get_raw_token(self, header):
+        raw_token = super().get_raw_token(header)
+        # JWTs are three dot-separated segments; DRF token keys are plain hex
+        if raw_token is None or raw_token.count(b'.') != 2:
+            return None
+        return raw_token
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+            claims = {field: validated_token[field] for field in CLAIM_FIELDS}
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        user = TokenClaimsUser(id=user_id, is_active=True, **claims)
+        user._state.adding = False
+        return user
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-19 09:48
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_alter_user_managers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenClaimsUser',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('users.user',),
+        ),
+    ]
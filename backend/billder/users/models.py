@@ -49,4 +49,24 @@ class User(AbstractUser):
     REQUIRED_FIELDS = ["first_name", "last_name", "role"]
 
     def __str__(self):
-        return self.get_full_name() or self.email
\ No newline at end of file
+        return self.get_full_name() or self.email
+
+class ReadOnlyUserError(TypeError):
+    """Raised on an attempt to save or delete a user rebuilt from token claims"""
+
+
+class TokenClaimsUser(User):
+    """
+    Read-only user rebuilt from signed token claims.
+
+    Stateless authentication hands this to views instead of loading the user
+    row, so it must never be written back to the database.
+    """
+    class Meta:
+        proxy = True
+
+    def save(self, *args, **kwargs):
+        raise ReadOnlyUserError('Token users are read-only')
+
+    def delete(self, *args, **kwargs):
+        raise ReadOnlyUserError('Token users are read-only')
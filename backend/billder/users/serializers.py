@@ -34,10 +34,8 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         validated_data.pop('password_confirm')
         password = validated_data.pop('password')
-        user = User.objects.create_user(**validated_data)
-        user.set_password(password)
-        user.save()
-        return user
+        # create_user hashes and saves once; no second set_password/save round
+        return User.objects.create_user(password=password, **validated_data)
 
 
 class UserLoginSerializer(serializers.Serializer):
@@ -0,0 +1,107 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APITestCase
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from ..authentication import StatelessJWTAuthentication
+from ..models import ReadOnlyUserError, Role
+from ..tokens import issue_signed_token, issue_token, revoke_token
+
+User = get_user_model()
+
+
+class TokenIssueTest(TestCase):
+    def setUp(self):
+        """Set up test data"""
+        self.user = User.objects.create_user(
+            email='token@example.com',
+            password='testpass123',
+            first_name='Token',
+            last_name='User',
+            role=Role.CUSTOMER
+        )
+
+    def test_issue_token_single_query(self):
+        """Test that an existing token is fetched in one statement"""
+        with self.assertNumQueries(1):
+            key = issue_token(self.user)
+        with self.assertNumQueries(1):
+            self.assertEqual(issue_token(self.user), key)
+        self.assertEqual(Token.objects.get(user=self.user).key, key)
+
+    def test_issue_token_for_new_user(self):
+        """Test that a freshly created user gets a token from a plain insert"""
+        key = issue_token(self.user, created=True)
+        self.assertEqual(Token.objects.get(user=self.user).key, key)
+
+    def test_revoke_token(self):
+        """Test that revoking deletes the stored token"""
+        issue_token(self.user)
+        revoke_token(self.user)
+        self.assertFalse(Token.objects.filter(user=self.user).exists())
+
+
+@override_settings(AUTH_TOKEN_BACKEND='jwt')
+class StatelessTokenTest(APITestCase):
+    def setUp(self):
+        """Set up test data"""
+        self.user = User.objects.create_user(
+            email='jwt@example.com',
+            password='testpass123',
+            first_name='Jane',
+            last_name='Doe',
+            role=Role.BUSINESS_OWNER
+        )
+
+    def login(self):
+        response = self.client.post('/api/users/login/', {
+            'email': 'jwt@example.com',
+            'password': 'testpass123'
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['token']
+
+    def test_login_issues_signed_token(self):
+        """Test that login returns a JWT and stores no DB token"""
+        token = self.login()
+        self.assertEqual(token.count('.'), 2)
+        self.assertFalse(Token.objects.filter(user=self.user).exists())
+
+    def test_authenticated_request_without_queries(self):
+        """Test that a signed token authenticates with zero DB hits"""
+        token = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/users/profile/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['id'], self.user.id)
+        self.assertEqual(response.data['role'], Role.BUSINESS_OWNER)
+
+    def test_opaque_tokens_still_accepted(self):
+        """Test that DB tokens keep working alongside signed tokens"""
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        response = self.client.get('/api/users/profile/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_invalid_signed_token_rejected(self):
+        """Test that a tampered JWT is rejected"""
+        token = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token[:-2]}xx')
+
+        response = self.client.get('/api/users/profile/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_token_user_is_read_only(self):
+        """Test that a user rebuilt from token claims refuses to be saved or deleted"""
+        authentication = StatelessJWTAuthentication()
+        user = authentication.get_user(authentication.get_validated_token(issue_signed_token(self.user)))
+
+        with self.assertNumQueries(0):
+            with self.assertRaises(ReadOnlyUserError):
+                user.save()
+            with self.assertRaises(ReadOnlyUserError):
+                user.delete()
+        self.assertIsInstance(ReadOnlyUserError(), TypeError)
@@ -4,6 +4,7 @@ from django.urls import reverse
 from rest_framework.test import APITestCase
 from rest_framework import status
 from rest_framework.authtoken.models import Token
+from billder.throttling import reset_buckets
 from ..models import User, Role
 
 User = get_user_model()
@@ -12,6 +13,7 @@ User = get_user_model()
 class UserViewSetTest(APITestCase):
     def setUp(self):
         """Set up test data"""
+        reset_buckets()
         self.user_data = {
             'email': 'test@example.com',
             'password': 'testpass123',
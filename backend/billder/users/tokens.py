@@ -0,0 +1,74 @@
+"""
+Auth token issuance.
+
+Two backends are supported, selected by ``settings.AUTH_TOKEN_BACKEND``:
+
+- ``db``: DRF opaque tokens, issued with a single INSERT ... ON CONFLICT
+  statement instead of ``get_or_create`` (SELECT then INSERT), which races
+  when the same user logs in concurrently.
+- ``jwt``: stateless signed tokens from ``djangorestframework_simplejwt``.
+  They carry the user fields the API needs, so authenticating a request
+  costs no database queries at all (see ``users.authentication``).
+"""
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework_simplejwt.tokens import AccessToken
+
+# Claims copied into stateless tokens; enough to rebuild a TokenClaimsUser
+CLAIM_FIELDS = ('email', 'first_name', 'last_name', 'role')
+
+# Backends with INSERT ... ON CONFLICT ... RETURNING support
+UPSERT_VENDORS = ('postgresql', 'sqlite')
+
+
+def issue_token(user, created=False):
+    """
+    Return an auth token key for the user.
+
+    Pass ``created=True`` for a user saved in this request: no token can
+    exist yet, so a plain INSERT is enough.
+    """
+    if settings.AUTH_TOKEN_BACKEND == 'jwt':
+        return issue_signed_token(user)
+    if created:
+        return Token.objects.create(user=user).key
+    return _upsert_token(user)
+
+
+def issue_signed_token(user):
+    """Return a signed access token carrying the user's claims"""
+    token = AccessToken.for_user(user)
+    for field in CLAIM_FIELDS:
+        token[field] = getattr(user, field)
+    return str(token)
+
+
+def revoke_token(user):
+    """
+    Delete the user's opaque token, if any.
+
+    Stateless tokens cannot be revoked; they expire after
+    ``SIMPLE_JWT['ACCESS_TOKEN_LIFETIME']``.
+    """
+    Token.objects.filter(user_id=user.pk).delete()
+
+
+def _upsert_token(user):
+    """Fetch or create the user's token in one round trip"""
+    if connection.vendor not in UPSERT_VENDORS:
+        token, created = Token.objects.get_or_create(user=user)
+        return token.key
+
+    table = connection.ops.quote_name(Token._meta.db_table)
+    # The no-op update makes RETURNING yield the existing row on conflict
+    sql = (
+        f'INSERT INTO {table} ("key", "user_id", "created") VALUES (%s, %s, %s) '
+        f'ON CONFLICT ("user_id") DO UPDATE SET "user_id" = excluded."user_id" '
+        f'RETURNING "key"'
+    )
+    created = connection.ops.adapt_datetimefield_value(timezone.now())
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [Token.generate_key(), user.pk, created])
+        return cursor.fetchone()[0]
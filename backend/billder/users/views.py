@@ -5,7 +5,8 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework.authtoken.models import Token
+from billder.throttling import TokenBucketThrottle
+from .tokens import issue_token, revoke_token
 
 class UserViewSet(viewsets.ModelViewSet):
     """
@@ -16,18 +17,22 @@ class UserViewSet(viewsets.ModelViewSet):
     """
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    # Set per action for TokenBucketThrottle
+    throttle_scope = None
 
-    @action(detail=False, methods=['post'], permission_classes=[AllowAny])
+    # Throttled per IP before the password is hashed; no authenticators, so a
+    # forged Authorization header doesn't cost a token lookup first
+    @action(detail=False, methods=['post'], permission_classes=[AllowAny], authentication_classes=[],
+            throttle_classes=[TokenBucketThrottle], throttle_scope='register')
     def register(self, request):
         """User registration endpoint"""
         try:
             serializer = UserRegistrationSerializer(data=request.data)
             if serializer.is_valid():
                 user = serializer.save()
-                token, created = Token.objects.get_or_create(user=user)
                 return Response({
                     'message': 'Account created successfully',
-                    'token': token.key,
+                    'token': issue_token(user, created=True),
                     'user': UserSerializer(user).data
                 }, status=status.HTTP_201_CREATED)
             
@@ -52,17 +57,17 @@ class UserViewSet(viewsets.ModelViewSet):
                 'code': 'REGISTRATION_FAILED'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-    @action(detail=False, methods=['post'], permission_classes=[AllowAny])
+    @action(detail=False, methods=['post'], permission_classes=[AllowAny], authentication_classes=[],
+            throttle_classes=[TokenBucketThrottle], throttle_scope='login')
     def login(self, request):
         """User login endpoint using Token Authentication"""
         try:
             serializer = UserLoginSerializer(data=request.data)
             if serializer.is_valid():
                 user = serializer.validated_data['user']
-                token, created = Token.objects.get_or_create(user=user)
                 return Response({
                     'message': 'Login successful',
-                    'token': token.key,
+                    'token': issue_token(user),
                     'user': UserSerializer(user).data
                 })
             
@@ -91,7 +96,7 @@ class UserViewSet(viewsets.ModelViewSet):
     def logout(self, request):
         """User logout endpoint (delete token)"""
         try:
-            request.user.auth_token.delete()
+            revoke_token(request.user)
             return Response({'message': 'Successfully logged out'}, status=status.HTTP_200_OK)
         except Exception as e:
             return Response({'error': 'Logout failed'}, status=status.HTTP_400_BAD_REQUEST)
@@ -11,6 +11,9 @@ python manage.py makemigrations
 echo "Running migrations..."
 python manage.py migrate
 
+# Table for the database cache (a no-op for other cache backends)
+python manage.py createcachetable
+
 # Create superuser if it doesn't exist
 echo "Creating superuser..."
 python manage.py shell -c "
@@ -33,6 +36,6 @@ else:
 echo "Collecting static files..."
 python manage.py collectstatic --noinput --clear
 
-# Start server
+# Start server (worker settings in gunicorn.conf.py)
 echo "Starting server..."
-python manage.py runserver 0.0.0.0:8000
+exec gunicorn
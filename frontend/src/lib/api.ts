@@ -1,3 +1,5 @@
+import { primaryPinHeaders } from './primaryPin';
+
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || (process.env.NODE_ENV === 'development' 
   ? 'http://127.0.0.1:8000/api' 
   : 'https://mobile-enrica-billder-b7b36c60.koyeb.app/api');
@@ -17,6 +19,7 @@ export async function fetchInvoices(filters = {}) {
       headers: {
         'Authorization': `Token ${token}`,
         'Content-Type': 'application/json',
+        ...primaryPinHeaders(),
       },
     });
 
@@ -53,6 +56,7 @@ export async function fetchInvoice(id: string) {
       headers: {
         'Authorization': `Token ${token}`,
         'Content-Type': 'application/json',
+        ...primaryPinHeaders(),
       },
     });
 
@@ -88,6 +92,7 @@ export async function fetchTotalAmount() {
       headers: {
         'Authorization': `Token ${token}`,
         'Content-Type': 'application/json',
+        ...primaryPinHeaders(),
       },
     });
 
@@ -123,6 +128,7 @@ export async function fetchCustomerStats() {
       headers: {
         'Authorization': `Token ${token}`,
         'Content-Type': 'application/json',
+        ...primaryPinHeaders(),
       },
     });
 
@@ -160,6 +166,7 @@ export async function fetchPayments(filters = {}) {
       headers: {
         'Authorization': `Token ${token}`,
         'Content-Type': 'application/json',
+        ...primaryPinHeaders(),
       },
     });
 
@@ -195,6 +202,7 @@ export async function fetchInvoicePayments(invoiceId: string) {
       headers: {
         'Authorization': `Token ${token}`,
         'Content-Type': 'application/json',
+        ...primaryPinHeaders(),
       },
     });
 
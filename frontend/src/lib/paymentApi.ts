@@ -1,4 +1,6 @@
 // Simple Payment API Service
+import { primaryPinHeaders, rememberPrimaryPin } from './primaryPin';
+
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || (process.env.NODE_ENV === 'development' 
   ? 'http://127.0.0.1:8000/api' 
   : 'https://mobile-enrica-billder-b7b36c60.koyeb.app/api');
@@ -19,6 +21,7 @@ export async function createPayment(data: {
     },
     body: JSON.stringify(data),
   });
+  rememberPrimaryPin(response);
   return response.json();
 }
 
@@ -40,6 +43,7 @@ export async function confirmPayment(paymentIntentId: string, paymentMethodId?:
     },
     body: JSON.stringify(requestData),
   });
+  rememberPrimaryPin(response);
   
   const result = await response.json();
   console.log('Confirm payment response:', result);
@@ -54,6 +58,7 @@ export async function getPaymentStatus(paymentId: string) {
     headers: {
       'Authorization': `Token ${token}`,
       'Content-Type': 'application/json',
+      ...primaryPinHeaders(),
     },
   });
   return response.json();
@@ -0,0 +1,18 @@
+// Read-your-writes pin: after a write the API returns an X-Primary-Pin token
+// that sends our next reads to the primary database instead of a replica
+// that may not have the write yet. The API is on another site, so we echo it
+// as a header rather than rely on cookies. The server checks its expiry.
+const PIN_HEADER = 'X-Primary-Pin';
+const PIN_STORAGE_KEY = 'primaryPin';
+
+export function rememberPrimaryPin(response: Response) {
+  const pin = response.headers?.get(PIN_HEADER);
+  if (pin) {
+    sessionStorage.setItem(PIN_STORAGE_KEY, pin);
+  }
+}
+
+export function primaryPinHeaders(): Record<string, string> {
+  const pin = sessionStorage.getItem(PIN_STORAGE_KEY);
+  return pin ? { [PIN_HEADER]: pin } : {};
+}
@@ -1,4 +1,6 @@
 // Refund API Service
+import { primaryPinHeaders, rememberPrimaryPin } from './primaryPin';
+
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || (process.env.NODE_ENV === 'development' 
   ? 'http://127.0.0.1:8000/api' 
   : 'https://mobile-enrica-billder-b7b36c60.koyeb.app/api');
@@ -18,6 +20,7 @@ export async function createRefund(data: {
     },
     body: JSON.stringify(data),
   });
+  rememberPrimaryPin(response);
   return response.json();
 }
 
@@ -29,6 +32,7 @@ export async function getRefunds() {
     headers: {
       'Authorization': `Token ${token}`,
       'Content-Type': 'application/json',
+      ...primaryPinHeaders(),
     },
   });
   return response.json();
@@ -42,6 +46,7 @@ export async function getInvoicePayments(invoiceId: string) {
     headers: {
       'Authorization': `Token ${token}`,
       'Content-Type': 'application/json',
+      ...primaryPinHeaders(),
     },
   });
   return response.json();